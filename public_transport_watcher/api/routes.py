@@ -3,6 +3,8 @@ from sqlalchemy import String, func
 
 from public_transport_watcher.api.logger import log_request
 from public_transport_watcher.db.models.geography import Address, Street
+from public_transport_watcher.predictor.arima import ForecastSnapshot
+from public_transport_watcher.predictor.configuration import ARIMA_CONFIG
 from public_transport_watcher.predictor.graph_builder import GraphBuilder
 from public_transport_watcher.utils import get_db_session, get_query_result
 
@@ -11,6 +13,10 @@ graph_builder = GraphBuilder()
 
 mapping_stations = get_query_result("mapping_stations")
 
+# Forecasts are only read from the latest stored run, requests never trigger model work
+forecast_snapshot = ForecastSnapshot(ttl=ARIMA_CONFIG.get("forecast_table", {}).get("snapshot_ttl", 60))
+default_forecast_model = ARIMA_CONFIG.get("engine", "arima")
+
 
 @app.route("/api/v1/routes/optimal", methods=["GET"])
 @log_request
@@ -121,3 +127,40 @@ def search_address_coordinates():
 
     except Exception as e:
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route("/api/v1/stations/<int:station_id>/forecast", methods=["GET"])
+@log_request
+def get_station_forecast(station_id):
+    try:
+        model = request.args.get("model", default_forecast_model)
+
+        forecast = forecast_snapshot.station(station_id, model)
+        if forecast is None:
+            return jsonify({"error": f"No {model} forecast available for station {station_id}"}), 404
+
+        return jsonify(forecast), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
+
+
+@app.route("/api/v1/stations/forecast", methods=["GET"])
+@log_request
+def get_stations_forecast():
+    try:
+        model = request.args.get("model", default_forecast_model)
+        station_ids = request.args.get("station_ids")
+
+        if station_ids:
+            try:
+                station_ids = [int(station_id) for station_id in station_ids.split(",")]
+            except ValueError:
+                return jsonify({"error": "Invalid station_ids. Expected comma-separated integers"}), 400
+
+        forecasts = forecast_snapshot.stations(model, station_ids or None)
+
+        return jsonify({"model": model, "forecasts": forecasts, "total_found": len(forecasts)}), 200
+
+    except Exception as e:
+        return jsonify({"error": f"Internal server error: {str(e)}"}), 500
@@ -0,0 +1,48 @@
+"""added forecast table
+
+Revision ID: 4d2f7b9e1a63
+Revises: c9974f4b191b
+Create Date: 2026-10-19 10:12:41.208114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "4d2f7b9e1a63"
+down_revision: Union[str, None] = "c9974f4b191b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    schema_name = "transport"
+
+    op.create_table(
+        "forecast",
+        sa.Column("station_id", sa.Integer(), nullable=False),
+        sa.Column("target_hour", sa.DateTime(), nullable=False),
+        sa.Column("model", sa.String(length=20), nullable=False),
+        sa.Column("value", sa.Float(), nullable=False),
+        sa.Column("generated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["station_id"], [f"{schema_name}.station.id"]),
+        sa.PrimaryKeyConstraint("station_id", "target_hour", "model"),
+        schema=schema_name,
+    )
+
+    op.create_index(
+        "ix_transport_forecast_model_generated_at",
+        "forecast",
+        ["model", "generated_at"],
+        schema=schema_name,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    schema_name = "transport"
+    op.drop_index("ix_transport_forecast_model_generated_at", table_name="forecast", schema=schema_name)
+    op.drop_table("forecast", schema=schema_name)
@@ -0,0 +1,51 @@
+"""added station queue table
+
+Revision ID: 7e3c1a5f9b24
+Revises: 4d2f7b9e1a63
+Create Date: 2026-10-19 14:03:27.519342
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "7e3c1a5f9b24"
+down_revision: Union[str, None] = "4d2f7b9e1a63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    schema_name = "transport"
+
+    op.create_table(
+        "station_queue",
+        sa.Column("run_id", sa.String(length=64), nullable=False),
+        sa.Column("station_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("worker", sa.String(length=100), nullable=True),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("result", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("run_id", "station_id"),
+        schema=schema_name,
+    )
+
+    op.create_index(
+        "ix_transport_station_queue_run_id_status",
+        "station_queue",
+        ["run_id", "status"],
+        schema=schema_name,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    schema_name = "transport"
+    op.drop_index("ix_transport_station_queue_run_id_status", table_name="station_queue", schema=schema_name)
+    op.drop_table("station_queue", schema=schema_name)
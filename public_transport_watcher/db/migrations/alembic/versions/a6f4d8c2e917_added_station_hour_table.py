@@ -0,0 +1,86 @@
+"""added station hour table
+
+Revision ID: a6f4d8c2e917
+Revises: 7e3c1a5f9b24
+Create Date: 2026-10-19 15:21:08.734512
+
+The table is partitioned by month of start_timestamp when the migration is run with
+`alembic -x station_hour_partitioning=monthly upgrade head`.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import context, op
+
+revision: str = "a6f4d8c2e917"
+down_revision: Union[str, None] = "7e3c1a5f9b24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    partitioned = context.get_x_argument(as_dictionary=True).get("station_hour_partitioning") == "monthly"
+
+    # The primary key covers the forecasting reads, which never need to visit the table
+    op.execute(
+        f"""
+        CREATE TABLE transport.station_hour (
+            station_id INTEGER NOT NULL,
+            start_timestamp TIMESTAMP NOT NULL,
+            time_bin_id INTEGER NOT NULL,
+            hour SMALLINT NOT NULL,
+            day_of_week SMALLINT NOT NULL,
+            month SMALLINT NOT NULL,
+            cat_day transport.cat_day,
+            validations INTEGER,
+            CONSTRAINT station_hour_pkey PRIMARY KEY (station_id, start_timestamp)
+                INCLUDE (time_bin_id, cat_day, validations)
+        ) {"PARTITION BY RANGE (start_timestamp)" if partitioned else ""}
+        """
+    )
+
+    if partitioned:
+        op.execute(
+            """
+            DO $$
+            DECLARE
+                month_start DATE;
+            BEGIN
+                FOR month_start IN
+                    SELECT DISTINCT DATE_TRUNC('month', start_timestamp)::date FROM transport.time_bin
+                LOOP
+                    EXECUTE format(
+                        'CREATE TABLE IF NOT EXISTS transport.station_hour_%s PARTITION OF transport.station_hour '
+                        'FOR VALUES FROM (%L) TO (%L)',
+                        to_char(month_start, 'YYYYMM'), month_start, month_start + INTERVAL '1 month'
+                    );
+                END LOOP;
+            END $$
+            """
+        )
+
+    op.execute(
+        """
+        INSERT INTO transport.station_hour
+            (station_id, start_timestamp, time_bin_id, hour, day_of_week, month, cat_day, validations)
+        SELECT
+            t.station_id,
+            tb.start_timestamp,
+            tb.id,
+            EXTRACT(HOUR FROM tb.start_timestamp),
+            EXTRACT(ISODOW FROM tb.start_timestamp) - 1,
+            EXTRACT(MONTH FROM tb.start_timestamp),
+            tb.cat_day,
+            t.validations
+        FROM transport.traffic t
+        JOIN transport.time_bin tb ON t.time_bin_id = tb.id
+        ON CONFLICT (station_id, start_timestamp) DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TABLE transport.station_hour CASCADE")
@@ -0,0 +1,85 @@
+"""unique time bin timestamps
+
+Revision ID: c4b8e2d6f031
+Revises: a6f4d8c2e917
+Create Date: 2026-10-19 16:02:47.219863
+
+Time bins used to be inserted one by one without a unique constraint, so a time range
+may have several time bins. The duplicates are merged into the one with the lowest id
+before the index is made unique.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "c4b8e2d6f031"
+down_revision: Union[str, None] = "a6f4d8c2e917"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE time_bin_duplicate ON COMMIT DROP AS
+        SELECT id, keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY start_timestamp, end_timestamp) AS keep_id
+            FROM transport.time_bin
+        ) bins
+        WHERE id <> keep_id
+        """
+    )
+    # A station keeps the traffic of its first time bin of a range
+    op.execute(
+        """
+        DELETE FROM transport.traffic t
+        USING time_bin_duplicate d
+        WHERE t.time_bin_id = d.id
+          AND EXISTS (
+              SELECT 1 FROM transport.traffic other
+              LEFT JOIN time_bin_duplicate od ON od.id = other.time_bin_id
+              WHERE other.station_id = t.station_id
+                AND COALESCE(od.keep_id, other.time_bin_id) = d.keep_id
+                AND other.time_bin_id < t.time_bin_id
+          )
+        """
+    )
+    op.execute(
+        """
+        UPDATE transport.traffic t SET time_bin_id = d.keep_id
+        FROM time_bin_duplicate d
+        WHERE t.time_bin_id = d.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE transport.station_hour sh SET time_bin_id = d.keep_id
+        FROM time_bin_duplicate d
+        WHERE sh.time_bin_id = d.id
+        """
+    )
+    op.execute("DELETE FROM transport.time_bin tb USING time_bin_duplicate d WHERE tb.id = d.id")
+
+    op.drop_index("ix_transport_time_bin_timestamps", table_name="time_bin", schema="transport")
+    op.create_index(
+        "uix_transport_time_bin_timestamps",
+        "time_bin",
+        ["start_timestamp", "end_timestamp"],
+        unique=True,
+        schema="transport",
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("uix_transport_time_bin_timestamps", table_name="time_bin", schema="transport")
+    op.create_index(
+        "ix_transport_time_bin_timestamps",
+        "time_bin",
+        ["start_timestamp", "end_timestamp"],
+        schema="transport",
+    )
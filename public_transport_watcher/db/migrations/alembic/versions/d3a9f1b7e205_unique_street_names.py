@@ -0,0 +1,60 @@
+"""unique street names
+
+Revision ID: d3a9f1b7e205
+Revises: c4b8e2d6f031
+Create Date: 2026-10-19 18:41:09.553120
+
+Streets used to be inserted without a unique constraint, so a street may have been
+created several times. The duplicates are merged into the one with the lowest id
+before the (name, arrondissement) index is made unique.
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "d3a9f1b7e205"
+down_revision: Union[str, None] = "c4b8e2d6f031"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE street_duplicate ON COMMIT DROP AS
+        SELECT id, keep_id
+        FROM (
+            SELECT id, MIN(id) OVER (PARTITION BY name, arrondissement) AS keep_id
+            FROM geography.street
+        ) streets
+        WHERE id <> keep_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE geography.address a SET street_id = d.keep_id
+        FROM street_duplicate d
+        WHERE a.street_id = d.id
+        """
+    )
+    op.execute("DELETE FROM geography.street s USING street_duplicate d WHERE s.id = d.id")
+
+    op.create_index(
+        "uix_geography_street_name_arrondissement",
+        "street",
+        ["name", "arrondissement"],
+        unique=True,
+        postgresql_nulls_not_distinct=True,
+        schema="geography",
+    )
+    # Lookup of the existing addresses of a street when new addresses are loaded
+    op.create_index("ix_geography_address_street_number", "address", ["street_id", "number"], schema="geography")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_geography_address_street_number", table_name="address", schema="geography")
+    op.drop_index("uix_geography_street_name_arrondissement", table_name="street", schema="geography")
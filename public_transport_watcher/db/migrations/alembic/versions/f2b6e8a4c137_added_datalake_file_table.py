@@ -0,0 +1,41 @@
+"""added datalake file table
+
+Revision ID: f2b6e8a4c137
+Revises: d3a9f1b7e205
+Create Date: 2026-10-19 20:12:36.804951
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "f2b6e8a4c137"
+down_revision: Union[str, None] = "d3a9f1b7e205"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    schema_name = "transport"
+
+    op.create_table(
+        "datalake_file",
+        sa.Column("path", sa.String(), nullable=False),
+        sa.Column("step", sa.String(length=50), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("mtime", sa.Float(), nullable=False),
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("extractor_version", sa.String(length=20), nullable=False),
+        sa.Column("status", sa.String(length=10), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("path"),
+        schema=schema_name,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("datalake_file", schema="transport")
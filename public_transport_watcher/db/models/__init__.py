@@ -14,7 +14,11 @@ from public_transport_watcher.db.models.pollution import (
 )
 from public_transport_watcher.db.models.transport import (
     Categ,
+    DatalakeFile,
+    Forecast,
     Schedule,
+    StationHour,
+    StationQueue,
     Traffic,
     Transport,
     TransportStation,
@@ -30,6 +34,8 @@ __all__ = [
     "Address",
     "Base",
     "Categ",
+    "DatalakeFile",
+    "Forecast",
     "Measure",
     "Monument",
     "Parking",
@@ -37,6 +43,8 @@ __all__ = [
     "PollutionTimeBin",
     "Schedule",
     "Sensor",
+    "StationHour",
+    "StationQueue",
     "Street",
     "Traffic",
     "Transport",
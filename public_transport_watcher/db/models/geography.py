@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
+from sqlalchemy import Column, Float, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import relationship
 
 from public_transport_watcher.db.models.base import Base
@@ -8,7 +8,16 @@ geography_schema = "geography"
 
 class Street(Base):
     __tablename__ = "street"
-    __table_args__ = {"schema": geography_schema}
+    __table_args__ = (
+        Index(
+            "uix_geography_street_name_arrondissement",
+            "name",
+            "arrondissement",
+            unique=True,
+            postgresql_nulls_not_distinct=True,
+        ),
+        {"schema": geography_schema},
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
@@ -19,7 +28,7 @@ class Street(Base):
 
 class Address(Base):
     __tablename__ = "address"
-    __table_args__ = {"schema": geography_schema}
+    __table_args__ = (Index("ix_geography_address_street_number", "street_id", "number"), {"schema": geography_schema})
 
     id = Column(Integer, primary_key=True)
     street_id = Column(Integer, ForeignKey(f"{geography_schema}.street.id"), nullable=False)
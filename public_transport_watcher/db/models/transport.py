@@ -1,4 +1,18 @@
-from sqlalchemy import Column, Enum, ForeignKey, Integer, MetaData, String, Time
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    SmallInteger,
+    String,
+    Text,
+    Time,
+)
 from sqlalchemy.orm import relationship
 
 from public_transport_watcher.db.models.base import Base, StationBase, TimeBinBase
@@ -15,7 +29,11 @@ class TransportStation(Base, StationBase):
 
 class TransportTimeBin(Base, TimeBinBase):
     __tablename__ = "time_bin"
-    __table_args__ = {"schema": transport_schema}
+    __table_args__ = (
+        # Conflict target of the set-based upserts of the Navigo load
+        Index("uix_transport_time_bin_timestamps", "start_timestamp", "end_timestamp", unique=True),
+        {"schema": transport_schema},
+    )
 
     cat_day = Column(Enum(DayCategoryEnum), nullable=True)
 
@@ -70,7 +88,11 @@ class Schedule(Base):
 
 class Traffic(Base):
     __tablename__ = "traffic"
-    __table_args__ = {"schema": transport_schema}
+    __table_args__ = (
+        # Conflict target of the set-based upserts of the Navigo load
+        Index("uix_transport_traffic_station_time_bin", "station_id", "time_bin_id", unique=True),
+        {"schema": transport_schema},
+    )
 
     id = Column(Integer, primary_key=True)
     station_id = Column(Integer, ForeignKey(f"{transport_schema}.station.id"), nullable=False)
@@ -81,6 +103,52 @@ class Traffic(Base):
     time_bin = relationship("TransportTimeBin", back_populates="traffic_data")
 
 
+class Forecast(Base):
+    __tablename__ = "forecast"
+    __table_args__ = (
+        Index("ix_transport_forecast_model_generated_at", "model", "generated_at"),
+        {"schema": transport_schema},
+    )
+
+    station_id = Column(Integer, ForeignKey(f"{transport_schema}.station.id"), primary_key=True)
+    target_hour = Column(DateTime, primary_key=True)
+    model = Column(String(20), primary_key=True)
+    value = Column(Float, nullable=False)
+    generated_at = Column(DateTime, nullable=False)
+
+
+class StationHour(Base):
+    __tablename__ = "station_hour"
+    __table_args__ = {"schema": transport_schema}
+
+    station_id = Column(Integer, primary_key=True)
+    start_timestamp = Column(DateTime, primary_key=True)
+    time_bin_id = Column(Integer, nullable=False)
+    hour = Column(SmallInteger, nullable=False)
+    day_of_week = Column(SmallInteger, nullable=False)
+    month = Column(SmallInteger, nullable=False)
+    cat_day = Column(Enum(DayCategoryEnum, name="cat_day", schema=transport_schema), nullable=True)
+    validations = Column(Integer, nullable=True)
+
+
+class StationQueue(Base):
+    __tablename__ = "station_queue"
+    __table_args__ = (
+        Index("ix_transport_station_queue_run_id_status", "run_id", "status"),
+        {"schema": transport_schema},
+    )
+
+    run_id = Column(String(64), primary_key=True)
+    station_id = Column(Integer, primary_key=True)
+    status = Column(String(10), nullable=False, default="pending")
+    worker = Column(String(100), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_expires_at = Column(DateTime, nullable=True)
+    result = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, nullable=False)
+
+
 TransportStation.schedules = relationship(
     "Schedule", primaryjoin="TransportStation.id == Schedule.station_id", back_populates="station"
 )
@@ -90,3 +158,18 @@ TransportStation.next_schedules = relationship(
 )
 
 TransportStation.traffic_data = relationship("Traffic", back_populates="station")
+
+
+class DatalakeFile(Base):
+    __tablename__ = "datalake_file"
+    __table_args__ = {"schema": transport_schema}
+
+    # Relative to DATALAKE_ROOT
+    path = Column(String, primary_key=True)
+    step = Column(String(50), nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime = Column(Float, nullable=False)
+    content_hash = Column(String(64), nullable=False)
+    extractor_version = Column(String(20), nullable=False)
+    status = Column(String(10), nullable=False)
+    updated_at = Column(DateTime, nullable=False)
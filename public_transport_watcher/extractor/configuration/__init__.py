@@ -1,7 +1,9 @@
+from .csv_schemas import CSV_SCHEMAS
 from .extraction_config import EXTRACTION_CONFIG
 from .mapping import COLUMN_MAPPING
 
 __all__ = [
+    "CSV_SCHEMAS",
     "COLUMN_MAPPING",
     "EXTRACTION_CONFIG",
 ]
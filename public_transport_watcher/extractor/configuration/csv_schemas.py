@@ -0,0 +1,86 @@
+from .mapping import COLUMN_MAPPING
+
+# Columns read from each type of file with their dtype, None keeps the inferred dtype.
+# Files with "names" are mapped by position, the others by header.
+CSV_SCHEMAS = {
+    "navigo_validations": {
+        "sep": ";",
+        "encoding": "latin1",
+        "names": COLUMN_MAPPING["navigo"]["validations"],
+        "columns": {
+            "jour": "category",
+            "code_stif_trns": "category",
+            "code_stif_res": "category",
+            "code_stif_arret": "category",
+            "libelle_arret": "category",
+            "ida": "Int32",
+            # "Moins de 5" below 5 validations, converted when the chunk is processed
+            "nb_vald": None,
+        },
+    },
+    "navigo_profiles": {
+        "sep": ";",
+        "encoding": "latin1",
+        "names": COLUMN_MAPPING["navigo"]["profils"],
+        "columns": {
+            "code_stif_trns": "category",
+            "code_stif_res": "category",
+            "code_stif_arret": "category",
+            "libelle_arret": "category",
+            "ida": "Int32",
+            "cat_jour": "category",
+            "trnc_horr_60": "category",
+            "pourc_validations": "float64",
+        },
+    },
+    "paris_addresses": {
+        "sep": ";",
+        "encoding": "utf-8",
+        "columns": {
+            "N_SQ_AD": None,
+            "N_VOIE": None,
+            "C_SUF1": "str",
+            "C_SUF2": "str",
+            "C_SUF3": "str",
+            "C_AR": None,
+            "L_ADR": None,
+            "Geometry X Y": None,
+        },
+    },
+    "gtfs_stop_times": {
+        "sep": ",",
+        "encoding": "utf-8",
+        "columns": {
+            "trip_id": "category",
+            "arrival_time": "category",
+            "stop_id": "category",
+            "stop_sequence": "int32",
+        },
+    },
+    "gtfs_trips": {
+        "sep": ",",
+        "encoding": "utf-8",
+        "columns": {
+            "trip_id": "category",
+            "route_id": "category",
+            "service_id": "category",
+        },
+    },
+    "gtfs_calendar": {
+        "sep": ",",
+        "encoding": "utf-8",
+        "columns": {
+            "service_id": "category",
+            "start_date": None,
+            "end_date": None,
+        },
+    },
+    "gtfs_stops": {
+        "sep": ",",
+        "encoding": "utf-8",
+        "columns": {
+            "stop_id": "category",
+            "parent_station": "category",
+        },
+    },
+}
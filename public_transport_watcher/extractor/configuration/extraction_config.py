@@ -1,3 +1,7 @@
+import os
+
+CONFIG_DIR = os.path.dirname(os.path.abspath(__file__))
+
 EXTRACTION_CONFIG = {
     "navigo": {
         "files": {
@@ -6,12 +10,21 @@ EXTRACTION_CONFIG = {
             2024: ["s1", {"s2": ["3", "4"]}],
         },
         "batch_size": 100000,
+        # Ceiling on the memory of a chunk in flight (raw rows and hourly validations), in MB
+        "memory_limit_mb": 512,
+        # Processes computing the hourly validations of the chunks, 1 processes them in the calling process
+        "workers": 1,
+        # Rows of each period already inserted, to resume an interrupted load
+        "progress_file": os.path.join(CONFIG_DIR, "navigo_progress.json"),
     },
     "stations": {
         "batch_size": 100,
+        # Datalake folder of the input files, read by the extraction and recorded by the manifest
+        "datalake": ["geography", "stations"],
     },
     "addresses": {
         "batch_size": 1000,
+        "datalake": ["geography", "addresses"],
     },
     "pollution": {
         "pollutants": ["NO2", "O3", "PM2.5"],
@@ -27,5 +40,20 @@ EXTRACTION_CONFIG = {
     },
     "schedule": {
         "batch_size": 5000,
+        # Rows of stop_times.txt processed at once
+        "chunk_size": 500000,
+        # Load into a new table which replaces transport.schedule once complete, instead of appending
+        "swap": False,
+        "datalake": ["schedule", "2025", "april"],
+    },
+    "manifest": {
+        # Skip the datalake files already loaded and unchanged when the extractor is run
+        "enabled": True,
+        # Bump to load every file again, e.g. after a change of the way a file is loaded
+        "version": "1",
+    },
+    "csv": {
+        # "pyarrow" parses whole files faster when installed, chunked reads always use the C engine
+        "engine": "c",
     },
 }
@@ -2,20 +2,29 @@ from .addresses import extract_addresses_informations
 from .air_quality import extract_air_quality_informations
 from .alerts import extract_traffic_alerts_informations
 from .categ import extract_transport_categories_informations
-from .navigo import extract_navigo_validations_informations
-from .schedule import extract_schedule_informations
+from .navigo import (
+    NavigoProgress,
+    extract_navigo_validations_informations,
+    get_navigo_period_files,
+    iter_navigo_validations,
+)
+from .schedule import extract_schedule_informations, iter_schedule_informations
 from .stations import extract_stations_informations
 from .traffic import extract_traffic_informations
 from .transport import extract_transport_lines_informations
 
 __all__ = [
+    "NavigoProgress",
     "extract_addresses_informations",
     "extract_air_quality_informations",
     "extract_traffic_alerts_informations",
     "extract_transport_categories_informations",
     "extract_navigo_validations_informations",
+    "get_navigo_period_files",
+    "iter_navigo_validations",
     "extract_stations_informations",
     "extract_traffic_informations",
     "extract_transport_lines_informations",
     "extract_schedule_informations",
+    "iter_schedule_informations",
 ]
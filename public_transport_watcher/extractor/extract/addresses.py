@@ -1,9 +1,16 @@
 import pandas as pd
 
+from public_transport_watcher.extractor.configuration import EXTRACTION_CONFIG
+from public_transport_watcher.extractor.extract.typed_csv import read_typed_csv
 from public_transport_watcher.logging_config import get_logger
 
 logger = get_logger()
 
+_SUFFIX_COLUMNS = ["C_SUF1", "C_SUF2", "C_SUF3"]
+
+# House number at the start of the address, the rest being the suffixes and the street
+_LEADING_NUMBER = r"^\s*(\d+)\s*(.*)$"
+
 
 def extract_addresses_informations() -> pd.DataFrame:
     """
@@ -21,7 +28,7 @@ def extract_addresses_informations() -> pd.DataFrame:
 
     from public_transport_watcher.utils import get_datalake_file
 
-    addresses_file = get_datalake_file("geography", "addresses")
+    addresses_file = get_datalake_file(*EXTRACTION_CONFIG["addresses"]["datalake"])
     if not addresses_file:
         logger.error("No address file found in datalake")
         return pd.DataFrame()
@@ -30,67 +37,74 @@ def extract_addresses_informations() -> pd.DataFrame:
     logger.info(f"Processing addresses from file: {addresses_file}")
 
     try:
-        addresses_df = pd.read_csv(addresses_file, sep=";", encoding="utf-8")
+        addresses_df = read_typed_csv(addresses_file, "paris_addresses")
         initial_count = len(addresses_df)
         logger.info(f"Loaded {initial_count} address records")
 
-        addresses_df[["latitude", "longitude"]] = addresses_df["Geometry X Y"].str.split(",", expand=True)
-
-        useful_columns = [
-            "N_SQ_AD",  # id informatique
-            "N_VOIE",  # numéro de voie
-            "L_ADR",  # adresse complète
-            "C_SUF1",  # suffixe de voie
-            "C_SUF2",  # suffixe de voie
-            "C_SUF3",  # code de voie
-            "C_AR",  # arrondissement parisien
-            "latitude",
-            "longitude",
-        ]
-        addresses_df = addresses_df[useful_columns]
         addresses_df = addresses_df.dropna(subset=["N_SQ_AD", "N_VOIE", "L_ADR", "C_AR"])
 
         clean_count = len(addresses_df)
         if initial_count > clean_count:
             logger.info(f"Removed {initial_count - clean_count} records with missing data")
 
-        mapping_types = [int, int, str, str, str, str, int, float, float]
-        mapping_types = dict(zip(useful_columns, mapping_types))
-        addresses_df = addresses_df.astype(mapping_types)
-
         logger.info("Extracting street names and building street numbers")
-        addresses_df["street_name"] = addresses_df.apply(_extract_street_name, axis=1)
-        addresses_df["number"] = addresses_df.apply(_build_street_number, axis=1)
-
-        addresses_df = addresses_df.drop(columns=["N_SQ_AD", "N_VOIE", "C_SUF1", "C_SUF2", "C_SUF3", "L_ADR"])
-
-        logger.info(f"Processed {len(addresses_df)} address records")
-        logger.info("Address information extraction completed successfully")
-        return addresses_df
+        return _parse_addresses(addresses_df)
 
     except Exception as e:
         logger.error(f"Error processing addresses: {str(e)}")
         return pd.DataFrame()
 
 
-def _extract_street_name(row: pd.Series) -> str:
-    street_name = row["L_ADR"]
-    street_name = (
-        street_name.replace(str(row["N_VOIE"]), "")
-        .replace(str(row["C_SUF1"]), "")
-        .replace(str(row["C_SUF2"]), "")
-        .replace(str(row["C_SUF3"]), "")
-    )
-
-    return street_name.strip()
+def _parse_addresses(addresses_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Build the street name, street number and coordinates of raw Paris addresses.
 
+    Every transformation works on whole columns: the street name is the address without
+    its leading house number and the suffixes following it, the street number is the
+    house number followed by its suffixes.
 
-def _build_street_number(row: pd.Series) -> str:
-    number = str(row["N_VOIE"])
-    suffixes = [row["C_SUF1"], row["C_SUF2"], row["C_SUF3"]]
-    suffixes = [suffix for suffix in suffixes if suffix not in ["nan", ""]]
+    Parameters
+    ----------
+    addresses_df : pd.DataFrame
+        Raw addresses with N_VOIE, C_SUF1, C_SUF2, C_SUF3, C_AR, L_ADR and
+        'Geometry X Y' ("latitude,longitude") columns
 
-    if len(suffixes) > 0:
-        number += " " + " ".join(suffixes)
+    Returns
+    -------
+    pd.DataFrame
+        Addresses with C_AR, latitude, longitude, street_name and number columns
+    """
+    numbers = addresses_df["N_VOIE"].astype(int).astype(str)
+    coordinates = addresses_df["Geometry X Y"].str.split(",", n=1, expand=True).astype(float)
+
+    labels = addresses_df["L_ADR"].astype(str).str.strip()
+    parts = labels.str.extract(_LEADING_NUMBER)
+    # Addresses starting with another number than their house number are kept whole
+    street_names = parts[1].where(parts[0] == numbers, labels)
+
+    # Most addresses have no suffix, only the rows with one are split
+    for column in _SUFFIX_COLUMNS:
+        suffix = addresses_df[column].dropna().astype(str).str.strip()
+        suffix = suffix[suffix != ""]
+        if suffix.empty:
+            continue
+
+        tokens = street_names[suffix.index].str.split(" ", n=1, expand=True).reindex(columns=[0, 1])
+        is_suffix = tokens[0] == suffix
+        street_names.loc[is_suffix[is_suffix].index] = tokens.loc[is_suffix, 1].fillna("").str.lstrip()
+        numbers.loc[suffix.index] = numbers[suffix.index] + " " + suffix
+
+    processed_df = pd.DataFrame(
+        {
+            "C_AR": addresses_df["C_AR"].astype(int),
+            "latitude": coordinates[0],
+            "longitude": coordinates[1],
+            "street_name": street_names.str.strip(),
+            "number": numbers,
+        },
+        index=addresses_df.index,
+    )
 
-    return number.strip()
+    logger.info(f"Processed {len(processed_df)} address records")
+    logger.info("Address information extraction completed successfully")
+    return processed_df
@@ -1,54 +1,137 @@
-from typing import Dict, List, Tuple, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import json
+import os
+import tempfile
+from typing import Dict, Iterator, List, Tuple, Union
 
-from holidays import France
 import pandas as pd
 
-from public_transport_watcher.extractor.configuration import COLUMN_MAPPING
+from public_transport_watcher.extractor.extract.typed_csv import read_typed_csv
 from public_transport_watcher.logging_config import get_logger
-from public_transport_watcher.utils import get_datalake_file
+from public_transport_watcher.utils import get_datalake_file, get_day_categories
 
 logger = get_logger()
-_HOLIDAYS = France(years=[2023, 2024]).keys()
 
-_COLUMN_MAPPING = COLUMN_MAPPING["navigo"]
+_PROBE_ROWS = 1000
 
 
-def extract_navigo_validations_informations(config: Dict) -> pd.DataFrame:
+class NavigoProgress:
     """
-    Extract and process Navigo validations for all configured time periods.
+    Resumable progress markers of a Navigo validations load.
+
+    For each period (e.g. "2024/s2/3"), the number of rows of its validations file whose
+    hourly validations are inserted, and whether the file is complete.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSON file of the markers, written after each chunk. If None, the markers are only kept in memory.
+    """
+
+    def __init__(self, path: str | None = None):
+        self.path = path
+        self._markers = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._markers = json.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable Navigo progress file {path}: {e}")
+
+    def rows(self, period: str) -> int:
+        """Number of rows of the period already inserted."""
+        return self._markers.get(period, {}).get("rows", 0)
+
+    def is_done(self, period: str) -> bool:
+        """Whether the whole period is inserted."""
+        return self._markers.get(period, {}).get("done", False)
+
+    def mark(self, period: str, rows: int, done: bool = False) -> None:
+        """Record the rows of the period inserted so far."""
+        self._markers[period] = {"rows": int(rows), "done": done}
+        if not self.path:
+            return
+
+        directory = os.path.dirname(self.path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._markers, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def iter_navigo_validations(config: Dict, progress: NavigoProgress | None = None) -> Iterator[pd.DataFrame]:
+    """
+    Extract the Navigo validations of all configured time periods, one chunk at a time.
+
+    Each chunk of a validations file is processed into hourly validations and yielded
+    before the next one is read, so a consumer inserting the chunks keeps a single chunk
+    in memory. The chunk size is reduced to keep a chunk under `memory_limit_mb`, and
+    the progress marker of a chunk is recorded once the consumer asks for the next one,
+    i.e. once the chunk is inserted. Periods and rows already inserted are skipped.
+
+    With `workers` above 1, the chunks of all the periods are processed by a pool of
+    processes while they are read, and yielded in reading order. At most two chunks per
+    worker are in flight.
 
     Parameters
     ----------
     config : Dict
         Configuration dictionary with years and their corresponding time periods.
+    progress : NavigoProgress, optional
+        Progress markers, defaults to the markers of `progress_file` in the configuration.
 
-    Returns
-    -------
+    Yields
+    ------
     pd.DataFrame
-        DataFrame containing the processed Navigo validations data.
+        Hourly validations of a chunk
     """
     logger.info("Extracting Navigo validations")
 
     files_config = config["files"]
-    batch_size = config["batch_size"]
+    workers = config.get("workers", 1)
 
     if not files_config:
         logger.error("No files configuration provided for Navigo validations extraction.")
-        return pd.DataFrame()
+        return
 
-    all_validations = []
-    failures = []
-    for year, periods in files_config.items():
-        try:
-            year_validations = _process_year_data(year, periods, batch_size)
-            if not year_validations.empty:
-                all_validations.append(year_validations)
-        except Exception as e:
-            logger.error(f"Failed to process year {year}: {str(e)}")
-            failures.append(year)
+    if progress is None:
+        progress = NavigoProgress(config.get("progress_file"))
+
+    sizer = _ChunkSizer(config["batch_size"], config.get("memory_limit_mb"))
+    failures = set()
+    chunks = _read_chunks(files_config, sizer, progress, failures)
+
+    if workers > 1:
+        yield from _process_in_pool(chunks, sizer, progress, failures, workers)
+    else:
+        yield from _process_in_order(chunks, sizer, progress, failures)
 
     if failures:
-        logger.warning(f"Failed to process data for years: {failures}")
+        logger.warning(f"Failed to process data for periods: {sorted(failures)}")
+
+
+def extract_navigo_validations_informations(config: Dict) -> pd.DataFrame:
+    """
+    Extract and process Navigo validations for all configured time periods.
+
+    Parameters
+    ----------
+    config : Dict
+        Configuration dictionary with years and their corresponding time periods.
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame containing the processed Navigo validations data.
+    """
+    all_validations = list(iter_navigo_validations(config, NavigoProgress()))
 
     if not all_validations:
         logger.warning("No validations data was extracted")
@@ -59,88 +142,210 @@ def extract_navigo_validations_informations(config: Dict) -> pd.DataFrame:
     return final_df
 
 
-def _process_year_data(year: int, periods: List[Union[str, Dict]], batch_size: int) -> pd.DataFrame:
-    all_period_validations = []
+def get_navigo_period_files(files_config: Dict) -> Dict[str, List[str]]:
+    """
+    Return the datalake files of each configured Navigo period.
+
+    Parameters
+    ----------
+    files_config : Dict
+        Years and their time periods, as in the `files` configuration
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        Files of each period (e.g. "2024/s2/3"), the periods without files are left out
+    """
+    period_files = {}
+    for year, periods in files_config.items():
+        for period in _expand_periods(periods):
+            try:
+                period_files[f"{year}/{period}"] = sorted(get_datalake_file("validations_navigo", year, period))
+            except (ValueError, FileNotFoundError) as e:
+                logger.warning(f"No datalake files for {year}/{period}: {e}")
+    return period_files
+
+
+def _expand_periods(periods: List[Union[str, Dict]]) -> Iterator[str]:
     for period in periods:
         if isinstance(period, str):
             # Simple period (e.g., "s1", "s2")
-            period_df = _process_period_data(year, period, batch_size)
-            if not period_df.empty:
-                all_period_validations.append(period_df)
+            yield period
         elif isinstance(period, dict):
             # Complex period with sub-periods (e.g., {"s2": ["3", "4"]})
             for semester, trimesters in period.items():
                 for trimester in trimesters:
-                    period_df = _process_period_data(year, f"{semester}/{trimester}", batch_size)
-                    if not period_df.empty:
-                        all_period_validations.append(period_df)
+                    yield f"{semester}/{trimester}"
 
-    if not all_period_validations:
-        return pd.DataFrame()
 
-    return pd.concat(all_period_validations, ignore_index=True)
+class _ChunkSizer:
+    """Number of rows of the next chunk, bounded by the memory of the rows measured so far."""
 
+    def __init__(self, batch_size: int, memory_limit_mb: float | None):
+        self.batch_size = batch_size
+        self.memory_limit_mb = memory_limit_mb
+        # A small first chunk measures the memory of a row before the chunks grow to the limit
+        self.size = min(batch_size, _PROBE_ROWS) if memory_limit_mb else batch_size
 
-def _process_period_data(year: int, period: str, batch_size: int) -> pd.DataFrame:
-    try:
-        data_category = "validations_navigo"
-        files = get_datalake_file(data_category, year, period)
+    def update(self, chunk_memory: float, records: int) -> None:
+        if not self.memory_limit_mb or chunk_memory <= 0 or records == 0:
+            return
+        row_memory = chunk_memory / records
+        self.size = max(1, min(self.batch_size, int(self.memory_limit_mb * 1024 * 1024 // row_memory)))
+
+
+def _read_chunks(files_config: Dict, sizer: _ChunkSizer, progress: NavigoProgress, failures: set) -> Iterator[tuple]:
+    """
+    Read the validations files of all the periods in chunks.
 
-        if len(files) < 2:
-            logger.error(f"Missing files for period {year}/{period}")
-            return pd.DataFrame()
+    Yields (period, records, validations chunk, profiles file) tuples, where records is
+    the number of rows of the period read so far, then (period, records, None, None) once
+    the period is complete.
+    """
+    for year, periods in files_config.items():
+        for period in _expand_periods(periods):
+            key = f"{year}/{period}"
+            if progress.is_done(key):
+                logger.info(f"Skipping {key}, already inserted")
+                continue
+            try:
+                yield from _read_period_chunks(year, period, sizer, progress, failures)
+            except Exception as e:
+                logger.error(f"Error processing {key}: {str(e)}")
+                failures.add(key)
+
+
+def _read_period_chunks(
+    year: int, period: str, sizer: _ChunkSizer, progress: NavigoProgress, failures: set
+) -> Iterator[tuple]:
+    data_category = "validations_navigo"
+    files = get_datalake_file(data_category, year, period)
+
+    if len(files) < 2:
+        logger.error(f"Missing files for period {year}/{period}")
+        return
+
+    validations_file, profiles_file = _find_file_types(files)
+
+    if not validations_file or not profiles_file:
+        logger.error(f"Could not identify validations and profiles files for {year}/{period}")
+        return
+
+    logger.info(f"Processing data for {year}/{period}")
+
+    key = f"{year}/{period}"
+    total_records = progress.rows(key)
+    if total_records:
+        logger.info(f"Resuming {key} after {total_records} records")
+
+    chunks_processed = 0
+    with read_typed_csv(
+        validations_file,
+        "navigo_validations",
+        iterator=True,
+        skiprows=range(1, total_records + 1) if total_records else None,
+    ) as reader:
+        while key not in failures:
+            try:
+                validations_chunk = reader.get_chunk(sizer.size)
+            except StopIteration:
+                break
 
-        validations_file, profiles_file = _find_file_types(files)
+            chunks_processed += 1
+            total_records += len(validations_chunk)
 
-        if not validations_file or not profiles_file:
-            logger.error(f"Could not identify validations and profiles files for {year}/{period}")
-            return pd.DataFrame()
+            logger.info(f"Processing chunk {chunks_processed} with {len(validations_chunk)} records")
+            yield key, total_records, validations_chunk, profiles_file
 
-        logger.info(f"Processing data for {year}/{period}")
+    yield key, total_records, None, None
+    logger.info(f"Read {key} - {total_records} total records in {chunks_processed} chunks")
+
+
+def _process_in_order(chunks: Iterator[tuple], sizer: _ChunkSizer, progress: NavigoProgress, failures: set):
+    for key, total_records, validations_chunk, profiles_file in chunks:
+        if validations_chunk is None:
+            if key not in failures:
+                progress.mark(key, total_records, done=True)
+            continue
 
         try:
-            profiles_df = pd.read_csv(profiles_file, sep=";", parse_dates=False, encoding="latin1")
+            hourly_validations, chunk_memory = _compute_chunk(validations_chunk, profiles_file)
         except Exception as e:
-            logger.error(f"Error loading profiles file: {str(e)}")
-            return pd.DataFrame()
-
-        profiles_df.columns = _COLUMN_MAPPING["profils"]
-        profiles_df = profiles_df.rename(columns={"cat_jour": "cat_day"})
-        profiles_df = profiles_df[profiles_df["trnc_horr_60"] != "ND"]
-
-        # Process validations data in batches to save memory
-        chunks_processed = 0
-        total_records = 0
-        all_chunks = []
-
-        for validations_chunk in pd.read_csv(
-            validations_file, sep=";", encoding="latin1", chunksize=batch_size, parse_dates=False
-        ):
-            validations_chunk.columns = _COLUMN_MAPPING["validations"]
-            chunks_processed += 1
-            records_in_chunk = len(validations_chunk)
-            total_records += records_in_chunk
-
-            logger.info(f"Processing chunk {chunks_processed} with {records_in_chunk} records")
+            logger.error(f"Error processing {key}: {str(e)}")
+            failures.add(key)
+            continue
+        sizer.update(chunk_memory, len(validations_chunk))
+        del validations_chunk
 
-            hourly_validations = _compute_hourly_validations(validations_chunk, profiles_df)
-            if not hourly_validations.empty:
-                all_chunks.append(hourly_validations)
+        if not hourly_validations.empty:
+            yield hourly_validations
+        del hourly_validations
 
-            logger.info(f"Chunk {chunks_processed} processed, {total_records} total records so far")
+        progress.mark(key, total_records)
 
-        if not all_chunks:
-            return pd.DataFrame()
 
-        final_df = pd.concat(all_chunks, ignore_index=True)
-        logger.info(
-            f"Completed processing for {year}/{period} - {total_records} total records in {chunks_processed} chunks"
-        )
-        return final_df
+def _process_in_pool(
+    chunks: Iterator[tuple], sizer: _ChunkSizer, progress: NavigoProgress, failures: set, workers: int
+):
+    pending = deque()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for key, total_records, validations_chunk, profiles_file in chunks:
+            if validations_chunk is None:
+                pending.append((key, total_records, None, 0))
+            else:
+                future = executor.submit(_compute_chunk, validations_chunk, profiles_file)
+                pending.append((key, total_records, future, len(validations_chunk)))
+            del validations_chunk
+
+            while len(pending) > 2 * workers:
+                yield from _collect(pending.popleft(), sizer, progress, failures)
+
+        while pending:
+            yield from _collect(pending.popleft(), sizer, progress, failures)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _collect(entry: tuple, sizer: _ChunkSizer, progress: NavigoProgress, failures: set):
+    key, total_records, future, records = entry
+    if key in failures:
+        if future is not None:
+            future.cancel()
+        return
+
+    if future is None:
+        progress.mark(key, total_records, done=True)
+        return
 
+    try:
+        hourly_validations, chunk_memory = future.result()
     except Exception as e:
-        logger.error(f"Error processing {year}/{period}: {str(e)}")
-        return pd.DataFrame()
+        logger.error(f"Error processing {key}: {str(e)}")
+        failures.add(key)
+        return
+    sizer.update(chunk_memory, records)
+
+    if not hourly_validations.empty:
+        yield hourly_validations
+    del hourly_validations
+
+    progress.mark(key, total_records)
+
+
+def _compute_chunk(validations_chunk: pd.DataFrame, profiles_file: str) -> Tuple[pd.DataFrame, int]:
+    """Hourly validations of a chunk and the memory of the chunk in flight (raw and hourly rows)."""
+    chunk_memory = validations_chunk.memory_usage(deep=True).sum()
+    hourly_validations = _compute_hourly_validations(validations_chunk, _load_profiles(profiles_file))
+    return hourly_validations, chunk_memory + hourly_validations.memory_usage(deep=True).sum()
+
+
+@lru_cache(maxsize=2)
+def _load_profiles(profiles_file: str) -> pd.DataFrame:
+    """Profiles of a period, loaded once per process and shared by the chunks of the period."""
+    profiles_df = read_typed_csv(profiles_file, "navigo_profiles")
+    profiles_df = profiles_df.rename(columns={"cat_jour": "cat_day"})
+    return profiles_df[profiles_df["trnc_horr_60"] != "ND"]
 
 
 def _find_file_types(files: List[str]) -> Tuple[str, str]:
@@ -190,10 +395,12 @@ def _compute_hourly_validations(validations_df: pd.DataFrame, profiles_df: pd.Da
                     dayfirst=True,
                     errors="coerce",
                 )
-        validations_df["cat_day"] = validations_df.apply(_determine_day_type, axis=1)
+        validations_df["cat_day"] = get_day_categories(validations_df["jour"])
         group_cols.append("cat_day")
 
-    validations_aggr = validations_df.groupby(group_cols, as_index=False).agg(nb_vald_total=("nb_vald", "sum"))
+    validations_aggr = validations_df.groupby(group_cols, as_index=False, observed=True).agg(
+        nb_vald_total=("nb_vald", "sum")
+    )
 
     validations_aggr.rename(columns={"nb_vald_total": "nb_vald"}, inplace=True)
     merge_keys_full = merge_keys + ["cat_day"]
@@ -216,19 +423,11 @@ def _compute_hourly_validations(validations_df: pd.DataFrame, profiles_df: pd.Da
     result_df = pd.merge(result_df, first_labels, on=["ida", "jour", "tranche_horaire"])
 
     result_df = (
-        result_df.groupby(["ida", "libelle_arret", "jour", "cat_day", "tranche_horaire"])["validations_horaires"]
+        result_df.groupby(["ida", "libelle_arret", "jour", "cat_day", "tranche_horaire"], observed=True)[
+            "validations_horaires"
+        ]
         .sum()
         .reset_index()
     )
 
     return result_df
-
-
-def _determine_day_type(row: pd.Series) -> str:
-    jour = row["jour"]
-    day_of_week = jour.dayofweek
-
-    if jour in _HOLIDAYS or day_of_week == 6:
-        return "DIJFP"
-
-    return "SAHV" if day_of_week == 5 else "JOHV"
@@ -1,124 +1,228 @@
+from typing import Iterator
+
+import numpy as np
 import pandas as pd
 
+from public_transport_watcher.extractor.configuration import EXTRACTION_CONFIG
+from public_transport_watcher.extractor.extract.typed_csv import read_typed_csv
 from public_transport_watcher.logging_config import get_logger
 from public_transport_watcher.utils import get_datalake_file
 
 logger = get_logger()
 
+_SCHEDULE_COLUMNS = ["arrival_timestamp", "stop_id", "next_station_id", "line_numeric_id", "journey_id"]
+
 
 def _extract_gtfs_informations() -> dict[str, pd.DataFrame]:
     """
-    Loads GTFS data files: stop_times, trips, calendar, and stops.
+    Loads the small GTFS files (trips, calendar and stops) and locates stop_times.
 
-    Returns a dictionary with the DataFrames.
+    Returns a dictionary with the DataFrames and the path of the stop_times file.
     """
     try:
-        files = get_datalake_file(data_category="schedule", folder="2025", subfolder="april")
+        files = get_datalake_file(*EXTRACTION_CONFIG["schedule"]["datalake"])
 
         stop_times_file = next(f for f in files if f.endswith("stop_times.txt"))
         trips_file = next(f for f in files if f.endswith("trips.txt"))
         calendar_file = next(f for f in files if f.endswith("calendar.txt"))
         stops_file = next(f for f in files if f.endswith("stops.txt"))
 
-        df_stop_times = pd.read_csv(stop_times_file)
-        df_trips = pd.read_csv(trips_file)
-        df_calendar = pd.read_csv(calendar_file)
-        df_stops = pd.read_csv(stops_file)
+        df_trips = read_typed_csv(trips_file, "gtfs_trips")
+        df_calendar = read_typed_csv(calendar_file, "gtfs_calendar")
+        df_stops = read_typed_csv(stops_file, "gtfs_stops")
 
         return {
-            "stop_times": df_stop_times,
+            "stop_times_file": stop_times_file,
             "trips": df_trips,
             "calendar": df_calendar,
             "stops": df_stops,
         }
 
-    except (StopIteration, FileNotFoundError, pd.errors.ParserError) as e:
+    except (StopIteration, FileNotFoundError, ValueError, pd.errors.ParserError) as e:
         logger.error(f"Failed to load GTFS data: {e}")
         return {}
 
 
-def extract_schedule_informations() -> pd.DataFrame:
+def _numeric_ids(values: pd.Series, pattern: str) -> pd.Series:
+    """First number matching `pattern` in each value, computed once per distinct value."""
+    codes, uniques = pd.factorize(values.astype(str) if values.dtype != "category" else values)
+    numbers = pd.Series(np.asarray(uniques, dtype=object)).str.extract(pattern)[0].astype(float).to_numpy()
+    return pd.Series(np.where(codes >= 0, numbers[codes.clip(min=0)], np.nan), index=values.index)
+
+
+def _build_trip_lookup(df_trips: pd.DataFrame, df_calendar: pd.DataFrame) -> pd.DataFrame:
     """
-    Processes schedule data from GTFS files and merges them into a single DataFrame.
-    Returns a DataFrame with arrival_timestamp, stop_id (from parent_station),
-    next_station_id, line_numeric_id, and journey_id.
+    Line numeric ID and service start date of each trip, indexed by trip_id.
+
+    The line is the number of the route_id, or of the trip_id for routes without one.
     """
-    logger.info("Extracting GTFS data...")
+    trips = df_trips.drop_duplicates("trip_id").copy()
+    trip_ids = trips["trip_id"].astype(str)
+
+    line_numeric_id = _numeric_ids(trips["route_id"], r"C0*(\d+)")
+    missing = line_numeric_id.isna()
+    if missing.any():
+        fallback = _numeric_ids(trip_ids[missing], r"C0*(\d+)").fillna(_numeric_ids(trip_ids[missing], r"(\d+)"))
+        line_numeric_id[missing] = fallback
+
+    start_dates = pd.Series(
+        pd.to_datetime(df_calendar["start_date"].astype(str), format="%Y%m%d", errors="coerce").to_numpy(),
+        index=df_calendar["service_id"].astype(str),
+    )
+    start_dates = start_dates[~start_dates.index.duplicated()]
+
+    return pd.DataFrame(
+        {
+            "line_numeric_id": line_numeric_id.to_numpy(),
+            "start_date": start_dates.reindex(trips["service_id"].astype(str)).to_numpy(),
+        },
+        index=pd.Index(trip_ids.to_numpy(), name="trip_id"),
+    )
+
+
+def _build_stop_lookup(df_stops: pd.DataFrame) -> pd.Series:
+    """Numeric ID of the parent station of each stop, indexed by stop_id."""
+    stops = df_stops.drop_duplicates("stop_id")
+    return pd.Series(
+        _numeric_ids(stops["parent_station"], r"(\d+)").to_numpy(),
+        index=pd.Index(stops["stop_id"].astype(str).to_numpy(), name="stop_id"),
+    )
+
+
+def _seconds_since_service_day(times: pd.Series) -> np.ndarray:
+    """
+    Seconds of HH:MM:SS times since the start of the service day, parsed once per distinct time.
+
+    GTFS times past midnight of the service day go beyond 24:00:00. Invalid times are NaN.
+    """
+    codes, uniques = pd.factorize(times)
+    parts = pd.Series(np.asarray(uniques, dtype=object), dtype=object).str.extract(r"^\s*(\d+):(\d{2}):(\d{2})\s*$")
+    parts = parts.astype(float)
+    seconds = (parts[0] * 3600 + parts[1] * 60 + parts[2]).to_numpy()
+    return np.where(codes >= 0, seconds[codes.clip(min=0)], np.nan)
+
+
+def _process_stop_times(chunk: pd.DataFrame, trips: pd.DataFrame, stops: pd.Series) -> pd.DataFrame:
+    """Schedule rows of a chunk of stop_times holding complete trips."""
+    trip_ids = chunk["trip_id"].astype(str).to_numpy()
+    order = np.lexsort((chunk["stop_sequence"].to_numpy(), trip_ids))
+    trip_ids = trip_ids[order]
+    chunk = chunk.iloc[order]
+
+    trip_info = trips.reindex(trip_ids)
+    seconds = _seconds_since_service_day(chunk["arrival_time"])
+    arrival_timestamp = pd.to_datetime(trip_info["start_date"].to_numpy()) + pd.to_timedelta(seconds, unit="s")
+
+    stop_id = stops.reindex(chunk["stop_id"].astype(str).to_numpy()).to_numpy()
+    same_trip = np.append(trip_ids[1:] == trip_ids[:-1], False)
+    next_station_id = np.where(same_trip, np.append(stop_id[1:], np.nan), np.nan)
+
+    df = pd.DataFrame(
+        {
+            "arrival_timestamp": arrival_timestamp,
+            "stop_id": pd.array(stop_id, dtype="Int64"),
+            "next_station_id": pd.array(next_station_id, dtype="Int64"),
+            "line_numeric_id": pd.array(trip_info["line_numeric_id"].to_numpy(), dtype="Int64"),
+            "journey_id": trip_ids.astype(object),
+        }
+    )
+    return df.dropna(subset=["arrival_timestamp", "stop_id", "line_numeric_id"]).reset_index(drop=True)
 
-    gtfs_data = _extract_gtfs_informations()
 
-    logger.info("GTFS data extracted successfully. Starting to process...")
+def iter_schedule_informations(chunksize: int = 500_000) -> Iterator[pd.DataFrame]:
+    """
+    Process the GTFS schedule one chunk of stop_times at a time.
+
+    Trips, calendar and stops are reduced once to lookups of the line numeric ID and
+    service start date of each trip and the parent station of each stop. stop_times is
+    then read in chunks, the last trip of a chunk being completed by the next one so
+    the next station of a stop is always found. Arrival times are counted in seconds
+    from the service start date, so times past 24:00:00 fall on the next day.
+
+    Parameters
+    ----------
+    chunksize : int, optional
+        Number of stop_times rows read at once
+
+    Yields
+    ------
+    pd.DataFrame
+        Schedule rows with arrival_timestamp, stop_id (from parent_station),
+        next_station_id, line_numeric_id and journey_id
+
+    Raises
+    ------
+    Exception
+        If a chunk of stop_times fails to be processed, once the previous chunks are yielded
+    """
+    logger.info("Extracting GTFS data...")
 
+    gtfs_data = _extract_gtfs_informations()
     if not gtfs_data:
         logger.error("No GTFS data available for processing.")
-        return pd.DataFrame()
+        return
 
     try:
-        df_stop_times = gtfs_data["stop_times"]
-        df_trips = gtfs_data["trips"]
-        df_calendar = gtfs_data["calendar"]
-        df_stops = gtfs_data["stops"]
-
-        df_stop_times["stop_sequence"] = df_stop_times["stop_sequence"].astype(int)
-
-        if "route_id" in df_trips.columns:
-            logger.debug(f"Sample route_id values: {df_trips['route_id'].sample(min(5, len(df_trips))).tolist()}")
-
-        df = df_stop_times.merge(df_trips[["trip_id", "route_id", "service_id"]], on="trip_id", how="left")
-        df = df.merge(df_calendar[["service_id", "start_date", "end_date"]], on="service_id", how="left")
-        df = df.merge(df_stops[["stop_id", "parent_station"]], on="stop_id", how="left")
-        logger.debug(f"Merged datasets: {df.shape}")
-
-        df["start_date"] = pd.to_datetime(df["start_date"], format="%Y%m%d", errors="coerce")
-        df["arrival_time"] = pd.to_datetime(df["arrival_time"], format="%H:%M:%S", errors="coerce").dt.time
-
-        logger.debug(
-            f"NaN values - start_date: {df['start_date'].isna().sum()}, arrival_time: {df['arrival_time'].isna().sum()}, parent_station: {df['parent_station'].isna().sum()}"
-        )
-
-        df["service_date"] = df["start_date"]
-        mask = df["service_date"].notna() & df["arrival_time"].notna()
-        logger.info(f"Rows with valid service_date and arrival_time: {mask.sum()} of {len(df)}")
-
-        df.loc[mask, "arrival_timestamp"] = pd.to_datetime(
-            df.loc[mask, "service_date"].astype(str) + " " + df.loc[mask, "arrival_time"].astype(str)
-        )
-        df.loc[~mask, "arrival_timestamp"] = pd.NaT
-        logger.info(f"NaN values in arrival_timestamp: {df['arrival_timestamp'].isna().sum()}")
-
-        logger.info("Extracting line numeric IDs from `route_id` and `trip_id`")
-
-        route_pattern = r"C0*(\d+)"
-        df["route_numeric"] = df["route_id"].astype(str).str.extract(route_pattern).astype(float)
-        trip_pattern = r"C0*(\d+)"
-        df["trip_numeric"] = df["trip_id"].astype(str).str.extract(trip_pattern).astype(float)
-        df["any_numeric"] = df["trip_id"].astype(str).str.extract(r"(\d+)").astype(float)
-        df["line_numeric_id"] = df["route_numeric"].fillna(df["trip_numeric"]).fillna(df["any_numeric"]).astype("Int64")
-
-        df["journey_id"] = df["trip_id"].astype(str)
-        logger.debug(f"Stored full trip_id as journey_id, sample: {df['journey_id'].sample(min(5, len(df))).tolist()}")
-
-        df = df.drop(columns=["route_numeric", "trip_numeric", "any_numeric"])
-
-        logger.debug(f"Sample parent_station values: {df['parent_station'].sample(min(5, len(df))).tolist()}")
-        df["stop_id"] = df["parent_station"].str.extract(r"(\d+)").astype(float).astype("Int64")
+        trips = _build_trip_lookup(gtfs_data["trips"], gtfs_data["calendar"])
+        stops = _build_stop_lookup(gtfs_data["stops"])
+        reader = read_typed_csv(gtfs_data["stop_times_file"], "gtfs_stop_times", chunksize=chunksize)
+    except Exception as e:
+        logger.error(f"Failed to prepare GTFS schedule lookups: {e}", exc_info=True)
+        return
 
-        df = df.sort_values(["trip_id", "stop_sequence"])
+    logger.info(f"GTFS lookups built for {len(trips)} trips and {len(stops)} stops. Processing stop_times...")
 
-        df["next_station_id"] = df.groupby("trip_id")["stop_id"].shift(-1)
+    carry = None
+    done_trips = set()
+    split_trips = 0
+    rows = 0
+    try:
+        with reader:
+            for chunk in reader:
+                chunk = chunk.astype({"trip_id": str, "arrival_time": str, "stop_id": str})
+                if carry is not None:
+                    chunk = pd.concat([carry, chunk], ignore_index=True)
+
+                last_trip = chunk["trip_id"].iat[-1]
+                is_last_trip = (chunk["trip_id"] == last_trip).to_numpy()
+                carry = chunk[is_last_trip]
+                complete = chunk[~is_last_trip]
+                if complete.empty:
+                    continue
+
+                chunk_trips = complete["trip_id"].unique()
+                split_trips += int(pd.Index(chunk_trips).isin(done_trips).sum())
+                done_trips.update(chunk_trips)
+
+                df = _process_stop_times(complete, trips, stops)
+                rows += len(df)
+                yield df
+
+        if carry is not None and not carry.empty:
+            df = _process_stop_times(carry, trips, stops)
+            rows += len(df)
+            yield df
 
-        before_dropna = len(df)
-        df = df[["arrival_timestamp", "stop_id", "next_station_id", "line_numeric_id", "journey_id"]].dropna(
-            subset=["arrival_timestamp", "stop_id", "line_numeric_id"]
-        )
-        after_dropna = len(df)
-        logger.debug(f"After dropna, rows dropped: {before_dropna - after_dropna}, remaining: {after_dropna}")
+    except Exception as e:
+        # The chunks already yielded may be loaded, the consumer must know the schedule is incomplete
+        logger.error(f"Failed to process GTFS schedule data: {e}", exc_info=True)
+        raise
 
-        logger.info("GTFS schedule data processed successfully.")
+    if split_trips:
+        logger.warning(f"{split_trips} trips are not contiguous in stop_times, their last stops miss the next station")
+    logger.info(f"GTFS schedule data processed successfully: {rows} rows.")
 
-        return df
 
-    except Exception as e:
-        logger.error(f"Failed to process GTFS schedule data: {e}")
-        logger.error(f"Error traceback: {str(e)}", exc_info=True)
+def extract_schedule_informations(chunksize: int = 500_000) -> pd.DataFrame:
+    """
+    Processes schedule data from GTFS files into a single DataFrame.
+    Returns a DataFrame with arrival_timestamp, stop_id (from parent_station),
+    next_station_id, line_numeric_id, and journey_id.
+    """
+    try:
+        chunks = list(iter_schedule_informations(chunksize))
+    except Exception:
+        return pd.DataFrame()
+    if not chunks:
         return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
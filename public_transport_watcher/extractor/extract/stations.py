@@ -1,5 +1,6 @@
 import pandas as pd
 
+from public_transport_watcher.extractor.configuration import EXTRACTION_CONFIG
 from public_transport_watcher.logging_config import get_logger
 from public_transport_watcher.utils import get_datalake_file
 
@@ -19,7 +20,7 @@ def extract_stations_informations() -> pd.DataFrame:
     logger.info("Starting metro stations information extraction")
 
     try:
-        stations_file = get_datalake_file("geography", "stations")
+        stations_file = get_datalake_file(*EXTRACTION_CONFIG["stations"]["datalake"])
         if not stations_file:
             logger.error("No station files found in datalake")
             return pd.DataFrame()
@@ -0,0 +1,103 @@
+import importlib.util
+
+import pandas as pd
+
+from public_transport_watcher.extractor.configuration import CSV_SCHEMAS, EXTRACTION_CONFIG
+from public_transport_watcher.logging_config import get_logger
+
+logger = get_logger()
+
+
+def read_typed_csv(path: str, schema: str, engine: str | None = None, **kwargs):
+    """
+    Read a CSV file with the columns and dtypes of its schema.
+
+    The header is checked against the schema before the file is parsed, then only the
+    columns of the schema are read, repeated codes as categories and integers in
+    compact dtypes.
+
+    Parameters
+    ----------
+    path : str
+        Path of the file
+    schema : str
+        Name of the schema in `CSV_SCHEMAS`
+    engine : str, optional
+        CSV engine, defaults to `EXTRACTION_CONFIG["csv"]["engine"]`. Chunked reads and
+        a missing pyarrow fall back to the C engine.
+    **kwargs
+        Other arguments of `pd.read_csv`, e.g. `iterator` or `skiprows`
+
+    Returns
+    -------
+    pd.DataFrame or TextFileReader
+        The file, or a reader of its chunks
+
+    Raises
+    ------
+    ValueError
+        If the columns of the file do not match the schema
+    """
+    spec = CSV_SCHEMAS[schema]
+    columns = spec["columns"]
+    names = spec.get("names")
+
+    header = pd.read_csv(path, sep=spec["sep"], encoding=spec["encoding"], nrows=0).columns
+    engine = _engine(engine, chunked=bool(kwargs.get("iterator") or kwargs.get("chunksize")))
+    dtypes = {column: dtype for column, dtype in columns.items() if dtype is not None}
+
+    if names is not None:
+        if len(header) != len(names):
+            raise ValueError(f"{path} has {len(header)} columns, the {schema} schema maps {len(names)}: {names}")
+        if engine == "pyarrow":
+            # pyarrow selects the columns by their labels in the file
+            labels = {header[names.index(column)]: column for column in columns}
+            df = pd.read_csv(
+                path,
+                sep=spec["sep"],
+                encoding=spec["encoding"],
+                usecols=list(labels),
+                dtype={label: dtypes[column] for label, column in labels.items() if column in dtypes},
+                engine=engine,
+                **kwargs,
+            )
+            return _string_categories(df.rename(columns=labels)[[name for name in names if name in columns]])
+        kwargs.update(names=names, header=0)
+    else:
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"{path} misses the columns {missing} of the {schema} schema")
+
+    df = pd.read_csv(
+        path,
+        sep=spec["sep"],
+        encoding=spec["encoding"],
+        usecols=list(columns),
+        dtype=dtypes,
+        engine=engine,
+        **kwargs,
+    )
+    if engine == "pyarrow":
+        # Columns in the order of the file, as with the C engine
+        return _string_categories(df[[column for column in header if column in columns]])
+    return df
+
+
+def _engine(engine: str | None, chunked: bool) -> str:
+    engine = engine or EXTRACTION_CONFIG.get("csv", {}).get("engine", "c")
+    if engine != "pyarrow":
+        return engine
+    if chunked:
+        return "c"
+    if importlib.util.find_spec("pyarrow") is None:
+        logger.warning("pyarrow is not installed, reading CSV files with the C engine")
+        return "c"
+    return engine
+
+
+def _string_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Make the categories strings, as with the C engine, so the files of both engines can be merged."""
+    for column in df.select_dtypes("category").columns:
+        if df[column].cat.categories.inferred_type != "string":
+            df[column] = df[column].cat.rename_categories(df[column].cat.categories.astype(str))
+    return df
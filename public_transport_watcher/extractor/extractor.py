@@ -1,19 +1,24 @@
+from typing import Callable
+
 from public_transport_watcher.extractor.configuration import EXTRACTION_CONFIG
 from public_transport_watcher.extractor.extract import (
+    NavigoProgress,
     extract_addresses_informations,
     extract_air_quality_informations,
-    extract_navigo_validations_informations,
-    extract_schedule_informations,
     extract_stations_informations,
     extract_traffic_informations,
     extract_transport_categories_informations,
     extract_transport_lines_informations,
+    get_navigo_period_files,
+    iter_navigo_validations,
+    iter_schedule_informations,
 )
 from public_transport_watcher.extractor.extract.real_time import (
     extract_weather_informations,
     get_latest_air_quality_csv,
 )
 from public_transport_watcher.extractor.insert import (
+    ScheduleLoader,
     insert_addresses_informations,
     insert_navigo_validations,
     insert_schedule_informations,
@@ -21,22 +26,54 @@ from public_transport_watcher.extractor.insert import (
     insert_transport_categories,
     insert_transport_lines,
 )
+from public_transport_watcher.extractor.manifest import DatalakeManifest
 from public_transport_watcher.logging_config import get_logger
-from public_transport_watcher.utils import get_query_result
+from public_transport_watcher.utils import get_datalake_file, get_query_result
 
 logger = get_logger()
 
 
 class Extractor:
-    def __init__(self):
+    """
+    Runs the extraction and insertion steps of each data source.
+
+    Parameters
+    ----------
+    manifest : DatalakeManifest, optional
+        Record of the loaded datalake files. The steps whose files are all loaded and
+        unchanged are skipped, and only the new or changed Navigo periods are loaded.
+        If None, every step loads its files.
+    """
+
+    def __init__(self, manifest: DatalakeManifest | None = None):
         self.extract_config = EXTRACTION_CONFIG
+        self.manifest = manifest
+
+    def _load_datalake_step(self, step: str, folder: list[str] | None, load: Callable[[], bool]):
+        """Run a step, unless the manifest records its datalake files as loaded and unchanged."""
+        if self.manifest is None or not folder:
+            return load()
+
+        try:
+            files = sorted(get_datalake_file(*folder))
+        except (ValueError, FileNotFoundError) as e:
+            logger.warning(f"Cannot check the datalake files of {step}, loading them: {e}")
+            return load()
+
+        return self.manifest.run(step, files, load)
 
     def extract_stations_data(self):
         config = self.extract_config.get("stations")
         batch_size = config.get("batch_size", 1000)
-        stations_df = extract_stations_informations()
-        if not stations_df.empty:
+
+        def load():
+            stations_df = extract_stations_informations()
+            if stations_df.empty:
+                return False
             insert_stations(stations_df, batch_size)
+            return True
+
+        self._load_datalake_step("stations", config.get("datalake"), load)
 
     def extract_navigo_validations(self):
         config = self.extract_config.get("navigo")
@@ -45,16 +82,62 @@ class Extractor:
             logger.error("No existing stations found. Import stations data first.")
             return
 
-        navigo_df = extract_navigo_validations_informations(config)
-        if not navigo_df.empty:
-            insert_navigo_validations(navigo_df)
+        if self.manifest is None:
+            # Each chunk is inserted before the next one is extracted
+            for navigo_df in iter_navigo_validations(config):
+                insert_navigo_validations(navigo_df)
+            return
+
+        progress = NavigoProgress(config.get("progress_file"))
+        period_files = self._pending_navigo_periods(config, progress)
+        if not period_files:
+            logger.info("Skipping navigo, the files of every period are already loaded")
+            return
+
+        files_config = {}
+        for key, files in period_files.items():
+            year, period = key.split("/", 1)
+            files_config.setdefault(int(year), []).append(period)
+            self.manifest.start("navigo", files)
+
+        try:
+            for navigo_df in iter_navigo_validations({**config, "files": files_config}, progress):
+                insert_navigo_validations(navigo_df)
+        finally:
+            for key, files in period_files.items():
+                self.manifest.finish(files, progress.is_done(key))
+
+    def _pending_navigo_periods(self, config: dict, progress: NavigoProgress) -> dict[str, list[str]]:
+        """Files of the Navigo periods which are new or changed since they were loaded."""
+        pending = {}
+        for key, files in get_navigo_period_files(config["files"]).items():
+            if not self.manifest.pending(files):
+                continue
+            if progress.is_done(key):
+                if self.manifest.adopt("navigo", files):
+                    # Loaded before the manifest existed
+                    continue
+                # Changed since it was loaded, the whole period is loaded again
+                progress.mark(key, 0)
+            elif progress.rows(key) and self.manifest.changed(files):
+                # Interrupted while loading another content, its row offset does not apply to the new one
+                logger.warning(f"Navigo files of {key} changed during their load, loading the whole period again")
+                progress.mark(key, 0)
+            pending[key] = files
+        return pending
 
     def extract_addresses_informations(self):
         config = self.extract_config.get("addresses", {})
         batch_size = config.get("batch_size", 1000)
-        addresses_df = extract_addresses_informations()
-        if not addresses_df.empty:
+
+        def load():
+            addresses_df = extract_addresses_informations()
+            if addresses_df.empty:
+                return False
             insert_addresses_informations(addresses_df, batch_size)
+            return True
+
+        self._load_datalake_step("addresses", config.get("datalake"), load)
 
     def extract_traffic_data(self):
         return extract_traffic_informations()
@@ -82,13 +165,22 @@ class Extractor:
 
     def extract_schedule_data(self):
         config = self.extract_config.get("schedule", {})
-        schedule_df = extract_schedule_informations()
-        if not schedule_df.empty:
-            insert_schedule_informations(schedule_df, config)
+
+        def load():
+            with ScheduleLoader(config) as loader:
+                for schedule_df in iter_schedule_informations(config.get("chunk_size", 500000)):
+                    if not schedule_df.empty:
+                        insert_schedule_informations(schedule_df, config, loader)
+            return bool(loader.inserted)
+
+        self._load_datalake_step("schedule", config.get("datalake"), load)
 
 
 if __name__ == "__main__":
-    extractor = Extractor()
+    manifest_config = EXTRACTION_CONFIG.get("manifest", {})
+    manifest = DatalakeManifest(manifest_config.get("version", "1")) if manifest_config.get("enabled", True) else None
+
+    extractor = Extractor(manifest)
     extractor.extract_stations_data()
     extractor.extract_navigo_validations()
     extractor.extract_addresses_informations()
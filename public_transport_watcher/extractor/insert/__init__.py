@@ -1,15 +1,18 @@
 from .addresses import insert_addresses_informations
 from .categ import insert_transport_categories
 from .navigo import insert_navigo_validations
-from .schedule import insert_schedule_informations
+from .schedule import ScheduleLoader, insert_schedule_informations
+from .station_hour import refresh_station_hour
 from .stations import insert_stations
 from .transport import insert_transport_lines
 
 __all__ = [
+    "ScheduleLoader",
     "insert_addresses_informations",
     "insert_navigo_validations",
     "insert_schedule_informations",
     "insert_stations",
     "insert_transport_lines",
     "insert_transport_categories",
+    "refresh_station_hour",
 ]
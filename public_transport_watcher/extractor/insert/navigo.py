@@ -1,24 +1,53 @@
-from datetime import datetime
-from typing import Tuple
+import io
 
 import pandas as pd
-from sqlalchemy import insert
+from sqlalchemy import text
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from public_transport_watcher.db.models.transport import (
-    Traffic,
-    TransportStation,
-    TransportTimeBin,
-)
+from public_transport_watcher.db.models.transport import TransportStation
+from public_transport_watcher.extractor.insert.station_hour import refresh_station_hour
 from public_transport_watcher.logging_config import get_logger
 from public_transport_watcher.utils import get_engine
 
 logger = get_logger()
 
+_STAGING_COLUMNS = ["station_id", "start_timestamp", "end_timestamp", "cat_day", "validations"]
+
+_STAGING_TABLE = """
+CREATE TEMPORARY TABLE navigo_staging (
+    station_id INTEGER NOT NULL,
+    start_timestamp TIMESTAMP NOT NULL,
+    end_timestamp TIMESTAMP NOT NULL,
+    cat_day transport.cat_day,
+    validations INTEGER
+) ON COMMIT DROP
+"""
+
+# Relies on the unique index on (start_timestamp, end_timestamp); existing time bins are kept as is
+_UPSERT_TIME_BINS = """
+INSERT INTO transport.time_bin (start_timestamp, end_timestamp, cat_day)
+SELECT DISTINCT ON (start_timestamp, end_timestamp) start_timestamp, end_timestamp, cat_day
+FROM navigo_staging
+ORDER BY start_timestamp, end_timestamp
+ON CONFLICT (start_timestamp, end_timestamp) DO NOTHING
+"""
+
+_UPSERT_TRAFFIC = """
+INSERT INTO transport.traffic (station_id, time_bin_id, validations)
+SELECT s.station_id, tb.id, s.validations
+FROM navigo_staging s
+JOIN transport.time_bin tb
+    ON tb.start_timestamp = s.start_timestamp AND tb.end_timestamp = s.end_timestamp
+ON CONFLICT (station_id, time_bin_id) DO UPDATE SET validations = excluded.validations
+"""
+
 
 def insert_navigo_validations(df: pd.DataFrame, batch_size: int = 10000) -> None:
     """
-    Insert Navigo validations data into the database with simplified bulk operations.
+    Insert Navigo validations data into the database with set-based bulk operations.
+
+    Each batch is streamed with COPY into a temporary staging table, then the time bins
+    and the traffic are upserted from it with one statement each.
 
     Parameters
     ----------
@@ -48,11 +77,16 @@ def insert_navigo_validations(df: pd.DataFrame, batch_size: int = 10000) -> None
                 stations_data = batch_df[["station_id", "station_name"]].drop_duplicates()
                 _upsert_stations(conn, stations_data)
 
-                time_bins_data = batch_df[["start_timestamp", "end_timestamp", "cat_day"]].drop_duplicates()
-                _upsert_time_bins(conn, time_bins_data)
+                _stage_batch(conn, batch_df)
+                _upsert_time_bins(conn)
+                _upsert_traffic(conn)
 
-                traffic_data = batch_df[["station_id", "start_timestamp", "end_timestamp", "validations"]]
-                _upsert_traffic(conn, traffic_data)
+                refresh_station_hour(
+                    conn,
+                    start=batch_df["start_timestamp"].min(),
+                    end=batch_df["start_timestamp"].max(),
+                    station_ids=stations_data["station_id"].tolist(),
+                )
 
             logger.info(f"Completed batch {batch_num + 1}/{num_batches}")
 
@@ -67,16 +101,21 @@ def _prepare_data(df: pd.DataFrame) -> pd.DataFrame:
     """Prepare and validate the input data."""
     logger.info("Preparing data...")
 
-    processed_df = df.copy()
-
-    processed_df = processed_df.dropna(subset=["ida", "jour", "tranche_horaire", "validations_horaires"])
+    # Only the remaining rows are copied, the copy keeps the column assignments below off a view of the input
+    processed_df = df.dropna(subset=["ida", "jour", "tranche_horaire", "validations_horaires"]).copy()
 
     processed_df["station_id"] = processed_df["ida"].astype(int)
     processed_df["station_name"] = processed_df["libelle_arret"].astype(str)
     processed_df["validations"] = processed_df["validations_horaires"].astype(float).astype(int)
 
-    timestamps = processed_df.apply(lambda row: _create_timestamps(row["jour"], row["tranche_horaire"]), axis=1)
-    processed_df[["start_timestamp", "end_timestamp"]] = pd.DataFrame(timestamps.tolist(), index=processed_df.index)
+    # Days and time ranges ("7H-8H") are parsed once per distinct value instead of once per row
+    day_codes, days = pd.factorize(processed_df["jour"])
+    days = pd.DatetimeIndex(pd.to_datetime(pd.Series(days))).normalize()
+    range_codes, ranges = pd.factorize(processed_df["tranche_horaire"].astype(str))
+    hours = pd.Series(ranges).str.extract(r"(\d+)H?-(\d+)H?").astype(int).to_numpy()
+    day_start = days.to_numpy()[day_codes]
+    processed_df["start_timestamp"] = day_start + pd.to_timedelta(hours[range_codes, 0], unit="h").to_numpy()
+    processed_df["end_timestamp"] = day_start + pd.to_timedelta(hours[range_codes, 1], unit="h").to_numpy()
 
     logger.info(f"Prepared {len(processed_df)} records")
     return processed_df
@@ -97,72 +136,24 @@ def _upsert_stations(conn, stations_df: pd.DataFrame) -> None:
     conn.execute(stmt)
 
 
-def _upsert_time_bins(conn, time_bins_df: pd.DataFrame) -> None:
-    """Insert time bins, handling duplicates with try/catch."""
-    if time_bins_df.empty:
-        return
+def _stage_batch(conn, batch_df: pd.DataFrame) -> None:
+    """Stream a batch into a temporary staging table with COPY."""
+    rows = batch_df.drop_duplicates(["station_id", "start_timestamp", "end_timestamp"], keep="last")
 
-    unique_bins = time_bins_df.drop_duplicates(["start_timestamp", "end_timestamp"], keep="last")
+    buffer = io.StringIO()
+    rows[_STAGING_COLUMNS].to_csv(buffer, index=False, header=False, date_format="%Y-%m-%d %H:%M:%S")
+    buffer.seek(0)
 
-    for _, row in unique_bins.iterrows():
-        try:
-            stmt = insert(TransportTimeBin).values(row.to_dict())
-            conn.execute(stmt)
-        except Exception:
-            pass
+    with conn.connection.cursor() as cursor:
+        cursor.execute(_STAGING_TABLE)
+        cursor.copy_expert(f"COPY navigo_staging ({', '.join(_STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer)
 
 
-def _upsert_traffic(conn, traffic_df: pd.DataFrame) -> None:
-    """Insert or update traffic data."""
-    if traffic_df.empty:
-        return
+def _upsert_time_bins(conn) -> None:
+    """Insert the missing time bins of the staged batch."""
+    conn.execute(text(_UPSERT_TIME_BINS))
+
 
-    traffic_records = []
-
-    for _, row in traffic_df.iterrows():
-        from sqlalchemy import text
-
-        time_bin_query = text(
-            """
-        SELECT id FROM transport.time_bin 
-        WHERE start_timestamp = :start_ts AND end_timestamp = :end_ts
-        """
-        )
-
-        result = conn.execute(time_bin_query, {"start_ts": row["start_timestamp"], "end_ts": row["end_timestamp"]})
-        time_bin_row = result.fetchone()
-
-        if time_bin_row:
-            traffic_records.append(
-                {"station_id": row["station_id"], "time_bin_id": time_bin_row[0], "validations": row["validations"]}
-            )
-
-    if traffic_records:
-        try:
-            stmt = pg_insert(Traffic).values(traffic_records)
-            stmt = stmt.on_conflict_do_update(
-                index_elements=["station_id", "time_bin_id"], set_={"validations": stmt.excluded.validations}
-            )
-            conn.execute(stmt)
-        except Exception:
-            for record in traffic_records:
-                try:
-                    stmt = insert(Traffic).values(record)
-                    conn.execute(stmt)
-                except Exception:
-                    pass
-
-
-def _create_timestamps(date_val: str, time_range_str: str) -> Tuple[datetime, datetime]:
-    """Create start and end timestamps from date and time range."""
-    if isinstance(date_val, pd.Timestamp):
-        date_obj = date_val.to_pydatetime().date()
-    else:
-        date_obj = datetime.strptime(date_val, "%Y-%m-%d").date()
-
-    start_hour, end_hour = map(int, time_range_str.replace("H", "").split("-"))
-
-    start_timestamp = datetime.combine(date_obj, datetime.min.time()).replace(hour=start_hour)
-    end_timestamp = datetime.combine(date_obj, datetime.min.time()).replace(hour=end_hour)
-
-    return start_timestamp, end_timestamp
+def _upsert_traffic(conn) -> int:
+    """Insert or update the traffic of the staged batch, resolving the time bins with a join."""
+    return conn.execute(text(_UPSERT_TRAFFIC)).rowcount
@@ -1,14 +1,136 @@
+import io
+
 import pandas as pd
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import text
 
-from public_transport_watcher.db.models import Schedule, Transport, TransportStation
 from public_transport_watcher.logging_config import get_logger
 from public_transport_watcher.utils import get_engine
 
 logger = get_logger()
 
+_COPY_COLUMNS = ['"timestamp"', "station_id", "next_station_id", "transport_id", "journey_id"]
+
+_LOAD_TABLE = "transport.schedule_load"
+
+# Without indexes nor foreign keys, which are built once the load is complete
+_CREATE_LOAD_TABLE = f"""
+DROP TABLE IF EXISTS {_LOAD_TABLE};
+CREATE TABLE {_LOAD_TABLE} (LIKE transport.schedule INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+"""
+
+# The loaded table takes the name, keys and id sequence of transport.schedule in one transaction,
+# readers wait for the lock then read the new table
+_SWAP = f"""
+ALTER TABLE {_LOAD_TABLE}
+    ADD CONSTRAINT schedule_load_pkey PRIMARY KEY (id),
+    ADD CONSTRAINT schedule_station_id_fkey FOREIGN KEY (station_id) REFERENCES transport.station(id),
+    ADD CONSTRAINT schedule_transport_id_fkey FOREIGN KEY (transport_id) REFERENCES transport.transport(id),
+    ADD CONSTRAINT fk_schedule_next_station FOREIGN KEY (next_station_id) REFERENCES transport.station(id);
+LOCK TABLE transport.schedule IN ACCESS EXCLUSIVE MODE;
+ALTER SEQUENCE transport.schedule_id_seq OWNED BY {_LOAD_TABLE}.id;
+DROP TABLE transport.schedule;
+ALTER TABLE {_LOAD_TABLE} RENAME TO schedule;
+ALTER TABLE transport.schedule RENAME CONSTRAINT schedule_load_pkey TO schedule_pkey
+"""
+
+
+class ScheduleLoader:
+    """
+    Bulk loader of schedule chunks into `transport.schedule`.
+
+    The station and transport IDs are read once when the loader is entered, then each
+    chunk is filtered against them and streamed with COPY.
+
+    With `swap` in the configuration, the chunks are loaded into a new table which
+    replaces `transport.schedule` in a single transaction when the loader exits without
+    error, so readers never see a partially loaded schedule. The new table is dropped
+    if the load fails or no row was loaded.
+
+    Parameters
+    ----------
+    config : dict
+        Schedule configuration, with an optional `swap` flag
+    """
+
+    def __init__(self, config: dict):
+        self.swap = config.get("swap", False)
+        self.table = _LOAD_TABLE if self.swap else "transport.schedule"
+        self.inserted = 0
+        self.engine = None
+
+    def __enter__(self):
+        self.engine = get_engine()
+        with self.engine.begin() as conn:
+            self.station_ids = pd.Index(conn.execute(text("SELECT id FROM transport.station")).scalars().all())
+            self.transport_ids = pd.Index(conn.execute(text("SELECT id FROM transport.transport")).scalars().all())
+            if self.swap:
+                conn.execute(text(_CREATE_LOAD_TABLE))
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if self.swap:
+                with self.engine.begin() as conn:
+                    if exc_type is None and self.inserted:
+                        conn.execute(text(_SWAP))
+                        logger.info(f"transport.schedule replaced by the {self.inserted} loaded schedules")
+                    else:
+                        conn.execute(text(f"DROP TABLE IF EXISTS {_LOAD_TABLE}"))
+                        logger.warning("Schedule load failed or empty, transport.schedule is left unchanged")
+        finally:
+            self.engine.dispose()
+        return False
+
+    def filter(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Keep the rows with a timestamp and journey whose stations and line exist."""
+        valid = (
+            df["arrival_timestamp"].notna()
+            & df["journey_id"].notna()
+            & df["stop_id"].isin(self.station_ids)
+            & df["line_numeric_id"].isin(self.transport_ids)
+            & (df["next_station_id"].isna() | df["next_station_id"].isin(self.station_ids))
+        )
+        return df[valid.to_numpy(dtype=bool)]
+
+    def insert(self, df: pd.DataFrame) -> int:
+        """
+        Filter a chunk of schedules and stream it into the target table.
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Schedules with arrival_timestamp, stop_id, next_station_id, line_numeric_id
+            and journey_id columns
+
+        Returns
+        -------
+        int
+            Number of inserted rows
+        """
+        rows = self.filter(df)
+        skipped = len(df) - len(rows)
+        if skipped:
+            logger.debug(f"Skipped {skipped} schedules with a missing timestamp or an unknown station or line")
+        if rows.empty:
+            return 0
+
+        buffer = io.StringIO()
+        rows[["arrival_timestamp", "stop_id", "next_station_id", "line_numeric_id", "journey_id"]].to_csv(
+            buffer, index=False, header=False, date_format="%H:%M:%S"
+        )
+        buffer.seek(0)
+
+        with self.engine.begin() as conn:
+            with conn.connection.cursor() as cursor:
+                cursor.copy_expert(
+                    f"COPY {self.table} ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+                )
 
-def insert_schedule_informations(df: pd.DataFrame, config: dict) -> None:
+        self.inserted += len(rows)
+        return len(rows)
+
+
+def insert_schedule_informations(df: pd.DataFrame, config: dict, loader: ScheduleLoader | None = None) -> int:
     """
     Insert schedule data into the database.
 
@@ -16,77 +138,32 @@ def insert_schedule_informations(df: pd.DataFrame, config: dict) -> None:
     ----------
     df : pd.DataFrame
         DataFrame containing schedule data to be inserted.
+    config : dict
+        Schedule configuration
+    loader : ScheduleLoader, optional
+        Loader of a multi-chunk load, a loader is opened for `df` alone if None
+
+    Returns
+    -------
+    int
+        Number of inserted rows
     """
     logger.info("Inserting schedule data into the database...")
-    chunk_size = config.get("batch_size", 5000)
 
     if df.empty:
         logger.warning("Empty schedule DataFrame. Nothing to insert.")
-        return
-
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    session = Session()
+        return 0
 
     try:
-        existing_station_ids = {id for (id,) in session.query(TransportStation.id).distinct().all()}
-        df = df[df["stop_id"].isin(existing_station_ids)]
-
-        existing_transport_ids = {id for (id,) in session.query(Transport.id).distinct().all()}
-        df = df[df["line_numeric_id"].isin(existing_transport_ids)]
-
-        logger.debug(f"Preparing to insert {len(df)} rows")
-
-        inserted = 0
-        skipped_timestamp = 0
-        skipped_next_station = 0
-        skipped_errors = 0
-
-        total_chunks = (len(df) + chunk_size - 1) // chunk_size
-        logger.info(f"Processing {total_chunks} chunks of {chunk_size} rows each")
-
-        for chunk_idx, chunk_start in enumerate(range(0, len(df), chunk_size)):
-            chunk_end = min(chunk_start + chunk_size, len(df))
-            chunk = df.iloc[chunk_start:chunk_end]
-            chunk_inserted = 0
-
-            for _, row in chunk.iterrows():
-                if pd.isnull(row["arrival_timestamp"]):
-                    skipped_timestamp += 1
-                    continue
-
-                if pd.notnull(row["next_station_id"]) and row["next_station_id"] not in existing_station_ids:
-                    skipped_next_station += 1
-                    continue
-
-                try:
-                    schedule = Schedule(
-                        timestamp=row["arrival_timestamp"],
-                        station_id=int(row["stop_id"]),
-                        next_station_id=int(row["next_station_id"]) if pd.notnull(row["next_station_id"]) else None,
-                        transport_id=int(row["line_numeric_id"]),
-                        journey_id=str(row["journey_id"]) if pd.notnull(row["journey_id"]) else None,
-                    )
-                    session.add(schedule)
-                    inserted += 1
-                    chunk_inserted += 1
-                except Exception as row_error:
-                    logger.error(f"Error inserting schedule row: {row_error}")
-                    skipped_errors += 1
-                    continue
-
-            session.commit()
-            logger.info(f"Chunk {chunk_idx + 1}/{total_chunks} complete: inserted {chunk_inserted} rows")
-
-        logger.info(f"Insertion complete: {inserted} schedules inserted")
-        logger.debug(
-            f"Skipped rows - null timestamp: {skipped_timestamp}, invalid next_station: {skipped_next_station}, errors: {skipped_errors}"
-        )
+        if loader is None:
+            with ScheduleLoader(config) as loader:
+                inserted = loader.insert(df)
+        else:
+            inserted = loader.insert(df)
 
     except Exception as e:
-        session.rollback()
         logger.error(f"Error during schedule insertion: {e}")
         raise
 
-    finally:
-        session.close()
+    logger.info(f"Insertion complete: {inserted} schedules inserted")
+    return inserted
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from public_transport_watcher.logging_config import get_logger
+
+logger = get_logger()
+
+# day_of_week follows the Python convention (Monday is 0), like the predictor features
+_REFRESH = """
+INSERT INTO transport.station_hour
+    (station_id, start_timestamp, time_bin_id, hour, day_of_week, month, cat_day, validations)
+SELECT
+    t.station_id,
+    tb.start_timestamp,
+    tb.id,
+    EXTRACT(HOUR FROM tb.start_timestamp),
+    EXTRACT(ISODOW FROM tb.start_timestamp) - 1,
+    EXTRACT(MONTH FROM tb.start_timestamp),
+    tb.cat_day,
+    t.validations
+FROM transport.traffic t
+JOIN transport.time_bin tb ON t.time_bin_id = tb.id
+WHERE {filters}
+ON CONFLICT (station_id, start_timestamp) DO UPDATE SET
+    time_bin_id = excluded.time_bin_id,
+    cat_day = excluded.cat_day,
+    validations = excluded.validations
+"""
+
+_IS_PARTITIONED = """
+SELECT EXISTS (
+    SELECT 1 FROM pg_partitioned_table p
+    JOIN pg_class c ON c.oid = p.partrelid
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'transport' AND c.relname = 'station_hour'
+)
+"""
+
+_TIME_BIN_RANGE = "SELECT MIN(start_timestamp), MAX(start_timestamp) FROM transport.time_bin"
+
+
+def refresh_station_hour(
+    conn,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    station_ids: list[int] | None = None,
+) -> int:
+    """
+    Upsert the station-hour facts of the traffic rows in a time range.
+
+    `transport.station_hour` holds one row per station and hour with the calendar features
+    of the predictor, so forecasting and dashboard reads do not join the traffic, station
+    and time bin tables. It is refreshed after each load of validations.
+
+    Parameters
+    ----------
+    conn : Connection
+        Open connection, the refresh is part of its transaction
+    start : datetime, optional
+        First hour to refresh. If None, there is no lower bound.
+    end : datetime, optional
+        Last hour to refresh. If None, there is no upper bound.
+    station_ids : list[int], optional
+        Stations to refresh. If None, every station is refreshed.
+
+    Returns
+    -------
+    int
+        Number of upserted rows
+    """
+    filters = ["TRUE"]
+    params = {}
+    if start is not None:
+        filters.append("tb.start_timestamp >= :start")
+        params["start"] = pd.Timestamp(start).to_pydatetime()
+    if end is not None:
+        filters.append("tb.start_timestamp <= :end")
+        params["end"] = pd.Timestamp(end).to_pydatetime()
+    if station_ids is not None:
+        filters.append("t.station_id = ANY(:station_ids)")
+        params["station_ids"] = [int(station_id) for station_id in station_ids]
+
+    if conn.execute(text(_IS_PARTITIONED)).scalar():
+        if start is None or end is None:
+            first, last = conn.execute(text(_TIME_BIN_RANGE)).one()
+            start, end = start or first, end or last
+        if start is not None and end is not None:
+            _create_monthly_partitions(conn, start, end)
+
+    upserted = conn.execute(text(_REFRESH.format(filters=" AND ".join(filters))), params).rowcount
+    logger.info(f"Refreshed {upserted} station-hour rows")
+    return upserted
+
+
+def _create_monthly_partitions(conn, start, end):
+    for month_start in pd.date_range(pd.Timestamp(start).to_period("M").start_time, pd.Timestamp(end), freq="MS"):
+        month_end = month_start + pd.offsets.MonthBegin(1)
+        conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS transport.station_hour_{month_start:%Y%m} "
+                f"PARTITION OF transport.station_hour "
+                f"FOR VALUES FROM ('{month_start:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}')"
+            )
+        )
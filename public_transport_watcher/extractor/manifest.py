@@ -0,0 +1,226 @@
+from datetime import datetime
+import hashlib
+import os
+from typing import Callable
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from public_transport_watcher.db.models import DatalakeFile
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.utils import get_engine
+
+logger = get_logger()
+
+_HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class DatalakeManifest:
+    """
+    Record of the datalake files loaded by the Extractor, in `transport.datalake_file`.
+
+    A file is pending unless it was loaded by the same extractor version and its content
+    has not changed since. Its size and modification time are compared first, its content
+    hash only when they differ, so checking unchanged files does not read them.
+
+    Parameters
+    ----------
+    version : str
+        Extractor version, the files loaded by another version are loaded again
+    """
+
+    def __init__(self, version: str):
+        self.version = str(version)
+
+    @staticmethod
+    def _key(path: str) -> str:
+        datalake_root = os.getenv("DATALAKE_ROOT")
+        return os.path.relpath(path, datalake_root) if datalake_root else path
+
+    def _entries(self, files: list[str]) -> dict[str, DatalakeFile]:
+        engine = get_engine()
+        try:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    select(DatalakeFile).where(DatalakeFile.path.in_([self._key(path) for path in files]))
+                ).all()
+        finally:
+            engine.dispose()
+        return {row.path: row for row in rows}
+
+    def pending(self, files: list[str]) -> list[str]:
+        """
+        Return the files which are new, changed, not completely loaded or loaded by another version.
+
+        Parameters
+        ----------
+        files : list[str]
+            Paths of datalake files
+
+        Returns
+        -------
+        list[str]
+            Pending files, in the order of `files`
+        """
+        entries = self._entries(files)
+        pending = []
+        touched = {}
+        for path in files:
+            entry = entries.get(self._key(path))
+            if entry is None or entry.status != "loaded" or entry.extractor_version != self.version:
+                pending.append(path)
+            elif _content_changed(path, entry, touched):
+                pending.append(path)
+
+        if touched:
+            # Same content with a new time, e.g. a copied file, is not hashed again next time
+            self._update(touched)
+        return pending
+
+    def changed(self, files: list[str]) -> list[str]:
+        """
+        Return the files whose content differs from the one recorded by the last `start`, whatever
+        their status, e.g. files replaced while their load was interrupted. Files never recorded are changed.
+
+        Parameters
+        ----------
+        files : list[str]
+            Paths of datalake files
+
+        Returns
+        -------
+        list[str]
+            Changed files, in the order of `files`
+        """
+        entries = self._entries(files)
+        touched = {}
+        changed = [
+            path
+            for path in files
+            if entries.get(self._key(path)) is None or _content_changed(path, entries[self._key(path)], touched)
+        ]
+        if touched:
+            self._update(touched)
+        return changed
+
+    def _update(self, mtimes: dict[str, float]) -> None:
+        engine = get_engine()
+        try:
+            with engine.begin() as conn:
+                for path, mtime in mtimes.items():
+                    conn.execute(update(DatalakeFile).where(DatalakeFile.path == path).values(mtime=mtime))
+        finally:
+            engine.dispose()
+
+    def start(self, step: str, files: list[str]) -> None:
+        """Record the files as being loaded by a step, with their current size, time and hash."""
+        now = datetime.now()
+        entries = []
+        for path in files:
+            stat = os.stat(path)
+            entries.append(
+                {
+                    "path": self._key(path),
+                    "step": step,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "content_hash": _file_hash(path),
+                    "extractor_version": self.version,
+                    "status": "loading",
+                    "updated_at": now,
+                }
+            )
+        if not entries:
+            return
+
+        stmt = pg_insert(DatalakeFile).values(entries)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["path"],
+            set_={column: stmt.excluded[column] for column in entries[0] if column != "path"},
+        )
+        engine = get_engine()
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt)
+        finally:
+            engine.dispose()
+
+    def finish(self, files: list[str], loaded: bool) -> None:
+        """Record the files as loaded, or failed to be loaded."""
+        if not files:
+            return
+        engine = get_engine()
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    update(DatalakeFile)
+                    .where(DatalakeFile.path.in_([self._key(path) for path in files]))
+                    .values(status="loaded" if loaded else "failed", updated_at=datetime.now())
+                )
+        finally:
+            engine.dispose()
+
+    def adopt(self, step: str, files: list[str]) -> bool:
+        """
+        Record as loaded files which were loaded before the manifest existed.
+
+        Returns whether the files were adopted, i.e. none of them was recorded yet.
+        """
+        if self._entries(files):
+            return False
+        self.start(step, files)
+        self.finish(files, loaded=True)
+        return True
+
+    def run(self, step: str, files: list[str], load: Callable[[], bool]) -> bool | None:
+        """
+        Run a load step unless all its files are already loaded and unchanged.
+
+        Parameters
+        ----------
+        step : str
+            Name of the step
+        files : list[str]
+            Datalake files read by the step
+        load : Callable[[], bool]
+            Loads the files, returns whether they were loaded
+
+        Returns
+        -------
+        bool or None
+            Result of `load`, or None if the step was skipped
+        """
+        if not self.pending(files):
+            logger.info(f"Skipping {step}, its {len(files)} datalake files are already loaded")
+            return None
+
+        self.start(step, files)
+        loaded = False
+        try:
+            loaded = bool(load())
+        finally:
+            self.finish(files, loaded)
+        return loaded
+
+
+def _content_changed(path: str, entry: DatalakeFile, touched: dict[str, float]) -> bool:
+    """
+    Whether a file differs from its manifest entry. Its size and time are compared first, and
+    its hash only when they differ. A same content with a new time is added to `touched`.
+    """
+    stat = os.stat(path)
+    if stat.st_size == entry.size and stat.st_mtime == entry.mtime:
+        return False
+    if stat.st_size != entry.size or _file_hash(path) != entry.content_hash:
+        return True
+    touched[entry.path] = stat.st_mtime
+    return False
+
+
+def _file_hash(path: str) -> str:
+    """SHA-256 of the content of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -1,17 +1,50 @@
+from .backtest import run_backtest
 from .calculate_hourly_profiles import calculate_hourly_profile
-from .find_optimal_params import find_optimal_params
+from .day_ahead import correct_intraday, forecast_day_ahead
+from .fast_forecast import fast_forecast
+from .find_optimal_params import find_optimal_params, save_station_params
+from .forecast_frame import ForecastFrame
+from .forecast_store import ForecastSnapshot, read_latest_forecasts, write_forecast
+from .get_bulk_data import get_bulk_data_from_db
 from .get_data import get_data_from_db
+from .grid_search import run_grid_search
+from .model_cache import ArimaModelCache, forecast_with_cache
+from .param_store import ArimaParamStore
 from .predict_navigo_validations import predict_navigo_validations
 from .preprocess_data import preprocess_data
 from .process_all_stations import run_all_stations
+from .profile_cube import HourlyProfileCube, build_profile_cube
+from .series_cache import StationSeriesCache
 from .visualize_predictions import visualize_predictions
+from .work_queue import FileWorkQueue, PostgresWorkQueue, run_coordinator, run_worker
 
 __all__ = [
+    "ArimaModelCache",
+    "ArimaParamStore",
+    "FileWorkQueue",
+    "ForecastFrame",
+    "ForecastSnapshot",
+    "HourlyProfileCube",
+    "PostgresWorkQueue",
+    "StationSeriesCache",
+    "build_profile_cube",
     "calculate_hourly_profile",
+    "correct_intraday",
+    "fast_forecast",
     "find_optimal_params",
+    "forecast_day_ahead",
+    "forecast_with_cache",
+    "get_bulk_data_from_db",
     "get_data_from_db",
     "predict_navigo_validations",
     "preprocess_data",
+    "read_latest_forecasts",
     "run_all_stations",
+    "run_backtest",
+    "run_coordinator",
+    "run_grid_search",
+    "run_worker",
+    "save_station_params",
     "visualize_predictions",
+    "write_forecast",
 ]
@@ -0,0 +1,365 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import csv
+from datetime import datetime, timedelta
+import json
+import math
+import os
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.fast_forecast import fast_forecast
+from public_transport_watcher.predictor.arima.get_bulk_data import _format_station_data, get_bulk_data_from_db
+from public_transport_watcher.predictor.arima.predict_navigo_validations import predict_navigo_validations
+from public_transport_watcher.predictor.configuration import ARIMA_CONFIG
+
+logger = get_logger()
+
+ENGINES = ("blend", "arima", "fast")
+
+STATION_CLASSES = ("low", "medium", "high")
+
+
+def run_backtest(
+    stations_data: dict[int, pd.DataFrame],
+    engines=ENGINES,
+    hours: int = 24,
+    replay_hours=None,
+    station_params: dict | None = None,
+    default_order: tuple = (1, 1, 1),
+    workers: int = 1,
+    fast_engine_config: dict | None = None,
+) -> dict:
+    """
+    Replay historical hours and score the forecasts of each engine against the observed validations.
+
+    At each replayed hour, every engine only sees the data observed before that hour and
+    forecasts the complete validations of that hour and of the next one. The engines are:
+
+    - 'blend': `predict_navigo_validations`, the production blend
+    - 'arima': the station ARIMA order alone, fitted on the last four weeks of hourly data
+    - 'fast': `fast_forecast`, run on all stations at once
+
+    Parameters
+    ----------
+    stations_data : dict[int, pd.DataFrame]
+        Traffic data per station, as returned by `get_bulk_data_from_db`
+    engines : list[str]
+        Engines to evaluate, among `ENGINES`
+    hours : int
+        Number of replayed hours, ending one hour before the latest observation
+    replay_hours : list, optional
+        Explicit hours to replay, overriding `hours`
+    station_params : dict, optional
+        ARIMA order per station, stations without one use `default_order`
+    default_order : tuple
+        ARIMA order of the stations missing from `station_params`
+    workers : int
+        Number of worker processes running the per-station engines
+    fast_engine_config : dict, optional
+        Keyword arguments of `fast_forecast`
+
+    Returns
+    -------
+    dict
+        Report with, for each engine, the MAE and RMSE per station class and the wall and CPU time per station
+    """
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        raise ValueError(f"Unknown backtest engines: {sorted(unknown)}")
+
+    stations_data = {int(station_id): df for station_id, df in stations_data.items() if not df.empty}
+    station_params = {int(station_id): tuple(order) for station_id, order in (station_params or {}).items()}
+
+    if replay_hours is None:
+        end = max(df.index.max() for df in stations_data.values()).floor("h") - timedelta(hours=1)
+        replay_hours = pd.date_range(end=end, periods=hours, freq="h")
+    replay_hours = pd.DatetimeIndex(replay_hours)
+
+    classes = _station_classes(stations_data, replay_hours.min())
+    logger.info(
+        f"Backtesting {list(engines)} on {len(stations_data)} stations over {len(replay_hours)} hours "
+        f"({replay_hours.min()} to {replay_hours.max()})"
+    )
+
+    tasks = [
+        (engine, station_id, df, replay_hours, station_params.get(station_id, tuple(default_order)))
+        for engine in engines
+        if engine != "fast"
+        for station_id, df in stations_data.items()
+    ]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_backtest_station, *zip(*tasks)))
+    else:
+        results = [_backtest_station(*task) for task in tasks]
+
+    if "fast" in engines:
+        results.extend(_backtest_fast(stations_data, replay_hours, fast_engine_config or {}))
+
+    return _build_report(results, classes, replay_hours, engines)
+
+
+def _backtest_station(engine, station_id, df, replay_hours, order):
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    actual = df["validations"].groupby(df.index.floor("h")).sum()
+
+    rows = []
+    for replay_hour in replay_hours:
+        history = df[df.index < replay_hour]
+        if history.empty:
+            continue
+        try:
+            forecast = _forecast_station(engine, history, station_id, order, replay_hour)
+        except Exception as e:
+            logger.error(f"Error backtesting {engine} for station {station_id} at {replay_hour}: {e}")
+            continue
+        rows.extend(_score(engine, station_id, replay_hour, forecast, actual))
+
+    times = {station_id: (time.perf_counter() - wall_start, time.process_time() - cpu_start)}
+    return {"engine": engine, "rows": rows, "times": times}
+
+
+def _forecast_station(engine, history, station_id, order, replay_hour):
+    if engine == "blend":
+        predictions, _ = predict_navigo_validations(
+            history, station_id, order, current_time=replay_hour.to_pydatetime()
+        )
+        return predictions["forecast_complete"].to_numpy(dtype=np.float64)
+
+    series = history["validations"].iloc[-28 * 24 :].to_numpy(dtype=np.float64)
+    # Forecast up to the hour after the replayed one, even if the last hours are missing
+    steps = int((replay_hour - history.index.max().floor("h")) // pd.Timedelta(hours=1)) + 1
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        forecast = ARIMA(series, order=order).fit().forecast(steps=steps)
+    return np.asarray(forecast)[-2:]
+
+
+def _backtest_fast(stations_data, replay_hours, fast_engine_config):
+    actuals = {
+        station_id: df["validations"].groupby(df.index.floor("h")).sum() for station_id, df in stations_data.items()
+    }
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+
+    rows = []
+    for replay_hour in replay_hours:
+        history = {station_id: df[df.index < replay_hour] for station_id, df in stations_data.items()}
+        try:
+            forecast = fast_forecast(history, current_time=replay_hour.to_pydatetime(), **fast_engine_config)
+        except Exception as e:
+            logger.error(f"Error backtesting fast engine at {replay_hour}: {e}")
+            continue
+        for station_id in forecast.unique_station_ids:
+            station_forecast = forecast.forecast_complete[forecast.station_id == station_id]
+            rows.extend(_score("fast", int(station_id), replay_hour, station_forecast, actuals[int(station_id)]))
+
+    # The stations are forecasted together, so the time is shared evenly between them
+    station_time = (
+        (time.perf_counter() - wall_start) / len(stations_data),
+        (time.process_time() - cpu_start) / len(stations_data),
+    )
+    return [{"engine": "fast", "rows": rows, "times": dict.fromkeys(stations_data, station_time)}]
+
+
+def _score(engine, station_id, replay_hour, forecast, actual):
+    rows = []
+    for step, value in enumerate(forecast[:2]):
+        target_hour = replay_hour + timedelta(hours=step)
+        if target_hour in actual.index and np.isfinite(value):
+            rows.append(
+                {
+                    "engine": engine,
+                    "station_id": station_id,
+                    "replay_hour": replay_hour,
+                    "horizon": step,
+                    "forecast": float(value),
+                    "actual": float(actual[target_hour]),
+                }
+            )
+    return rows
+
+
+def _station_classes(stations_data, before):
+    """Split the stations in volume terciles by their mean hourly validations before `before`."""
+    means = pd.Series(
+        {station_id: df.loc[df.index < before, "validations"].mean() for station_id, df in stations_data.items()}
+    ).fillna(0)
+
+    classes = {}
+    for station_class, station_ids in zip(STATION_CLASSES, np.array_split(means.sort_values().index, 3)):
+        classes.update({int(station_id): station_class for station_id in station_ids})
+    return classes
+
+
+def _metrics(errors):
+    if len(errors) == 0:
+        return {"mae": None, "rmse": None, "forecasts": 0}
+    return {
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(math.sqrt(np.mean(np.square(errors)))),
+        "forecasts": int(len(errors)),
+    }
+
+
+def _build_report(results, classes, replay_hours, engines):
+    rows = pd.DataFrame(
+        [row for result in results for row in result["rows"]],
+        columns=["engine", "station_id", "replay_hour", "horizon", "forecast", "actual"],
+    )
+    rows["station_class"] = rows["station_id"].map(classes)
+    rows["error"] = rows["forecast"] - rows["actual"]
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "replay_hours": {
+            "start": replay_hours.min().isoformat(),
+            "end": replay_hours.max().isoformat(),
+            "count": len(replay_hours),
+        },
+        "stations": {str(station_id): station_class for station_id, station_class in sorted(classes.items())},
+        "engines": {},
+    }
+
+    for engine in engines:
+        engine_rows = rows[rows["engine"] == engine]
+        times = [times for result in results if result["engine"] == engine for times in result["times"].values()]
+        wall_times = [wall_time for wall_time, _ in times]
+        cpu_times = [cpu_time for _, cpu_time in times]
+
+        report["engines"][engine] = {
+            "wall_time": float(sum(wall_times)),
+            "cpu_time": float(sum(cpu_times)),
+            "wall_time_per_station": float(np.mean(wall_times)) if wall_times else None,
+            "cpu_time_per_station": float(np.mean(cpu_times)) if cpu_times else None,
+            "metrics": {
+                "all": _metrics(engine_rows["error"].to_numpy()),
+                **{
+                    station_class: _metrics(engine_rows.loc[engine_rows["station_class"] == station_class, "error"])
+                    for station_class in STATION_CLASSES
+                },
+            },
+        }
+
+        overall = report["engines"][engine]["metrics"]["all"]
+        if overall["forecasts"]:
+            logger.info(
+                f"Backtest {engine}: MAE {overall['mae']:.2f}, RMSE {overall['rmse']:.2f} over {overall['forecasts']} "
+                f"forecasts, {report['engines'][engine]['wall_time_per_station']:.3f}s per station"
+            )
+
+    return report
+
+
+def save_report(report: dict, path: str) -> str:
+    """
+    Save a backtest report as JSON, or as a flat CSV with one row per engine and station class.
+
+    Parameters
+    ----------
+    report : dict
+        Report returned by `run_backtest`
+    path : str
+        Destination file, the format is chosen from its '.json' or '.csv' extension
+
+    Returns
+    -------
+    str
+        Path of the written file
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ["engine", "station_class", "mae", "rmse", "forecasts", "wall_time_per_station", "cpu_time_per_station"]
+            )
+            for engine, engine_report in report["engines"].items():
+                for station_class, metrics in engine_report["metrics"].items():
+                    writer.writerow(
+                        [
+                            engine,
+                            station_class,
+                            metrics["mae"],
+                            metrics["rmse"],
+                            metrics["forecasts"],
+                            engine_report["wall_time_per_station"],
+                            engine_report["cpu_time_per_station"],
+                        ]
+                    )
+    else:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    logger.info(f"Backtest report saved to {path}")
+    return path
+
+
+def load_fixture(path: str) -> dict[int, pd.DataFrame]:
+    """
+    Load traffic data from a local CSV file instead of the database.
+
+    The file needs the 'station_id', 'start_timestamp', 'cat_day' and 'validations' columns
+    of `transport.traffic` joined with `transport.time_bin`.
+
+    Parameters
+    ----------
+    path : str
+        CSV file
+
+    Returns
+    -------
+    dict[int, pd.DataFrame]
+        Traffic data per station, in the same format as `get_bulk_data_from_db`
+    """
+    df = pd.read_csv(path, parse_dates=["start_timestamp"])
+    return {int(station_id): _format_station_data([frame]) for station_id, frame in df.groupby("station_id")}
+
+
+def main():
+    config = ARIMA_CONFIG.get("backtest", {})
+
+    parser = argparse.ArgumentParser(description="Backtest the forecasting engines on historical hours")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=config.get("engines", list(ENGINES)))
+    parser.add_argument("--hours", type=int, default=config.get("hours", 24), help="Number of replayed hours")
+    parser.add_argument("--stations", type=int, nargs="+", default=None, help="Stations to backtest (default: all)")
+    parser.add_argument("--workers", type=int, default=config.get("workers", 1), help="Number of worker processes")
+    parser.add_argument("--fixture", default=None, help="CSV file of traffic data to use instead of the database")
+    parser.add_argument(
+        "--output", nargs="+", default=[config.get("report_file", "backtest_report.json")], help="JSON or CSV reports"
+    )
+
+    args = parser.parse_args()
+
+    from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
+
+    predictor = ArimaPredictor()
+    if args.fixture:
+        stations_data = load_fixture(args.fixture)
+        if args.stations:
+            stations_data = {station_id: stations_data[station_id] for station_id in args.stations}
+    else:
+        stations_data = get_bulk_data_from_db(args.stations, weeks=(predictor.bulk_config or {}).get("history_weeks"))
+
+    report = run_backtest(
+        stations_data,
+        engines=args.engines,
+        hours=args.hours,
+        station_params=predictor.station_params,
+        default_order=ARIMA_CONFIG.get("default_order", (1, 1, 1)),
+        workers=args.workers,
+        fast_engine_config=predictor.fast_engine_config,
+    )
+
+    for path in args.output:
+        save_report(report, path)
+
+
+if __name__ == "__main__":
+    main()
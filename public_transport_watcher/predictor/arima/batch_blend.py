@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from public_transport_watcher.predictor.arima.profile_cube import HourlyProfileCube
+
+
+def profile_cubes(stations_data, station_ids, profile_cube):
+    """Cubes holding the profiles of all the stations: the precomputed one and one built for the stations it misses."""
+    missing = [station_id for station_id in station_ids if profile_cube is None or station_id not in profile_cube]
+    cubes = [profile_cube] if profile_cube is not None else []
+    if missing:
+        cubes.append(HourlyProfileCube.build({station_id: stations_data[station_id] for station_id in missing}))
+    return cubes
+
+
+def historical_profiles(cubes, station_ids, month, day_of_week, hours):
+    """Historical profile of each station at each of `hours`, as a [station, hour] matrix."""
+    historical = np.full((len(station_ids), len(hours)), np.nan)
+    for cube in cubes:
+        in_cube = np.array([station_id in cube for station_id in station_ids])
+        if in_cube.any():
+            historical[in_cube] = cube.lookup_many(station_ids[in_cube], month, day_of_week, hours)
+    return historical
+
+
+def recent_matrix(stations_data, station_ids, recent_days):
+    """
+    Validations of the last `recent_days` days as a [station, hour] matrix, NaN where no data.
+
+    Each row ends at the last observed hour of its station, as `_get_recent_data` does for a
+    single station. Returns the matrix and the hour of day of the last column of each row.
+    """
+    width = recent_days * 24 + 1
+
+    positions, offsets, values = [], [], []
+    end_hours = np.empty(len(station_ids), dtype=np.int64)
+    for position, station_id in enumerate(station_ids):
+        df = stations_data[station_id]
+        hours = pd.DatetimeIndex(df.index).floor("h")
+        end = hours.max()
+        end_hours[position] = end.hour
+        offset = ((end - hours) // pd.Timedelta(hours=1)).to_numpy()
+        keep = offset < width
+        positions.append(np.full(int(keep.sum()), position))
+        offsets.append(offset[keep])
+        values.append(df["validations"].to_numpy(dtype=np.float64)[keep])
+
+    matrix = np.full((len(station_ids), width), np.nan)
+    matrix[np.concatenate(positions), width - 1 - np.concatenate(offsets)] = np.concatenate(values)
+    return matrix, end_hours
+
+
+def same_hour_observations(matrix, end_hours, hour):
+    """Observations of each row of a `recent_matrix` at `hour` of the day, oldest first."""
+    width = matrix.shape[1]
+    last = width - 1 - (end_hours - hour) % 24
+    columns = last[:, None] - 24 * np.arange(width // 24, -1, -1)
+    observations = matrix[np.arange(len(matrix))[:, None], np.maximum(columns, 0)]
+    return np.where(columns >= 0, observations, np.nan)
+
+
+def last_observations(matrix, count=3):
+    """Mean of the last `count` observations of each row, NaN for rows without any."""
+    valid = ~np.isnan(matrix)
+    rank_from_end = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1]
+    selected = valid & (rank_from_end <= count)
+    totals = np.where(selected, matrix, 0.0).sum(axis=1)
+    counts = selected.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+
+def blend(historical, recent, ar_forecast):
+    """
+    Weighted sum of the historical, recent and time series terms, with the weights of `_calculate_weights`.
+
+    All the arguments are [station, hour] matrices, the confidence in the time series term
+    is computed on its first hour.
+    """
+    has_historical = ~np.isnan(historical)
+    has_recent = ~np.isnan(recent)
+
+    # Consistency between the historical profile and the recent observations, as in `_calculate_weights`
+    compared = has_historical & has_recent
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratios = np.where(
+            compared & (historical > 0) & (recent > 0),
+            np.minimum(historical / recent, recent / historical),
+            0.0,
+        )
+        consistency = np.where(compared.any(axis=1), ratios.sum(axis=1) / compared.sum(axis=1), 0.0)
+
+        confidence = np.where(
+            has_historical[:, 0] & (historical[:, 0] > 0) & ~np.isnan(ar_forecast[:, 0]),
+            np.minimum(ar_forecast[:, 0] / historical[:, 0], historical[:, 0] / ar_forecast[:, 0]),
+            0.0,
+        )
+    confidence = np.clip(np.nan_to_num(confidence), 0.0, 1.0)
+
+    historical_weight = np.minimum(0.8, 0.5 + 0.3 * consistency)
+    recent_weight = 0.2 + 0.2 * (1 - consistency)
+    ar_weight = 0.1 * confidence
+    total_weight = historical_weight + recent_weight + ar_weight
+
+    historical_values = np.nan_to_num(historical)
+    recent_values = np.where(has_recent, recent, historical_values)
+    usable_ar = ~np.isnan(ar_forecast) & (ar_forecast >= 0) & (ar_forecast <= 1000)
+
+    return (
+        historical_values * (historical_weight / total_weight)[:, None]
+        + recent_values * (recent_weight / total_weight)[:, None]
+        + np.where(usable_ar, ar_forecast, 0.0) * (ar_weight / total_weight)[:, None]
+    )
@@ -3,7 +3,9 @@ import datetime
 import pandas as pd
 
 
-def calculate_hourly_profile(data_df: pd.DataFrame, current_time: datetime) -> pd.Series:
+def calculate_hourly_profile(
+    data_df: pd.DataFrame, current_time: datetime, profile_cube=None, station_id: int | None = None
+) -> pd.Series:
     """
     Calculate average hourly profile for a given day and month.
 
@@ -13,6 +15,10 @@ def calculate_hourly_profile(data_df: pd.DataFrame, current_time: datetime) -> p
         Preprocessed data
     current_time : datetime
         Current time
+    profile_cube : HourlyProfileCube, optional
+        Precomputed profiles read instead of grouping `data_df`
+    station_id : int, optional
+        Station ID, required to read the profile cube
 
     Returns
     -------
@@ -22,6 +28,9 @@ def calculate_hourly_profile(data_df: pd.DataFrame, current_time: datetime) -> p
     current_month = current_time.month
     current_day_of_week = current_time.weekday()
 
+    if profile_cube is not None and station_id is not None and station_id in profile_cube:
+        return profile_cube.profile(station_id, current_month, current_day_of_week)
+
     similar_hours = data_df[(data_df["month"] == current_month) & (data_df["day_of_week"] == current_day_of_week)]
 
     if not similar_hours.empty:
@@ -0,0 +1,153 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.batch_blend import (
+    blend,
+    historical_profiles,
+    last_observations,
+    profile_cubes,
+    recent_matrix,
+    same_hour_observations,
+)
+from public_transport_watcher.predictor.arima.forecast_frame import ForecastFrame
+from public_transport_watcher.predictor.arima.profile_cube import HourlyProfileCube
+
+logger = get_logger()
+
+
+def forecast_day_ahead(
+    stations_data: dict[int, pd.DataFrame],
+    start: datetime | None = None,
+    horizon: int = 24,
+    profile_cube: HourlyProfileCube | None = None,
+    recent_days: int = 28,
+) -> ForecastFrame:
+    """
+    Forecast every hour of the current or coming day(s) for all stations in one batch.
+
+    Each hour blends the historical profile of its month, weekday and day category with
+    the mean of the last three observations at the same hour, weighted by their consistency
+    as in `predict_navigo_validations`. The time series term is left out since it is not
+    reliable that far ahead.
+
+    Parameters
+    ----------
+    stations_data : dict[int, pd.DataFrame]
+        Traffic data per station indexed by datetime, as returned by `get_bulk_data_from_db`
+    start : datetime, optional
+        First forecasted hour, defaults to midnight of the current day, so the forecast computed
+        by the nightly job covers the day the intraday correction runs on
+    horizon : int
+        Number of forecasted hours, typically 24 or 48
+    profile_cube : HourlyProfileCube, optional
+        Precomputed historical profiles. Stations missing from it are profiled from `stations_data`.
+    recent_days : int
+        Number of days of recent data searched for the last same-hour observations
+
+    Returns
+    -------
+    ForecastFrame
+        Forecasts of the `horizon` hours of every station with data
+    """
+    if start is None:
+        start = pd.Timestamp(datetime.now()).normalize()
+    target_hours = pd.date_range(pd.Timestamp(start).floor("h"), periods=horizon, freq="h")
+
+    stations_data = {int(station_id): df for station_id, df in stations_data.items() if not df.empty}
+    station_ids = np.array(sorted(stations_data), dtype=np.int64)
+    if len(station_ids) == 0:
+        return ForecastFrame([], [], [], [])
+
+    cubes = profile_cubes(stations_data, station_ids, profile_cube)
+    historical = np.full((len(station_ids), horizon), np.nan)
+    for day in target_hours.normalize().unique():
+        columns = np.flatnonzero(target_hours.normalize() == day)
+        historical[:, columns] = historical_profiles(
+            cubes, station_ids, day.month, day.weekday(), target_hours.hour[columns]
+        )
+
+    matrix, end_hours = recent_matrix(stations_data, station_ids, recent_days)
+    recent_by_hour = np.column_stack(
+        [last_observations(same_hour_observations(matrix, end_hours, hour)) for hour in range(24)]
+    )
+    recent = recent_by_hour[:, target_hours.hour]
+
+    predictions = np.round(blend(historical, recent, np.full((len(station_ids), 1), np.nan)))
+
+    logger.info(
+        f"Day-ahead forecast of {len(station_ids)} stations for {horizon} hours "
+        f"({target_hours[0]} to {target_hours[-1]})"
+    )
+    return ForecastFrame(
+        np.repeat(station_ids, horizon),
+        np.tile(target_hours.values, len(station_ids)),
+        predictions.ravel(),
+        predictions.ravel(),
+    )
+
+
+def correct_intraday(
+    forecast: ForecastFrame,
+    stations_data: dict[int, pd.DataFrame],
+    now: datetime | None = None,
+    window: int = 3,
+    bounds: tuple = (0.5, 2.0),
+) -> ForecastFrame:
+    """
+    Rescale the remaining hours of a day-ahead forecast with the validations observed so far.
+
+    The factor of each station is the ratio between the observed and forecasted validations
+    of the last `window` hours, clipped to `bounds`. Stations without observations in the
+    window keep their forecast.
+
+    Parameters
+    ----------
+    forecast : ForecastFrame
+        Day-ahead forecast, as returned by `forecast_day_ahead`
+    stations_data : dict[int, pd.DataFrame]
+        Recent traffic data per station indexed by datetime
+    now : datetime, optional
+        Time of the correction, defaults to the current time
+    window : int
+        Number of elapsed hours compared with the forecast
+    bounds : tuple
+        Minimum and maximum correction factors
+
+    Returns
+    -------
+    ForecastFrame
+        Forecast with the hours from the current one onwards corrected
+    """
+    now = pd.Timestamp(now or datetime.now()).floor("h")
+    window_start = now - timedelta(hours=window)
+
+    observed = []
+    for station_id, df in stations_data.items():
+        elapsed = df.loc[(df.index >= window_start) & (df.index < now), "validations"]
+        if not elapsed.empty:
+            hourly = elapsed.groupby(elapsed.index.floor("h")).sum().rename_axis("target_hour").reset_index()
+            observed.append(hourly.assign(station_id=int(station_id)))
+    if not observed:
+        return forecast
+
+    compared = forecast.to_frame().merge(pd.concat(observed), on=["station_id", "target_hour"])
+    sums = compared.groupby("station_id")[["forecast_complete", "validations"]].sum()
+    sums = sums[sums["forecast_complete"] > 0]
+    factors = (sums["validations"] / sums["forecast_complete"]).clip(*bounds)
+
+    station_factors = pd.Series(forecast.station_id).map(factors).fillna(1.0).to_numpy()
+    remaining = forecast.target_hour >= np.datetime64(now)
+
+    logger.info(
+        f"Intraday correction of {len(factors)} stations "
+        f"(median factor {factors.median() if len(factors) else 1.0:.2f}) from {now}"
+    )
+    return ForecastFrame(
+        forecast.station_id,
+        forecast.target_hour,
+        np.where(remaining, np.round(forecast.forecast * station_factors), forecast.forecast),
+        np.where(remaining, np.round(forecast.forecast_complete * station_factors), forecast.forecast_complete),
+    )
@@ -1,14 +1,12 @@
 import json
-import math
 import os
 
 import pandas as pd
-from sklearn.metrics import mean_squared_error
-from statsmodels.tsa.arima.model import ARIMA
 
 from public_transport_watcher.logging_config import get_logger
-from public_transport_watcher.predictor.arima.preprocess_data import preprocess_data
-from public_transport_watcher.predictor.configuration import ARIMA_CONFIG, get_station_params_file
+from public_transport_watcher.predictor.arima.grid_search import run_grid_search
+from public_transport_watcher.predictor.arima.param_store import write_params_file
+from public_transport_watcher.predictor.configuration import ARIMA_CONFIG
 
 logger = get_logger()
 
@@ -26,41 +24,45 @@ def _load_station_params(station_id, params_file):
         except Exception as e:
             logger.error(f"Error loading ARIMA parameters from consolidated file for station {station_id}: {e}")
 
-    station_params_file = get_station_params_file(station_id)
-
-    if os.path.exists(station_params_file):
-        try:
-            with open(station_params_file, "r") as f:
-                params = json.load(f)
-            logger.info(f"ARIMA parameters loaded for station {station_id} from individual file: {params}")
-            return tuple(params)
-        except Exception as e:
-            logger.error(f"Error loading ARIMA parameters for station {station_id}: {e}")
-
     return None
 
 
-def _save_station_params(station_id, params, station_params, params_file):
-    station_params[station_id] = params
+def save_station_params(station_params, params_file, params_store=None, records=None, export=True):
+    """
+    Save the ARIMA parameters of all stations.
 
-    # Save to consolidated file
-    params_dict = {str(station_id): list(params) for station_id, params in station_params.items()}
+    With a parameters store, the store is the reference: the parameters are upserted
+    into it and the consolidated file is rewritten from it, so both always agree.
+    The file is written to a temporary file first and then moved in place,
+    so readers never see a partially written file.
+
+    Parameters
+    ----------
+    station_params : dict
+        Dictionary of station_id -> (p, d, q)
+    params_file : str
+        Path to consolidated parameters file
+    params_store : ArimaParamStore, optional
+        Store receiving the parameters
+    records : dict, optional
+        Dictionary of station_id -> (p, d, q) or grid search result upserted into the store,
+        defaults to `station_params`
+    export : bool
+        If False, the parameters are only upserted into the store and the consolidated file
+        is left to be rewritten once, at the end of a run. Ignored without store.
+    """
     try:
-        with open(params_file, "w") as f:
-            json.dump(params_dict, f, indent=2)
+        if params_store is not None:
+            params_store.upsert_many(records if records is not None else station_params)
+            if export:
+                params_store.export_json(params_file)
+            return
+
+        write_params_file(station_params, params_file)
         logger.info(f"Saved consolidated ARIMA parameters for {len(station_params)} stations")
     except Exception as e:
         logger.error(f"Error saving consolidated ARIMA parameters: {e}")
 
-    # Save to individual file
-    station_params_file = get_station_params_file(station_id)
-    try:
-        with open(station_params_file, "w") as f:
-            json.dump(params, f)
-        logger.info(f"ARIMA parameters saved for station {station_id}: {params}")
-    except Exception as e:
-        logger.error(f"Error saving ARIMA parameters for station {station_id}: {e}")
-
 
 def find_optimal_params(
     station_id: int,
@@ -71,6 +73,7 @@ def find_optimal_params(
     station_params: dict,
     params_file: str,
     train_ratio: float = 0.8,
+    params_store=None,
 ) -> tuple:
     """
     Find optimal ARIMA parameters for a station.
@@ -93,6 +96,8 @@ def find_optimal_params(
         Path to consolidated parameters file
     train_ratio : float
         Ratio of data to use for training
+    params_store : ArimaParamStore, optional
+        Store used instead of the consolidated file to read and save the parameters
 
     Returns
     -------
@@ -102,47 +107,41 @@ def find_optimal_params(
     if station_id in station_params:
         return station_params[station_id]
 
-    params = _load_station_params(station_id, params_file)
+    if params_store is not None:
+        params = params_store.get(station_id)
+    else:
+        params = _load_station_params(station_id, params_file)
     if params:
         station_params[station_id] = params
         return params
 
-    data_df = preprocess_data(df, station_id)
-    time_series = data_df["validations"].copy()
-
-    train_size = int(len(time_series) * train_ratio)
-    train, test = time_series[:train_size], time_series[train_size:]
-
-    best_score = float("inf")
     best_params = ARIMA_CONFIG["default_order"]
+    search_config = ARIMA_CONFIG.get("grid_search", {})
 
     try:
-        for p in p_range:
-            for d in d_range:
-                for q in q_range:
-                    # Skip the (0,0,0) model which doesn't make sense
-                    if p == 0 and d == 0 and q == 0:
-                        continue
-
-                    try:
-                        model = ARIMA(train, order=(p, d, q))
-                        model_fit = model.fit()
-                        predictions = model_fit.forecast(steps=len(test))
-                        mse = mean_squared_error(test, predictions)
-                        rmse = math.sqrt(mse)
-
-                        if rmse < best_score:
-                            best_score = rmse
-                            best_params = (p, d, q)
-
-                    except Exception as e:
-                        logger.debug(f"Error with ARIMA({p},{d},{q}) for station {station_id}: {e}")
-                        continue
-
-        logger.info(f"Best ARIMA parameters for station {station_id}: {best_params} (RMSE: {best_score:.2f})")
+        results = run_grid_search(
+            {station_id: df},
+            p_range,
+            d_range,
+            q_range,
+            top_k=search_config.get("top_k"),
+            prune_window=search_config.get("prune_window"),
+            train_ratio=train_ratio,
+            default_order=best_params,
+        )
+
+        if station_id in results:
+            best_params = results[station_id]["order"]
 
         station_params[station_id] = best_params
-        _save_station_params(station_id, best_params, station_params, params_file)
+        save_station_params(
+            station_params,
+            params_file,
+            params_store=params_store,
+            records={station_id: results.get(station_id, {"order": best_params})},
+            # Rewriting the whole file for each station makes a run quadratic, it is exported once at the end
+            export=False,
+        )
 
     except Exception as e:
         logger.error(f"Error finding optimal parameters for station {station_id}: {e}")
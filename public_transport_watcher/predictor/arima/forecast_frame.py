@@ -0,0 +1,170 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from public_transport_watcher.logging_config import get_logger
+
+logger = get_logger()
+
+
+class ForecastFrame:
+    """
+    Columnar store of the forecasts of a prediction run.
+
+    Each row is one forecasted hour of one station, stored as flat numpy arrays
+    so the run can be built in a single allocation and saved as a single file.
+    `len` is the number of rows, `n_stations` the number of stations.
+
+    Parameters
+    ----------
+    station_id : array-like
+        Station ID of each row
+    target_hour : array-like
+        Start of the forecasted hour of each row
+    forecast : array-like
+        Forecasted validations (the current hour only counts its remaining minutes)
+    forecast_complete : array-like
+        Forecasted validations for the whole hour
+    """
+
+    def __init__(self, station_id, target_hour, forecast, forecast_complete):
+        self.station_id = np.asarray(station_id, dtype=np.int64)
+        self.target_hour = np.asarray(target_hour, dtype="datetime64[ns]")
+        self.forecast = np.asarray(forecast, dtype=np.float64)
+        self.forecast_complete = np.asarray(forecast_complete, dtype=np.float64)
+
+        sizes = {len(self.station_id), len(self.target_hour), len(self.forecast), len(self.forecast_complete)}
+        if len(sizes) != 1:
+            raise ValueError("ForecastFrame columns must all have the same length")
+
+    @classmethod
+    def from_predictions(cls, station_ids: list[int], predictions: list) -> "ForecastFrame":
+        """
+        Build a ForecastFrame from the per-station outputs of `predict_navigo_validations`.
+
+        Parameters
+        ----------
+        station_ids : list[int]
+            Station IDs, in the same order as `predictions`
+        predictions : list
+            Forecast DataFrames with 'forecast' and 'forecast_complete' columns indexed by hour,
+            or plain sequences of forecasted values
+
+        Returns
+        -------
+        ForecastFrame
+            Forecasts of all the stations
+        """
+        horizons = [len(station_predictions) for station_predictions in predictions]
+        size = sum(horizons)
+
+        station_id = np.empty(size, dtype=np.int64)
+        target_hour = np.full(size, np.datetime64("NaT"), dtype="datetime64[ns]")
+        forecast = np.empty(size, dtype=np.float64)
+        forecast_complete = np.empty(size, dtype=np.float64)
+
+        start = 0
+        for sid, station_predictions, horizon in zip(station_ids, predictions, horizons):
+            end = start + horizon
+            station_id[start:end] = sid
+
+            if isinstance(station_predictions, pd.DataFrame):
+                target_hour[start:end] = station_predictions.index.values
+                forecast[start:end] = station_predictions["forecast"].to_numpy()
+                forecast_complete[start:end] = station_predictions["forecast_complete"].to_numpy()
+            else:
+                forecast[start:end] = np.asarray(station_predictions, dtype=np.float64)
+                forecast_complete[start:end] = forecast[start:end]
+
+            start = end
+
+        return cls(station_id, target_hour, forecast, forecast_complete)
+
+    def __len__(self):
+        return len(self.station_id)
+
+    @property
+    def unique_station_ids(self) -> np.ndarray:
+        """Distinct station IDs, in order of appearance (`station_id` holds the station of each row)."""
+        return pd.unique(self.station_id)
+
+    @property
+    def n_stations(self) -> int:
+        """Number of distinct stations."""
+        return len(self.unique_station_ids)
+
+    def totals(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Sum the forecasted validations of each station.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray]
+            (station IDs, total forecasted validations per station)
+        """
+        codes, station_ids = pd.factorize(self.station_id)
+        totals = np.bincount(codes, weights=self.forecast, minlength=len(station_ids))
+        return station_ids, totals
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the forecasts as a long DataFrame with one row per station and hour."""
+        return pd.DataFrame(
+            {
+                "station_id": self.station_id,
+                "target_hour": self.target_hour,
+                "forecast": self.forecast,
+                "forecast_complete": self.forecast_complete,
+            }
+        )
+
+    def window(self, start, hours: int = 2) -> "ForecastFrame":
+        """Return the forecasts of the `hours` hours starting at the hour of `start`."""
+        start = np.datetime64(pd.Timestamp(start).floor("h"), "ns")
+        rows = (self.target_hour >= start) & (self.target_hour < start + np.timedelta64(hours, "h"))
+        return ForecastFrame(
+            self.station_id[rows], self.target_hour[rows], self.forecast[rows], self.forecast_complete[rows]
+        )
+
+    def to_matrix(self) -> pd.DataFrame:
+        """Return the complete-hour forecasts as a station x hour DataFrame."""
+        return self.to_frame().pivot(index="station_id", columns="target_hour", values="forecast_complete")
+
+    def save(self, path: str) -> str:
+        """
+        Save the forecasts to a single compressed numpy archive.
+
+        Parameters
+        ----------
+        path : str
+            Destination file, the '.npz' extension is added if missing
+
+        Returns
+        -------
+        str
+            Path of the written file
+        """
+        if not path.endswith(".npz"):
+            path = f"{path}.npz"
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez_compressed(
+            path,
+            station_id=self.station_id,
+            target_hour=self.target_hour.astype(np.int64),
+            forecast=self.forecast,
+            forecast_complete=self.forecast_complete,
+        )
+        logger.info(f"Saved forecasts of {self.n_stations} stations to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "ForecastFrame":
+        """Load forecasts saved with `save`."""
+        with np.load(path) as data:
+            return cls(
+                data["station_id"],
+                data["target_hour"].astype("datetime64[ns]"),
+                data["forecast"],
+                data["forecast_complete"],
+            )
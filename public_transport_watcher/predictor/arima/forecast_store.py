@@ -0,0 +1,185 @@
+from datetime import datetime
+import io
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.forecast_frame import ForecastFrame
+from public_transport_watcher.utils import get_engine
+
+logger = get_logger()
+
+_STAGING_TABLE = """
+CREATE TEMPORARY TABLE forecast_staging (
+    station_id INTEGER,
+    target_hour TIMESTAMP,
+    model VARCHAR(20),
+    value DOUBLE PRECISION,
+    generated_at TIMESTAMP
+) ON COMMIT DROP
+"""
+
+# Forecasts of stations missing from transport.station are skipped instead of failing the whole batch
+_UPSERT = """
+INSERT INTO transport.forecast (station_id, target_hour, model, value, generated_at)
+SELECT f.station_id, f.target_hour, f.model, f.value, f.generated_at
+FROM forecast_staging f
+JOIN transport.station s ON s.id = f.station_id
+ON CONFLICT (station_id, target_hour, model) DO UPDATE SET
+    value = excluded.value,
+    generated_at = excluded.generated_at
+"""
+
+_LATEST_QUERY = """
+SELECT f.station_id, f.target_hour, f.model, f.value, f.generated_at
+FROM transport.forecast f
+JOIN (
+    SELECT model, MAX(generated_at) AS generated_at
+    FROM transport.forecast
+    GROUP BY model
+) latest ON latest.model = f.model AND latest.generated_at = f.generated_at
+ORDER BY f.model, f.station_id, f.target_hour
+"""
+
+
+def write_forecast(forecast: ForecastFrame, model: str, generated_at: datetime | None = None) -> int:
+    """
+    Upsert the forecasts of a run into `transport.forecast`.
+
+    The rows are streamed with COPY into a temporary table, then merged into the forecast
+    table in a single statement, so a run of every station is one round-trip and one transaction.
+
+    Parameters
+    ----------
+    forecast : ForecastFrame
+        Forecasts of the run, the complete-hour values are stored
+    model : str
+        Name of the model or engine that produced the forecasts
+    generated_at : datetime, optional
+        Date of the run, defaults to the current time
+
+    Returns
+    -------
+    int
+        Number of upserted rows
+    """
+    if len(forecast.station_id) == 0:
+        return 0
+
+    rows = forecast.to_frame()[["station_id", "target_hour", "forecast_complete"]].assign(
+        model=model, generated_at=pd.Timestamp(generated_at or datetime.now())
+    )
+    buffer = io.StringIO()
+    rows[["station_id", "target_hour", "model", "forecast_complete", "generated_at"]].to_csv(
+        buffer, index=False, header=False
+    )
+    buffer.seek(0)
+
+    engine = get_engine()
+    try:
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(_STAGING_TABLE)
+                cursor.copy_expert(
+                    "COPY forecast_staging (station_id, target_hour, model, value, generated_at) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    buffer,
+                )
+                cursor.execute(_UPSERT)
+                upserted = cursor.rowcount
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+    finally:
+        engine.dispose()
+
+    logger.info(f"Saved {upserted} {model} forecasts of {forecast.n_stations} stations to transport.forecast")
+    return upserted
+
+
+def read_latest_forecasts() -> pd.DataFrame:
+    """Return the rows of the latest run of each model in `transport.forecast`."""
+    engine = get_engine()
+    try:
+        with engine.connect() as conn:
+            return pd.read_sql(text(_LATEST_QUERY), conn)
+    finally:
+        engine.dispose()
+
+
+class ForecastSnapshot:
+    """
+    In-memory snapshot of the latest forecasts, refreshed from `transport.forecast` at most every `ttl` seconds.
+
+    Requests are answered from precomputed dictionaries. When the snapshot expires, a
+    single caller reloads it while the others keep reading the previous one, and the new
+    snapshot is published by replacing a single reference.
+
+    Parameters
+    ----------
+    ttl : float
+        Maximum age of the snapshot, in seconds
+    loader : callable, optional
+        Function returning the latest forecasts as a DataFrame, defaults to `read_latest_forecasts`
+    """
+
+    def __init__(self, ttl: float = 60, loader=None):
+        self.ttl = ttl
+        self.loader = loader or read_latest_forecasts
+        self._snapshot = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the snapshot from the database."""
+        rows = self.loader()
+
+        snapshot = {}
+        for (model, station_id), station_rows in rows.groupby(["model", "station_id"], sort=False):
+            snapshot.setdefault(model, {})[int(station_id)] = {
+                "station_id": int(station_id),
+                "model": model,
+                "generated_at": pd.Timestamp(station_rows["generated_at"].iloc[0]).isoformat(),
+                "forecast": [
+                    {"target_hour": pd.Timestamp(target_hour).isoformat(), "value": float(value)}
+                    for target_hour, value in zip(station_rows["target_hour"], station_rows["value"])
+                ],
+            }
+
+        self._snapshot = snapshot
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded forecast snapshot of {sum(len(stations) for stations in snapshot.values())} stations")
+
+    def _current(self):
+        expired = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+        # Only one caller reloads, the others serve the previous snapshot meanwhile
+        if expired and self._lock.acquire(blocking=self._snapshot is None):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing forecast snapshot: {e}")
+                if self._snapshot is None:
+                    raise
+                # Keep serving the previous snapshot until the next expiry instead of retrying on every call
+                self._loaded_at = time.monotonic()
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def station(self, station_id: int, model: str) -> dict | None:
+        """Return the latest forecast of a station, or None if it has none."""
+        return self._current().get(model, {}).get(int(station_id))
+
+    def stations(self, model: str, station_ids: list[int] | None = None) -> list[dict]:
+        """Return the latest forecasts of several stations, or of every station if `station_ids` is None."""
+        forecasts = self._current().get(model, {})
+        if station_ids is None:
+            return list(forecasts.values())
+        return [forecasts[int(station_id)] for station_id in station_ids if int(station_id) in forecasts]
@@ -0,0 +1,117 @@
+import pandas as pd
+from sqlalchemy import text
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.utils import get_engine
+
+logger = get_logger()
+
+_TRAFFIC_QUERY = """
+SELECT
+    sh.station_id,
+    s.name as station_name,
+    sh.time_bin_id,
+    sh.cat_day,
+    sh.start_timestamp,
+    sh.start_timestamp + INTERVAL '1 hour' as end_timestamp,
+    sh.validations
+FROM
+    transport.station_hour sh
+JOIN
+    transport.station s ON sh.station_id = s.id
+WHERE
+    {filters}
+ORDER BY sh.station_id, sh.start_timestamp
+"""
+
+
+def get_bulk_data_from_db(
+    station_ids: list[int] | None = None,
+    weeks: int | None = None,
+    partitions: int = 1,
+    chunksize: int = 100000,
+) -> dict[int, pd.DataFrame]:
+    """
+    Retrieves traffic data for many stations with a single connection.
+
+    Rows are streamed from a server-side cursor in chunks and dispatched per station,
+    so the number of round-trips does not depend on the number of stations.
+
+    Parameters
+    ----------
+    station_ids : list[int], optional
+        IDs of the stations to load. If None, loads every station with traffic data.
+    weeks : int, optional
+        Number of weeks of history to load, counted back from the latest time bin.
+        If None, the whole history is loaded.
+    partitions : int
+        Number of queries the stations are split into, to bound the size of each result set.
+    chunksize : int
+        Number of rows fetched from the cursor at a time.
+
+    Returns
+    -------
+    dict[int, pd.DataFrame]
+        Traffic data per station, in the same format as `get_data_from_db`
+    """
+    engine = get_engine()
+    station_frames = {}
+
+    try:
+        with engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True)
+
+            if station_ids is None and partitions > 1:
+                station_ids = (
+                    conn.execute(text("SELECT DISTINCT station_id FROM transport.station_hour")).scalars().all()
+                )
+
+            for partition_ids in _split_stations(station_ids, partitions):
+                query, params = _build_query(partition_ids, weeks)
+
+                for chunk in pd.read_sql(query, conn, params=params, chunksize=chunksize):
+                    for station_id, station_chunk in chunk.groupby("station_id", sort=False):
+                        station_frames.setdefault(int(station_id), []).append(station_chunk)
+    finally:
+        engine.dispose()
+
+    data = {station_id: _format_station_data(frames) for station_id, frames in station_frames.items()}
+
+    logger.info(f"Bulk data retrieved: {sum(len(df) for df in data.values())} rows for {len(data)} stations")
+
+    return data
+
+
+def _split_stations(station_ids: list[int] | None, partitions: int) -> list[list[int] | None]:
+    if station_ids is None:
+        return [None]
+
+    station_ids = [int(station_id) for station_id in station_ids]
+    partitions = max(1, min(partitions, len(station_ids)))
+    size = -(-len(station_ids) // partitions) if station_ids else 1
+
+    return [station_ids[i : i + size] for i in range(0, len(station_ids), size)]
+
+
+def _build_query(station_ids: list[int] | None, weeks: int | None) -> tuple[str, dict]:
+    filters = ["TRUE"]
+    params = {}
+
+    if station_ids is not None:
+        filters.append("sh.station_id = ANY(%(station_ids)s)")
+        params["station_ids"] = station_ids
+
+    if weeks is not None:
+        filters.append(
+            "sh.start_timestamp >= (SELECT MAX(start_timestamp) FROM transport.time_bin) - make_interval(weeks => %(weeks)s)"
+        )
+        params["weeks"] = int(weeks)
+
+    return _TRAFFIC_QUERY.format(filters=" AND ".join(filters)), params
+
+
+def _format_station_data(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    df["datetime"] = pd.to_datetime(df["start_timestamp"])
+    df.set_index("datetime", inplace=True)
+    return df
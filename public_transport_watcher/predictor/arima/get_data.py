@@ -34,23 +34,21 @@ def get_data_from_db(station_id: int | None = None) -> pd.DataFrame | None:
     session = Session()
 
     query = """
-    SELECT 
-        t.station_id,
+    SELECT
+        sh.station_id,
         s.name as station_name,
-        t.time_bin_id,
-        tb.cat_day,
-        tb.start_timestamp,
-        tb.end_timestamp,
-        t.validations
-    FROM 
-        transport.traffic t
-    JOIN 
-        transport.station s ON t.station_id = s.id
-    JOIN 
-        transport.time_bin tb ON t.time_bin_id = tb.id
+        sh.time_bin_id,
+        sh.cat_day,
+        sh.start_timestamp,
+        sh.start_timestamp + INTERVAL '1 hour' as end_timestamp,
+        sh.validations
+    FROM
+        transport.station_hour sh
+    JOIN
+        transport.station s ON sh.station_id = s.id
     WHERE
-        t.station_id = %(station_id)s
-    ORDER BY t.time_bin_id
+        sh.station_id = %(station_id)s
+    ORDER BY sh.start_timestamp
     """
 
     params = {"station_id": station_id}
@@ -0,0 +1,271 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+import json
+import math
+import os
+import time
+import warnings
+
+import pandas as pd
+from sklearn.metrics import mean_squared_error
+from statsmodels.tsa.arima.model import ARIMA
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.preprocess_data import preprocess_data
+
+logger = get_logger()
+
+
+def candidate_orders(p_range, d_range, q_range) -> list[tuple]:
+    """
+    List the ARIMA orders of the search grid.
+
+    The (0, 0, 0) model is skipped since it only predicts the mean.
+    """
+    return [(p, d, q) for p in p_range for d in d_range for q in q_range if (p, d, q) != (0, 0, 0)]
+
+
+def run_grid_search(
+    stations_data: dict[int, pd.DataFrame],
+    p_range: list,
+    d_range: list,
+    q_range: list,
+    workers: int = 1,
+    top_k: int | None = 3,
+    prune_window: int | None = None,
+    train_ratio: float = 0.8,
+    default_order: tuple = (1, 1, 1),
+    checkpoint_file: str | None = None,
+    resume: bool = False,
+    on_station_done=None,
+) -> dict[int, dict]:
+    """
+    Search the best ARIMA order of several stations in parallel.
+
+    Each (station, order) pair is an independent task. Orders are first ranked by
+    AIC on the last `prune_window` hours of the training set, then only the `top_k`
+    best ones of each differencing order d are fitted on the whole training set and
+    scored by out-of-sample RMSE. AIC values are only compared within the same d, since
+    differencing changes the sample the likelihood is computed on.
+    Completed stations are appended to a checkpoint file so an interrupted search
+    can be resumed.
+
+    Parameters
+    ----------
+    stations_data : dict[int, pd.DataFrame]
+        Traffic data per station, as returned by `get_bulk_data_from_db`
+    p_range, d_range, q_range : list
+        Values of p, d and q to try
+    workers : int
+        Number of worker processes (1 runs every fit in the current process)
+    top_k : int, optional
+        Number of orders of each d kept after the AIC pruning. If None, every order is scored by RMSE.
+    prune_window : int, optional
+        Number of training hours used for the AIC pruning. If None, the whole training set is used.
+    train_ratio : float
+        Ratio of data to use for training
+    default_order : tuple
+        Order kept when no model could be fitted for a station
+    checkpoint_file : str, optional
+        JSON lines file receiving each completed station
+    resume : bool
+        If True, stations already in the checkpoint file are not searched again
+    on_station_done : callable, optional
+        Called with (station_id, result) each time a station is completed
+
+    Returns
+    -------
+    dict[int, dict]
+        Best order per station with its 'rmse', 'aic', 'fit_seconds' and 'optimized_at'
+    """
+    results = _read_checkpoint(checkpoint_file) if resume and checkpoint_file else {}
+    if checkpoint_file and not resume and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    orders = candidate_orders(p_range, d_range, q_range)
+    prune = top_k is not None and top_k < max(sum(order[1] == d for order in orders) for d in d_range)
+
+    splits = {}
+    for station_id, df in stations_data.items():
+        if station_id in results:
+            continue
+        train, test = _split_series(df, station_id, train_ratio)
+        if train.empty or test.empty:
+            logger.warning(f"Not enough data to search ARIMA parameters for station {station_id}")
+            continue
+        splits[station_id] = (train, test)
+
+    if results:
+        logger.info(f"Resuming grid search: {len(results)} stations already completed")
+    logger.info(
+        f"Searching {len(orders)} ARIMA orders for {len(splits)} stations with {workers} worker(s)"
+        + (f", keeping the {top_k} best AIC of each d before the RMSE step" if prune else "")
+    )
+
+    remaining = {station_id: len(orders) if prune else 0 for station_id in splits}
+    aic_scores = {station_id: [] for station_id in splits}
+    rmse_scores = {station_id: [] for station_id in splits}
+    fit_seconds = {station_id: 0.0 for station_id in splits}
+    completed = 0
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else _InlineExecutor()
+    with executor:
+        futures = {}
+
+        def submit_rmse(station_id, shortlist):
+            train, test = splits[station_id]
+            remaining[station_id] = len(shortlist)
+            for order in shortlist:
+                futures[executor.submit(_rmse_task, station_id, order, train, test)] = "rmse"
+
+        for station_id, (train, _) in splits.items():
+            if prune:
+                window = train.iloc[-prune_window:] if prune_window else train
+                for order in orders:
+                    futures[executor.submit(_aic_task, station_id, order, window)] = "aic"
+            else:
+                submit_rmse(station_id, orders)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage = futures.pop(future)
+
+                if stage == "aic":
+                    station_id, order, aic, seconds = future.result()
+                    if aic is not None:
+                        aic_scores[station_id].append((aic, order))
+                else:
+                    station_id, order, rmse, aic, seconds = future.result()
+                    if rmse is not None:
+                        rmse_scores[station_id].append((rmse, aic, order))
+
+                fit_seconds[station_id] += seconds
+                remaining[station_id] -= 1
+                if remaining[station_id] > 0:
+                    continue
+
+                if stage == "aic" and aic_scores[station_id]:
+                    submit_rmse(station_id, _shortlist(aic_scores[station_id], top_k))
+                    continue
+
+                result = _station_result(rmse_scores[station_id], fit_seconds[station_id], default_order)
+                results[station_id] = result
+                completed += 1
+                _append_checkpoint(checkpoint_file, station_id, result)
+                if on_station_done is not None:
+                    on_station_done(station_id, result)
+
+                rmse = f"{result['rmse']:.2f}" if result["rmse"] is not None else "n/a"
+                logger.info(
+                    f"Best ARIMA parameters for station {station_id}: {result['order']} "
+                    f"(RMSE: {rmse}, {result['fit_seconds']:.1f}s) - {completed}/{len(splits)} stations"
+                )
+
+    return results
+
+
+class _InlineExecutor:
+    """Executor running tasks in the current process, used when a single worker is requested."""
+
+    def submit(self, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _shortlist(aic_scores, top_k):
+    """Orders with the `top_k` best AIC of each differencing order d."""
+    shortlist = []
+    for d in sorted({order[1] for _, order in aic_scores}):
+        ranked = sorted((aic, order) for aic, order in aic_scores if order[1] == d)
+        shortlist.extend(order for _, order in ranked[:top_k])
+    return shortlist
+
+
+def _split_series(df, station_id, train_ratio):
+    time_series = preprocess_data(df, station_id)["validations"]
+    train_size = int(len(time_series) * train_ratio)
+    return time_series[:train_size], time_series[train_size:]
+
+
+def _fit(series, order):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return ARIMA(series, order=order).fit()
+
+
+def _aic_task(station_id, order, series):
+    start_time = time.perf_counter()
+    try:
+        aic = float(_fit(series, order).aic)
+        aic = aic if math.isfinite(aic) else None
+    except Exception as e:
+        logger.debug(f"Error with ARIMA{order} for station {station_id}: {e}")
+        aic = None
+    return station_id, order, aic, time.perf_counter() - start_time
+
+
+def _rmse_task(station_id, order, train, test):
+    start_time = time.perf_counter()
+    try:
+        model_fit = _fit(train, order)
+        predictions = model_fit.forecast(steps=len(test))
+        rmse = math.sqrt(mean_squared_error(test, predictions))
+        aic = float(model_fit.aic)
+    except Exception as e:
+        logger.debug(f"Error with ARIMA{order} for station {station_id}: {e}")
+        rmse, aic = None, None
+    return station_id, order, rmse, aic, time.perf_counter() - start_time
+
+
+def _station_result(rmse_scores, fit_seconds, default_order):
+    if rmse_scores:
+        rmse, aic, order = min(rmse_scores, key=lambda score: score[0])
+    else:
+        rmse, aic, order = None, None, tuple(default_order)
+
+    return {
+        "order": tuple(order),
+        "rmse": rmse,
+        "aic": aic,
+        "fit_seconds": fit_seconds,
+        "optimized_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def _append_checkpoint(checkpoint_file, station_id, result):
+    if not checkpoint_file:
+        return
+
+    os.makedirs(os.path.dirname(checkpoint_file) or ".", exist_ok=True)
+    with open(checkpoint_file, "a") as f:
+        f.write(json.dumps({"station_id": int(station_id), **result, "order": list(result["order"])}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_checkpoint(checkpoint_file):
+    results = {}
+    if not os.path.exists(checkpoint_file):
+        return results
+
+    with open(checkpoint_file, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # The last line may be truncated if the previous run was killed while writing it
+                continue
+            station_id = record.pop("station_id")
+            record["order"] = tuple(record["order"])
+            results[int(station_id)] = record
+
+    return results
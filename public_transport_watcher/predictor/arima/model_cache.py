@@ -0,0 +1,219 @@
+from datetime import datetime, timedelta
+import os
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.arima.model import ARIMA
+
+from public_transport_watcher.logging_config import get_logger
+
+logger = get_logger()
+
+
+class ArimaModelCache:
+    """
+    Disk cache of fitted ARIMA parameters, keyed by (station, hour, order).
+
+    Each entry is a small numpy archive holding the estimated parameters, the last
+    observation the model has seen and the date of the last full fit. The least
+    recently used entries are evicted once the cache exceeds `max_bytes`.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache entries, created if missing
+    max_bytes : int, optional
+        Maximum total size of the cache. If None, entries are never evicted.
+    refit_hours : float
+        Maximum age of cached parameters before a full refit, in hours
+    drift_threshold : float
+        Mean absolute standardized one-step-ahead error of new observations triggering a refit
+    evict_every : int
+        Number of writes between two size checks
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int | None = None,
+        refit_hours: float = 168,
+        drift_threshold: float = 3.0,
+        evict_every: int = 256,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.refit_hours = refit_hours
+        self.drift_threshold = drift_threshold
+        self.evict_every = evict_every
+        self._writes = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, station_id, hour, order):
+        p, d, q = order
+        return os.path.join(self.cache_dir, f"station_{int(station_id)}_h{int(hour):02d}_{p}{d}{q}.npz")
+
+    def get(self, station_id: int, hour: int, order: tuple) -> dict | None:
+        """Return the cached entry of a model, or None if it is not cached or unreadable."""
+        path = self._path(station_id, hour, order)
+        try:
+            with np.load(path) as data:
+                entry = {
+                    "params": data["params"],
+                    "last_timestamp": pd.Timestamp(int(data["last_timestamp"])),
+                    "fitted_at": pd.Timestamp(int(data["fitted_at"])),
+                }
+            # Mark the entry as recently used for the eviction
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable model cache entry {path}: {e}")
+            return None
+
+    def put(self, station_id: int, hour: int, order: tuple, params, last_timestamp, fitted_at):
+        """Write a cache entry atomically, so concurrent readers never see a partial file."""
+        path = self._path(station_id, hour, order)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    params=np.asarray(params, dtype=np.float64),
+                    last_timestamp=pd.Timestamp(last_timestamp).value,
+                    fitted_at=pd.Timestamp(fitted_at).value,
+                )
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the cache fits in `max_bytes`.
+
+        Returns
+        -------
+        int
+            Number of removed entries
+        """
+        if self.max_bytes is None:
+            return 0
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".npz"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Evicted {removed} entries from the ARIMA model cache")
+        return removed
+
+
+def forecast_with_cache(
+    series: pd.Series,
+    station_id: int,
+    hour: int,
+    order: tuple,
+    cache: ArimaModelCache,
+    steps: int = 2,
+    now: datetime | None = None,
+):
+    """
+    Forecast a series with cached ARIMA parameters, refitting only when needed.
+
+    The cached parameters are applied to the series with a Kalman filter pass, which
+    is much cheaper than estimating them. The model is fully refitted when it is not
+    cached, when its last fit is older than the cache `refit_hours`, or when the
+    one-step-ahead errors on the observations received since the last run drift beyond
+    the cache `drift_threshold` standard deviations on average.
+
+    Parameters
+    ----------
+    series : pd.Series
+        Observations of the station at the given hour
+    station_id : int
+        Station ID
+    hour : int
+        Hour of the day modelled by the series
+    order : tuple
+        ARIMA order (p, d, q)
+    cache : ArimaModelCache
+        Cache of fitted parameters
+    steps : int
+        Number of steps to forecast
+    now : datetime, optional
+        Reference time of the refit cadence, defaults to the current time
+
+    Returns
+    -------
+    tuple
+        (forecast Series, True if the model was refitted)
+    """
+    now = pd.Timestamp(now or datetime.now())
+    order = tuple(int(value) for value in order)
+    model = ARIMA(series, order=order)
+    entry = cache.get(station_id, hour, order)
+
+    results = None
+    if entry is not None and len(entry["params"]) == len(model.param_names):
+        if now - entry["fitted_at"] > timedelta(hours=cache.refit_hours):
+            logger.info(f"Cached ARIMA{order} of station {station_id} at {hour}h is too old, refitting")
+        else:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                results = model.filter(entry["params"])
+
+            if _has_drifted(results, series, entry["last_timestamp"], model.param_names, cache.drift_threshold):
+                logger.info(f"Drift detected for ARIMA{order} of station {station_id} at {hour}h, refitting")
+                results = None
+
+    refitted = results is None
+    if refitted:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results = model.fit()
+        fitted_at = now
+    else:
+        fitted_at = entry["fitted_at"]
+
+    cache.put(station_id, hour, order, results.params, series.index.max(), fitted_at)
+
+    return results.forecast(steps=steps), refitted
+
+
+def _has_drifted(results, series, last_timestamp, param_names, drift_threshold):
+    new_observations = int((series.index > last_timestamp).sum())
+    if new_observations == 0:
+        return False
+
+    sigma2 = np.asarray(results.params)[param_names.index("sigma2")]
+    if not sigma2 > 0:
+        return True
+
+    residuals = np.asarray(results.resid)[-new_observations:]
+    return float(np.mean(np.abs(residuals)) / np.sqrt(sigma2)) > drift_threshold
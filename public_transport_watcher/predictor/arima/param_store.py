@@ -0,0 +1,213 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import json
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+from public_transport_watcher.logging_config import get_logger
+
+logger = get_logger()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS station_params (
+    station_id INTEGER PRIMARY KEY,
+    p INTEGER NOT NULL,
+    d INTEGER NOT NULL,
+    q INTEGER NOT NULL,
+    rmse REAL,
+    aic REAL,
+    fit_seconds REAL,
+    optimized_at TEXT
+)
+"""
+
+_UPSERT = """
+INSERT INTO station_params (station_id, p, d, q, rmse, aic, fit_seconds, optimized_at)
+VALUES (:station_id, :p, :d, :q, :rmse, :aic, :fit_seconds, :optimized_at)
+ON CONFLICT (station_id) DO UPDATE SET
+    p = excluded.p,
+    d = excluded.d,
+    q = excluded.q,
+    rmse = excluded.rmse,
+    aic = excluded.aic,
+    fit_seconds = excluded.fit_seconds,
+    optimized_at = excluded.optimized_at
+"""
+
+# Orders written without fit metadata only reset the metadata when the order changes
+_UPSERT_ORDER = """
+INSERT INTO station_params (station_id, p, d, q)
+VALUES (:station_id, :p, :d, :q)
+ON CONFLICT (station_id) DO UPDATE SET
+    p = excluded.p,
+    d = excluded.d,
+    q = excluded.q,
+    rmse = NULL,
+    aic = NULL,
+    fit_seconds = NULL,
+    optimized_at = NULL
+WHERE (p, d, q) != (excluded.p, excluded.d, excluded.q)
+"""
+
+
+class ArimaParamStore:
+    """
+    SQLite store of the ARIMA order of each station and of its fit metadata.
+
+    The database runs in WAL mode so readers never block the writer, and every
+    batch of upserts is committed in a single transaction.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database file, created if missing
+    timeout : float
+        Seconds to wait for a lock held by another writer
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connection(self):
+        # Commits on success, rolls back on error and always closes the connection
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+        try:
+            conn.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def load_all(self) -> dict[int, tuple]:
+        """Return the ARIMA order of every station."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT station_id, p, d, q FROM station_params").fetchall()
+        return {station_id: (p, d, q) for station_id, p, d, q in rows}
+
+    def get(self, station_id: int) -> tuple | None:
+        """Return the ARIMA order of a station, or None if it is not stored."""
+        with self._connection() as conn:
+            row = conn.execute("SELECT p, d, q FROM station_params WHERE station_id = ?", (int(station_id),)).fetchone()
+        return tuple(row) if row else None
+
+    def upsert(self, station_id: int, order: tuple, **metadata):
+        """Insert or replace the ARIMA order of a single station."""
+        self.upsert_many({station_id: {"order": order, **metadata}})
+
+    def upsert_many(self, records: dict) -> int:
+        """
+        Insert or replace the ARIMA orders of several stations in one transaction.
+
+        Parameters
+        ----------
+        records : dict
+            Dictionary of station_id -> (p, d, q), or station_id -> dict with an 'order'
+            key and optional 'rmse', 'aic', 'fit_seconds' and 'optimized_at' keys.
+            Stations written without 'optimized_at' keep their metadata if their order is unchanged.
+
+        Returns
+        -------
+        int
+            Number of stations written
+        """
+        rows = [_to_row(station_id, record) for station_id, record in records.items()]
+        if not rows:
+            return 0
+
+        with self._connection() as conn:
+            conn.executemany(_UPSERT, [row for row in rows if row["optimized_at"] is not None])
+            conn.executemany(_UPSERT_ORDER, [row for row in rows if row["optimized_at"] is None])
+
+        logger.info(f"Saved ARIMA parameters for {len(rows)} stations to {self.path}")
+        return len(rows)
+
+    def metadata(self) -> pd.DataFrame:
+        """Return the stored orders and fit metadata as a DataFrame."""
+        with self._connection() as conn:
+            return pd.read_sql("SELECT * FROM station_params ORDER BY station_id", conn)
+
+    def stale_stations(self, max_age_days: float, station_ids: list[int] | None = None) -> list[int]:
+        """
+        List the stations whose parameters were never optimized or are older than `max_age_days`.
+
+        Parameters
+        ----------
+        max_age_days : float
+            Maximum age of the parameters, in days
+        station_ids : list[int], optional
+            Stations to consider. If None, only the stored stations are considered.
+
+        Returns
+        -------
+        list[int]
+            Stations to re-optimize
+        """
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+        with self._connection() as conn:
+            fresh = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT station_id FROM station_params WHERE optimized_at >= ?", (cutoff,)
+                ).fetchall()
+            }
+            if station_ids is None:
+                station_ids = [row[0] for row in conn.execute("SELECT station_id FROM station_params").fetchall()]
+
+        return [int(station_id) for station_id in station_ids if int(station_id) not in fresh]
+
+    def import_json(self, params_file: str) -> int:
+        """Import the orders of a consolidated JSON parameters file, without fit metadata."""
+        with open(params_file, "r") as f:
+            params_dict = json.load(f)
+        return self.upsert_many({int(station_id): tuple(params) for station_id, params in params_dict.items()})
+
+    def export_json(self, params_file: str):
+        """Write the stored orders to a consolidated JSON parameters file."""
+        write_params_file(dict(sorted(self.load_all().items())), params_file)
+
+
+def write_params_file(station_params: dict, params_file: str):
+    """
+    Write ARIMA orders to a consolidated JSON parameters file.
+
+    The orders are written to a temporary file of the writer's own, in the same directory,
+    which is then moved in place: readers never see a partially written file, and
+    concurrent writers never write to the same temporary file.
+    """
+    params_dict = {str(station_id): list(order) for station_id, order in station_params.items()}
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(params_file) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(params_dict, f, indent=2)
+        os.replace(tmp_path, params_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _to_row(station_id, record):
+    if not isinstance(record, dict):
+        record = {"order": record}
+
+    p, d, q = (int(value) for value in record["order"])
+    return {
+        "station_id": int(station_id),
+        "p": p,
+        "d": d,
+        "q": q,
+        "rmse": record.get("rmse"),
+        "aic": record.get("aic"),
+        "fit_seconds": record.get("fit_seconds"),
+        "optimized_at": record.get("optimized_at"),
+    }
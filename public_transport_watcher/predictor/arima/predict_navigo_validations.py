@@ -6,13 +6,15 @@ import pandas as pd
 from statsmodels.tsa.arima.model import ARIMA
 
 from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.model_cache import ArimaModelCache, forecast_with_cache
 from public_transport_watcher.predictor.arima.preprocess_data import preprocess_data
+from public_transport_watcher.predictor.arima.profile_cube import HourlyProfileCube
 
 logger = get_logger()
 
 
-def _get_current_time_info():
-    current_time = datetime.now()
+def _get_current_time_info(current_time=None):
+    current_time = current_time or datetime.now()
     current_month = current_time.month
     current_day_of_week = current_time.weekday()
     current_hour = current_time.hour
@@ -67,16 +69,26 @@ def _calculate_hourly_averages(exact_same_days):
     return hourly_avg_weighted, hourly_avg
 
 
-def _apply_arima_model(recent_data, current_hour, arima_params, hourly_avg_weighted):
+def _apply_arima_model(recent_data, current_hour, arima_params, hourly_avg_weighted, station_id=None, model_cache=None):
     try:
         recent_hour_data = recent_data[recent_data["hour"] == current_hour]["validations"]
 
         if len(recent_hour_data) >= 20:  # Enough data for ARIMA
             p, d, q = arima_params
-            arima_model = ARIMA(recent_hour_data, order=(p, d, q))
-            arima_results = arima_model.fit()
+            if model_cache is not None:
+                arima_forecast, _ = forecast_with_cache(
+                    recent_hour_data,
+                    station_id,
+                    current_hour,
+                    (p, d, q),
+                    model_cache,
+                    steps=2,
+                )
+            else:
+                arima_model = ARIMA(recent_hour_data, order=(p, d, q))
+                arima_results = arima_model.fit()
 
-            arima_forecast = arima_results.forecast(steps=2)
+                arima_forecast = arima_results.forecast(steps=2)
             logger.info(f"\nARIMA{arima_params} predictions for next 2 hours:")
             logger.info(str(arima_forecast))
 
@@ -209,7 +221,14 @@ def _finalize_forecast(forecast_df):
     return forecast_df, total_validations
 
 
-def predict_navigo_validations(df: pd.DataFrame, station_id: int, arima_params: tuple) -> tuple:
+def predict_navigo_validations(
+    df: pd.DataFrame,
+    station_id: int,
+    arima_params: tuple,
+    model_cache: ArimaModelCache | None = None,
+    profile_cube: HourlyProfileCube | None = None,
+    current_time: datetime | None = None,
+) -> tuple:
     """
     Enhanced prediction model that combines historical averages, recent trends, and ARIMA models.
 
@@ -221,6 +240,12 @@ def predict_navigo_validations(df: pd.DataFrame, station_id: int, arima_params:
         Station ID
     arima_params : tuple
         ARIMA parameters (p, d, q)
+    model_cache : ArimaModelCache, optional
+        Cache of fitted models updated instead of refitting every hour. If None, the model is fitted from scratch.
+    profile_cube : HourlyProfileCube, optional
+        Precomputed historical profiles. If None or missing the station, they are computed from `df`.
+    current_time : datetime, optional
+        Time of the forecast, defaults to the current time
 
     Returns
     -------
@@ -229,14 +254,18 @@ def predict_navigo_validations(df: pd.DataFrame, station_id: int, arima_params:
     """
     data_df = preprocess_data(df, station_id)
 
-    current_time, current_month, current_day_of_week, current_hour = _get_current_time_info()
-    exact_same_days = _get_exact_same_days(data_df, current_month, current_day_of_week)
-
+    current_time, current_month, current_day_of_week, current_hour = _get_current_time_info(current_time)
     recent_data = _get_recent_data(data_df)
 
-    hourly_avg_weighted, hourly_avg = _calculate_hourly_averages(exact_same_days)
+    if profile_cube is not None and station_id in profile_cube:
+        hourly_avg_weighted, hourly_avg = profile_cube.lookup(station_id, current_month, current_day_of_week)
+    else:
+        exact_same_days = _get_exact_same_days(data_df, current_month, current_day_of_week)
+        hourly_avg_weighted, hourly_avg = _calculate_hourly_averages(exact_same_days)
 
-    arima_forecast, arima_confidence = _apply_arima_model(recent_data, current_hour, arima_params, hourly_avg_weighted)
+    arima_forecast, arima_confidence = _apply_arima_model(
+        recent_data, current_hour, arima_params, hourly_avg_weighted, station_id, model_cache
+    )
 
     recent_hours = [current_hour, (current_hour + 1) % 24]
 
@@ -2,6 +2,8 @@ import pandas as pd
 
 from public_transport_watcher.logging_config import logger
 
+_FEATURES = ["validations", "hour", "day_of_week", "month", "cat_day"]
+
 
 def preprocess_data(df: pd.DataFrame, station_id: int) -> pd.DataFrame:
     """
@@ -18,6 +20,10 @@ def preprocess_data(df: pd.DataFrame, station_id: int) -> pd.DataFrame:
     -------
     pd.DataFrame
     """
+    # Series from the series cache already carry the features
+    if set(_FEATURES).issubset(df.columns):
+        return df.loc[df["station_id"] == station_id, _FEATURES].sort_index()
+
     station_data = df[df["station_id"] == station_id].copy()
 
     station_data = station_data.sort_index()
@@ -1,4 +1,5 @@
 import argparse
+from datetime import date
 import json
 import os
 
@@ -6,6 +7,13 @@ import pandas as pd
 from sqlalchemy.orm import sessionmaker
 
 from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.work_queue import (
+    FileWorkQueue,
+    PostgresWorkQueue,
+    run_coordinator,
+    run_worker,
+)
+from public_transport_watcher.predictor.configuration.arima_config import ARIMA_CONFIG
 from public_transport_watcher.predictor.configuration.prediction_config import PREDICTION_CONFIG
 from public_transport_watcher.utils import get_engine
 
@@ -83,7 +91,7 @@ def save_params(station_params):
         logger.error(f"Error saving station parameters to {PARAMS_FILE}: {e}")
 
 
-def run_all_stations(optimize=False, limit=None):
+def run_all_stations(optimize=False, limit=None, workers=None, resume=False, max_age_days=None):
     """
     Run ARIMA predictions for all stations.
 
@@ -93,6 +101,12 @@ def run_all_stations(optimize=False, limit=None):
         If True, re-optimize parameters for each station
     limit : int
         Maximum number of stations to process
+    workers : int
+        Number of worker processes of the parameter search
+    resume : bool
+        If True, resume an interrupted parameter search
+    max_age_days : float
+        If set, only re-optimize stations whose parameters are older than this number of days
     """
     from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
 
@@ -104,7 +118,11 @@ def run_all_stations(optimize=False, limit=None):
         logger.info(f"Limiting to {limit} stations out of {len(station_ids)}")
         station_ids = station_ids[:limit]
 
+    if optimize:
+        predictor.optimize_stations(station_ids, workers=workers, resume=resume, max_age_days=max_age_days)
+
     station_params = load_existing_params()
+    stations_data = predictor.load_stations_data(station_ids)
 
     results = {}
 
@@ -112,7 +130,8 @@ def run_all_stations(optimize=False, limit=None):
         logger.info(f"Processing station {station_id} ({i}/{len(station_ids)})")
 
         try:
-            predictions, total = predictor.predict_for_station(station_id, optimize_params=optimize)
+            data_raw = stations_data.get(station_id, pd.DataFrame()) if stations_data is not None else None
+            predictions, total = predictor.predict_for_station(station_id, data_raw=data_raw)
 
             if predictions is not None:
                 results[station_id] = {
@@ -126,7 +145,12 @@ def run_all_stations(optimize=False, limit=None):
         except Exception as e:
             logger.error(f"Error processing station {station_id}: {e}")
 
-    save_params(station_params)
+    # With a parameters store, new parameters are already committed by `find_optimal_params`,
+    # only the JSON file exported from it is rewritten
+    if predictor.params_store is None:
+        save_params(station_params)
+    else:
+        predictor.export_params()
 
     logger.info(f"Completed predictions for {len(results)} stations")
 
@@ -139,19 +163,128 @@ def run_all_stations(optimize=False, limit=None):
     return results
 
 
+def build_work_queue(run_id, backend=None):
+    """
+    Build the queue of a distributed run from `ARIMA_CONFIG["work_queue"]`.
+
+    Parameters
+    ----------
+    run_id : str
+        Identifier of the run, shared by its coordinator and workers
+    backend : str, optional
+        "postgres" or "file", defaults to the configured backend
+
+    Returns
+    -------
+    PostgresWorkQueue or FileWorkQueue
+    """
+    config = ARIMA_CONFIG.get("work_queue", {})
+    backend = backend or config.get("backend", "postgres")
+    lease = {"lease_seconds": config.get("lease_seconds", 900), "max_attempts": config.get("max_attempts", 3)}
+
+    if backend == "postgres":
+        return PostgresWorkQueue(run_id, **lease)
+    if backend == "file":
+        return FileWorkQueue(config["queue_dir"], run_id, **lease)
+    raise ValueError(f"Unknown work queue backend: {backend}. Must be 'postgres' or 'file'")
+
+
+def run_distributed(mode, run_id, backend=None, optimize=True, limit=None, batch=1, max_age_days=None):
+    """
+    Run the coordinator or a worker of a run shared by several hosts.
+
+    The coordinator enqueues the stations with traffic data, waits for the workers and saves
+    the collected parameters. Workers, started on any host with the same run ID, claim the
+    stations, fit them and write their results back to the queue.
+
+    Parameters
+    ----------
+    mode : str
+        "coordinator" or "worker"
+    run_id : str
+        Identifier of the run
+    backend : str, optional
+        Queue backend, defaults to the configured one
+    optimize : bool
+        If True, workers re-optimize the parameters of each station
+    limit : int
+        Maximum number of stations enqueued by the coordinator
+    batch : int
+        Number of stations claimed at a time by a worker
+    max_age_days : float
+        If set, the coordinator only enqueues stations whose parameters are older than this number of days
+
+    Returns
+    -------
+    dict[int, dict] or int
+        Results of the run for the coordinator, number of completed stations for a worker
+    """
+    from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
+
+    queue = build_work_queue(run_id, backend)
+    poll_interval = ARIMA_CONFIG.get("work_queue", {}).get("poll_interval", 10)
+    predictor = ArimaPredictor()
+
+    if mode == "worker":
+        return run_worker(queue, predictor, optimize=optimize, batch=batch, poll_interval=poll_interval)
+    if mode != "coordinator":
+        raise ValueError(f"Invalid mode: {mode}. Must be 'coordinator' or 'worker'")
+
+    station_ids = get_all_stations_with_traffic()
+    if limit and len(station_ids) > limit:
+        logger.info(f"Limiting to {limit} stations out of {len(station_ids)}")
+        station_ids = station_ids[:limit]
+    if max_age_days is not None and predictor.params_store is not None:
+        station_ids = predictor.params_store.stale_stations(max_age_days, station_ids)
+
+    return run_coordinator(queue, station_ids, predictor, poll_interval=poll_interval)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Run ARIMA predictions for all stations")
     parser.add_argument("--optimize", action="store_true", help="Re-optimize ARIMA parameters for each station")
     parser.add_argument("--limit", type=int, default=None, help="Maximum number of stations to process")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes of the parameter search")
+    parser.add_argument("--resume", action="store_true", help="Resume an interrupted parameter search")
+    parser.add_argument(
+        "--stale-days", type=float, default=None, help="Only re-optimize parameters older than this number of days"
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["local", "coordinator", "worker"],
+        default="local",
+        help="Process the stations locally, or coordinate or join a run shared by several hosts",
+    )
+    parser.add_argument(
+        "--run-id", default=None, help="Identifier of the distributed run (defaults to the date of the day)"
+    )
+    parser.add_argument("--queue", choices=["postgres", "file"], default=None, help="Queue of the distributed run")
+    parser.add_argument("--batch", type=int, default=1, help="Number of stations claimed at a time by a worker")
 
     args = parser.parse_args()
 
+    if args.mode != "local":
+        run_id = args.run_id or f"{'optimize' if args.optimize else 'predict'}-{date.today().isoformat()}"
+        logger.info(f"Starting distributed run {run_id} as {args.mode}")
+        run_distributed(
+            args.mode,
+            run_id,
+            backend=args.queue,
+            optimize=args.optimize,
+            limit=args.limit,
+            batch=args.batch,
+            max_age_days=args.stale_days,
+        )
+        return
+
     logger.info("Starting ARIMA predictions for all stations")
     logger.info(f"Optimize parameters: {args.optimize}")
     if args.limit:
         logger.info(f"Limiting to {args.limit} stations")
     logger.info(f"Using parameters file: {PARAMS_FILE}")
 
-    run_all_stations(optimize=args.optimize, limit=args.limit)
+    run_all_stations(
+        optimize=args.optimize, limit=args.limit, workers=args.workers, resume=args.resume, max_age_days=args.stale_days
+    )
 
     logger.info("ARIMA predictions completed")
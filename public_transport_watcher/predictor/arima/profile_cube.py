@@ -0,0 +1,247 @@
+from datetime import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from public_transport_watcher.db.models.enums import DayCategoryEnum
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.get_bulk_data import get_bulk_data_from_db
+from public_transport_watcher.predictor.configuration import ARIMA_CONFIG
+
+logger = get_logger()
+
+# Sorted so that ties between day categories resolve like `Series.mode().iloc[0]`
+CAT_DAYS = sorted(category.value for category in DayCategoryEnum)
+
+_SHAPE = (12, 7, len(CAT_DAYS), 24)
+
+
+class HourlyProfileCube:
+    """
+    Historical hourly profiles of all stations, by month, weekday and day category.
+
+    Arrays are indexed by [station, month - 1, weekday, cat_day, hour], with the day
+    categories in the order of `CAT_DAYS`.
+
+    Parameters
+    ----------
+    station_ids : array-like
+        Station IDs, in the order of the first axis of the arrays
+    weighted_mean : np.ndarray
+        Recency-weighted mean of the validations of each cell
+    mean : np.ndarray
+        Simple mean of the validations of each cell
+    count : np.ndarray
+        Number of observations of each cell
+    built_at : datetime, optional
+        Build date of the cube
+    """
+
+    def __init__(self, station_ids, weighted_mean, mean, count, built_at=None):
+        self.station_ids = np.asarray(station_ids, dtype=np.int64)
+        self.weighted_mean = np.asarray(weighted_mean, dtype=np.float32)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.count = np.asarray(count, dtype=np.float32)
+        self.built_at = built_at
+        self._positions = {int(station_id): i for i, station_id in enumerate(self.station_ids)}
+
+    @classmethod
+    def build(cls, stations_data: dict[int, pd.DataFrame], decay: float = 0.05) -> "HourlyProfileCube":
+        """
+        Build the cube of all stations in one vectorized pass.
+
+        The recency weight of an observation is exp(-decay * days), where days is its age
+        relative to the latest observation of the same (station, month, weekday, cat_day)
+        cell group, as in `predict_navigo_validations`.
+
+        Parameters
+        ----------
+        stations_data : dict[int, pd.DataFrame]
+            Traffic data per station indexed by datetime, as returned by `get_bulk_data_from_db`
+        decay : float
+            Daily decay rate of the recency weights
+
+        Returns
+        -------
+        HourlyProfileCube
+        """
+        station_ids = np.array(sorted(int(station_id) for station_id in stations_data), dtype=np.int64)
+        frames = [
+            df[["validations", "cat_day"]].assign(station_id=station_id) for station_id, df in stations_data.items()
+        ]
+        data = pd.concat(frames) if frames else pd.DataFrame(columns=["validations", "cat_day", "station_id"])
+
+        timestamps = pd.DatetimeIndex(data.index)
+        cat_codes = pd.Categorical(data["cat_day"].astype(str), categories=CAT_DAYS).codes
+        valid = cat_codes >= 0
+
+        station = np.searchsorted(station_ids, data["station_id"].to_numpy())[valid]
+        month = timestamps.month.to_numpy()[valid] - 1
+        weekday = timestamps.weekday.to_numpy()[valid]
+        cat_day = cat_codes[valid].astype(np.int64)
+        hour = timestamps.hour.to_numpy()[valid]
+        validations = data["validations"].to_numpy(dtype=np.float64)[valid]
+        timestamps = timestamps[valid]
+
+        group = ((station * 12 + month) * 7 + weekday) * len(CAT_DAYS) + cat_day
+        latest = pd.Series(timestamps, index=group).groupby(level=0).max()
+        days_ago = (latest.reindex(group).to_numpy() - timestamps.to_numpy()) // np.timedelta64(1, "D")
+        weights = np.exp(-decay * days_ago.astype(np.float64))
+
+        cell = group * 24 + hour
+        size = len(station_ids) * int(np.prod(_SHAPE))
+        count = np.bincount(cell, minlength=size)
+        total = np.bincount(cell, weights=validations, minlength=size)
+        weighted_total = np.bincount(cell, weights=weights * validations, minlength=size)
+        weight_sum = np.bincount(cell, weights=weights, minlength=size)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, total / count, 0.0)
+            weighted_mean = np.where(weight_sum > 0, weighted_total / weight_sum, 0.0)
+
+        shape = (len(station_ids), *_SHAPE)
+        logger.info(f"Built hourly profile cube for {len(station_ids)} stations from {len(validations)} observations")
+        return cls(
+            station_ids,
+            weighted_mean.reshape(shape),
+            mean.reshape(shape),
+            count.reshape(shape),
+            built_at=datetime.now(),
+        )
+
+    def __contains__(self, station_id):
+        return int(station_id) in self._positions
+
+    def common_cat_day(self, station_id: int, month: int, day_of_week: int) -> str | None:
+        """Return the most frequent day category of a station for a month and weekday."""
+        counts = self.count[self._positions[int(station_id)], month - 1, day_of_week].sum(axis=1)
+        if not counts.any():
+            return None
+        return CAT_DAYS[int(np.argmax(counts))]
+
+    def lookup(self, station_id: int, month: int, day_of_week: int) -> tuple[pd.Series, pd.Series]:
+        """
+        Return the hourly profiles of the most frequent day category of a month and weekday.
+
+        Parameters
+        ----------
+        station_id : int
+            Station ID
+        month : int
+            Month, from 1 to 12
+        day_of_week : int
+            Weekday, from 0 (Monday) to 6
+
+        Returns
+        -------
+        tuple[pd.Series, pd.Series]
+            (recency-weighted average, simple average) of the validations by hour,
+            restricted to the hours with observations
+        """
+        cat_day = self.common_cat_day(station_id, month, day_of_week)
+        if cat_day is None:
+            return pd.Series(dtype=float), pd.Series(dtype=float)
+
+        index = (self._positions[int(station_id)], month - 1, day_of_week, CAT_DAYS.index(cat_day))
+        hours = np.flatnonzero(self.count[index] > 0)
+        return (
+            pd.Series(self.weighted_mean[index][hours].astype(np.float64), index=pd.Index(hours, name="hour")),
+            pd.Series(self.mean[index][hours].astype(np.float64), index=pd.Index(hours, name="hour")),
+        )
+
+    def lookup_many(self, station_ids, month: int, day_of_week: int, hours) -> np.ndarray:
+        """
+        Return the recency-weighted averages of several stations and hours at once.
+
+        Like `lookup`, the most frequent day category of each station is used.
+
+        Parameters
+        ----------
+        station_ids : array-like
+            Station IDs, all present in the cube
+        month : int
+            Month, from 1 to 12
+        day_of_week : int
+            Weekday, from 0 (Monday) to 6
+        hours : array-like
+            Hours of the day
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape [station, hour], NaN where the station has no observation
+        """
+        positions = np.array([self._positions[int(station_id)] for station_id in station_ids], dtype=np.int64)
+        hours = np.asarray(hours, dtype=np.int64)
+
+        counts = self.count[positions, month - 1, day_of_week]
+        cat_day = counts.sum(axis=2).argmax(axis=1)
+
+        values = self.weighted_mean[positions, month - 1, day_of_week, cat_day][:, hours].astype(np.float64)
+        observed = counts[np.arange(len(positions)), cat_day][:, hours] > 0
+        return np.where(observed, values, np.nan)
+
+    def profile(self, station_id: int, month: int, day_of_week: int) -> pd.Series:
+        """Return the simple average of the validations by hour, all day categories combined."""
+        position = self._positions[int(station_id)]
+        count = self.count[position, month - 1, day_of_week].sum(axis=0)
+        total = (self.mean[position, month - 1, day_of_week] * self.count[position, month - 1, day_of_week]).sum(axis=0)
+        hours = np.flatnonzero(count > 0)
+        return pd.Series((total[hours] / count[hours]).astype(np.float64), index=pd.Index(hours, name="hour"))
+
+    def save(self, path: str) -> str:
+        """Save the cube to a single compressed numpy archive."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            station_ids=self.station_ids,
+            weighted_mean=self.weighted_mean,
+            mean=self.mean,
+            count=self.count,
+            built_at=np.datetime64(self.built_at or datetime.now(), "s"),
+        )
+        os.replace(tmp_path, path)
+        logger.info(f"Saved hourly profile cube of {len(self.station_ids)} stations to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "HourlyProfileCube":
+        """Load a cube saved with `save`."""
+        with np.load(path) as data:
+            return cls(
+                data["station_ids"],
+                data["weighted_mean"],
+                data["mean"],
+                data["count"],
+                built_at=data["built_at"].astype("datetime64[s]").item(),
+            )
+
+
+def build_profile_cube(path: str, station_ids: list[int] | None = None) -> HourlyProfileCube:
+    """
+    Build the profile cube of all stations from the database and save it.
+
+    Parameters
+    ----------
+    path : str
+        Destination file of the cube
+    station_ids : list[int], optional
+        Stations to include. If None, every station with traffic data is included.
+
+    Returns
+    -------
+    HourlyProfileCube
+    """
+    cube = HourlyProfileCube.build(get_bulk_data_from_db(station_ids))
+    cube.save(path)
+    return cube
+
+
+def main():
+    build_profile_cube(ARIMA_CONFIG["profile_cube_file"])
+
+
+if __name__ == "__main__":
+    main()
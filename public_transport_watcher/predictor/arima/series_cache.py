@@ -0,0 +1,282 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima.profile_cube import CAT_DAYS
+from public_transport_watcher.utils import get_engine
+
+logger = get_logger()
+
+# The hours of each station from its revision start are read, all of them for the stations not cached yet
+_NEW_TRAFFIC_QUERY = """
+SELECT
+    sh.station_id,
+    sh.time_bin_id,
+    sh.cat_day,
+    sh.start_timestamp,
+    sh.validations
+FROM
+    transport.station_hour sh
+JOIN
+    unnest(CAST(:station_ids AS INTEGER[]), CAST(:since AS TIMESTAMP[])) AS w(station_id, since)
+    ON w.station_id = sh.station_id
+WHERE
+    w.since IS NULL OR sh.start_timestamp >= w.since
+ORDER BY sh.station_id, sh.start_timestamp
+"""
+
+_ALL_STATIONS_QUERY = "SELECT DISTINCT station_id FROM transport.station_hour"
+
+_COLUMNS = ("timestamp", "time_bin_id", "validations", "hour", "day_of_week", "month", "cat_day")
+
+
+class StationSeriesCache:
+    """
+    Local cache of the preprocessed traffic series of each station.
+
+    Each station is a numpy archive of columns (timestamp, time bin, validations and the
+    hour, day_of_week, month and cat_day features of `preprocess_data`), sorted by hour,
+    with the latest cached hour as watermark. `update` reads, in a single query, the hours
+    of each station from `revision_hours` before its watermark and merges them, so the
+    validations revised or loaded late within that window replace the cached ones. Older
+    revisions need a `rebuild` of the stations.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the station archives, created if missing
+    revision_hours : int
+        Number of cached hours before the watermark read again by each update
+    """
+
+    def __init__(self, cache_dir: str, revision_hours: int = 48):
+        self.cache_dir = cache_dir
+        self.revision_hours = revision_hours
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, station_id):
+        return os.path.join(self.cache_dir, f"station_{int(station_id)}.npz")
+
+    def _read(self, station_id):
+        path = self._path(station_id)
+        try:
+            with np.load(path) as data:
+                return {column: data[column] for column in _COLUMNS}
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable series cache entry {path}: {e}")
+            return None
+
+    def _write(self, station_id, columns):
+        """Write a station archive atomically, so concurrent readers never see a partial file."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **columns)
+            os.replace(tmp_path, self._path(station_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def watermark(self, station_id: int) -> pd.Timestamp | None:
+        """Return the latest cached hour of a station, or None if it is not cached."""
+        columns = self._read(station_id)
+        if columns is None or len(columns["timestamp"]) == 0:
+            return None
+        return pd.Timestamp(int(columns["timestamp"][-1]))
+
+    def merge(self, station_id: int, rows: pd.DataFrame) -> int:
+        """
+        Merge traffic rows into the cached series of a station.
+
+        Rows of an hour already cached replace the cached row, the other rows are inserted
+        at their place, so the series stays sorted by hour whatever the order of the rows.
+
+        Parameters
+        ----------
+        station_id : int
+            Station ID
+        rows : pd.DataFrame
+            Rows with 'time_bin_id', 'start_timestamp', 'cat_day' and 'validations' columns
+
+        Returns
+        -------
+        int
+            Number of new or changed hours
+        """
+        if rows.empty:
+            return 0
+
+        timestamps = pd.DatetimeIndex(pd.to_datetime(rows["start_timestamp"]))
+        new_columns = {
+            "timestamp": timestamps.asi8,
+            "time_bin_id": rows["time_bin_id"].to_numpy(dtype=np.int64),
+            "validations": rows["validations"].to_numpy(dtype=np.float64),
+            "hour": timestamps.hour.to_numpy(dtype=np.int8),
+            "day_of_week": timestamps.weekday.to_numpy(dtype=np.int8),
+            "month": timestamps.month.to_numpy(dtype=np.int8),
+            "cat_day": pd.Categorical(rows["cat_day"].astype(str), categories=CAT_DAYS).codes.astype(np.int8),
+        }
+        # Sorted by hour, the last row of an hour read twice is kept
+        order = np.argsort(new_columns["timestamp"], kind="stable")
+        last = np.append(np.diff(new_columns["timestamp"][order]) != 0, True)
+        new_columns = {column: values[order][last] for column, values in new_columns.items()}
+
+        columns = self._read(station_id)
+        if columns is None or len(columns["timestamp"]) == 0:
+            self._write(station_id, new_columns)
+            return len(new_columns["timestamp"])
+
+        cached_timestamps = columns["timestamp"]
+        if new_columns["timestamp"][0] > cached_timestamps[-1]:
+            # Common case of an update with only new hours
+            merged = {column: np.concatenate([columns[column], new_columns[column]]) for column in _COLUMNS}
+            changed = len(new_columns["timestamp"])
+        else:
+            positions = np.searchsorted(cached_timestamps, new_columns["timestamp"])
+            found = positions < len(cached_timestamps)
+            found[found] = cached_timestamps[positions[found]] == new_columns["timestamp"][found]
+            unchanged = np.zeros(len(found), dtype=bool)
+            unchanged[found] = np.all(
+                [columns[column][positions[found]] == new_columns[column][found] for column in _COLUMNS], axis=0
+            )
+            changed = int((~unchanged).sum())
+            if changed == 0:
+                return 0
+
+            kept = np.ones(len(cached_timestamps), dtype=bool)
+            kept[positions[found]] = False
+            merged = {column: np.concatenate([columns[column][kept], new_columns[column]]) for column in _COLUMNS}
+            order = np.argsort(merged["timestamp"], kind="stable")
+            merged = {column: values[order] for column, values in merged.items()}
+
+        self._write(station_id, merged)
+        return changed
+
+    def update(self, station_ids: list[int] | None = None) -> int:
+        """
+        Merge the new and recently revised hours of several stations from `transport.station_hour`.
+
+        Parameters
+        ----------
+        station_ids : list[int], optional
+            Stations to update. If None, every station with traffic data is updated.
+
+        Returns
+        -------
+        int
+            Number of new or changed hours
+        """
+        engine = get_engine()
+        merged = 0
+        try:
+            with engine.connect() as conn:
+                if station_ids is None:
+                    station_ids = conn.execute(text(_ALL_STATIONS_QUERY)).scalars().all()
+                station_ids = [int(station_id) for station_id in station_ids]
+                if not station_ids:
+                    return 0
+
+                since = []
+                for station_id in station_ids:
+                    watermark = self.watermark(station_id)
+                    since.append(
+                        None
+                        if watermark is None
+                        else (watermark - pd.Timedelta(hours=self.revision_hours)).to_pydatetime()
+                    )
+                rows = pd.read_sql(text(_NEW_TRAFFIC_QUERY), conn, params={"station_ids": station_ids, "since": since})
+        finally:
+            engine.dispose()
+
+        for station_id, station_rows in rows.groupby("station_id", sort=False):
+            merged += self.merge(int(station_id), station_rows)
+
+        logger.info(f"Series cache updated: {merged} new or changed rows for {len(station_ids)} stations")
+        return merged
+
+    def invalidate(self, station_ids: list[int] | None = None) -> int:
+        """
+        Delete the cached series of several stations, or of every station if None.
+
+        Returns
+        -------
+        int
+            Number of deleted station archives
+        """
+        if station_ids is None:
+            paths = [
+                os.path.join(self.cache_dir, name)
+                for name in os.listdir(self.cache_dir)
+                if name.startswith("station_") and name.endswith(".npz")
+            ]
+        else:
+            paths = [self._path(station_id) for station_id in station_ids]
+
+        deleted = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                deleted += 1
+            except FileNotFoundError:
+                pass
+        logger.info(f"Series cache invalidated for {deleted} stations")
+        return deleted
+
+    def rebuild(self, station_ids: list[int] | None = None) -> int:
+        """Read again the whole series of several stations, or of every station if None, e.g. after a backfill."""
+        self.invalidate(station_ids)
+        return self.update(station_ids)
+
+    def load(self, station_id: int, weeks: int | None = None) -> pd.DataFrame:
+        """
+        Return the cached series of a station, in the format of `preprocess_data` with a 'station_id' column.
+
+        Parameters
+        ----------
+        station_id : int
+            Station ID
+        weeks : int, optional
+            Number of weeks of history to return, counted back from the latest cached hour.
+            If None, the whole history is returned.
+
+        Returns
+        -------
+        pd.DataFrame
+            Cached series indexed by datetime, empty if the station is not cached
+        """
+        columns = self._read(station_id)
+        if columns is None:
+            return pd.DataFrame(columns=["station_id", "validations", "hour", "day_of_week", "month", "cat_day"])
+
+        index = pd.DatetimeIndex(columns["timestamp"].astype("datetime64[ns]"), name="datetime")
+        df = pd.DataFrame(
+            {
+                "station_id": np.full(len(index), int(station_id), dtype=np.int64),
+                "time_bin_id": columns["time_bin_id"],
+                "validations": columns["validations"],
+                "hour": columns["hour"].astype(np.int32),
+                "day_of_week": columns["day_of_week"].astype(np.int32),
+                "month": columns["month"].astype(np.int32),
+                "cat_day": pd.Categorical.from_codes(columns["cat_day"], categories=CAT_DAYS).astype(object),
+            },
+            index=index,
+        )
+        if weeks is not None and not df.empty:
+            df = df[df.index >= df.index.max() - pd.Timedelta(weeks=weeks)]
+        return df
+
+    def load_many(self, station_ids: list[int], weeks: int | None = None) -> dict[int, pd.DataFrame]:
+        """Return the cached series of several stations, skipping the stations that are not cached."""
+        data = {}
+        for station_id in station_ids:
+            df = self.load(station_id, weeks)
+            if not df.empty:
+                data[int(station_id)] = df
+        return data
@@ -0,0 +1,522 @@
+from datetime import datetime, timedelta
+import json
+import os
+import socket
+import threading
+import time
+
+from sqlalchemy import text
+
+from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.utils import get_engine
+
+logger = get_logger()
+
+_ENQUEUE = """
+INSERT INTO transport.station_queue (run_id, station_id, status, attempts, updated_at)
+SELECT :run_id, station_id, 'pending', 0, now()
+FROM unnest(CAST(:station_ids AS INTEGER[])) AS station_id
+ON CONFLICT (run_id, station_id) DO NOTHING
+"""
+
+# Pending stations and stations whose lease has expired are claimed, rows locked by another worker are skipped
+_CLAIM = """
+UPDATE transport.station_queue q SET
+    status = 'claimed',
+    worker = :worker,
+    attempts = q.attempts + 1,
+    lease_expires_at = now() + make_interval(secs => :lease_seconds),
+    updated_at = now()
+WHERE (q.run_id, q.station_id) IN (
+    SELECT run_id, station_id
+    FROM transport.station_queue
+    WHERE run_id = :run_id
+      AND (status = 'pending' OR (status = 'claimed' AND lease_expires_at < now()))
+    ORDER BY station_id
+    LIMIT :batch
+    FOR UPDATE SKIP LOCKED
+)
+RETURNING q.station_id
+"""
+
+# Stations claimed too many times without completing are given up
+_EXPIRE = """
+UPDATE transport.station_queue SET status = 'failed', error = 'lease expired', updated_at = now()
+WHERE run_id = :run_id AND status = 'claimed' AND lease_expires_at < now() AND attempts >= :max_attempts
+"""
+
+_RENEW = """
+UPDATE transport.station_queue SET lease_expires_at = now() + make_interval(secs => :lease_seconds), updated_at = now()
+WHERE run_id = :run_id AND station_id = ANY(CAST(:station_ids AS INTEGER[])) AND status = 'claimed' AND worker = :worker
+"""
+
+_COMPLETE = """
+UPDATE transport.station_queue SET status = 'done', result = :result, error = NULL, updated_at = now()
+WHERE run_id = :run_id AND station_id = :station_id AND status = 'claimed' AND worker = :worker
+"""
+
+_FAIL = """
+UPDATE transport.station_queue SET
+    status = CASE WHEN attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+    error = :error,
+    updated_at = now()
+WHERE run_id = :run_id AND station_id = :station_id AND status = 'claimed' AND worker = :worker
+"""
+
+_COUNTS = "SELECT status, COUNT(*) FROM transport.station_queue WHERE run_id = :run_id GROUP BY status"
+
+_RESULTS = "SELECT station_id, result FROM transport.station_queue WHERE run_id = :run_id AND status = 'done'"
+
+
+def default_worker_id() -> str:
+    """Identify the current process across hosts."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class PostgresWorkQueue:
+    """
+    Queue of the stations of a run, shared by workers on several hosts through `transport.station_queue`.
+
+    Workers claim stations with `SELECT ... FOR UPDATE SKIP LOCKED`, so concurrent claims
+    never wait for each other nor get the same station. A claim is a lease: a station whose
+    worker died is claimed again once its lease expires, up to `max_attempts` times.
+
+    Parameters
+    ----------
+    run_id : str
+        Identifier of the run, shared by its coordinator and workers
+    lease_seconds : float
+        Duration of a claim before the station can be claimed by another worker
+    max_attempts : int
+        Number of claims of a station before it is marked as failed
+    """
+
+    def __init__(self, run_id: str, lease_seconds: float = 900, max_attempts: int = 3):
+        self.run_id = run_id
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._engine = None
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = get_engine()
+        return self._engine
+
+    def _execute(self, query, **params):
+        with self.engine.begin() as conn:
+            return conn.execute(text(query), {"run_id": self.run_id, **params})
+
+    def enqueue(self, station_ids: list[int]) -> int:
+        """Add stations to the run, stations already queued are left untouched. Returns the number of new stations."""
+        return self._execute(_ENQUEUE, station_ids=[int(station_id) for station_id in station_ids]).rowcount
+
+    def claim(self, worker: str, batch: int = 1) -> list[int]:
+        """Lease up to `batch` stations to a worker and return their IDs."""
+        with self.engine.begin() as conn:
+            conn.execute(text(_EXPIRE), {"run_id": self.run_id, "max_attempts": self.max_attempts})
+            rows = conn.execute(
+                text(_CLAIM),
+                {"run_id": self.run_id, "worker": worker, "lease_seconds": self.lease_seconds, "batch": int(batch)},
+            )
+            return sorted(int(row[0]) for row in rows)
+
+    def renew(self, station_ids: list[int], worker: str) -> int:
+        """Extend the leases of stations still claimed by a worker."""
+        return self._execute(
+            _RENEW,
+            station_ids=[int(station_id) for station_id in station_ids],
+            worker=worker,
+            lease_seconds=self.lease_seconds,
+        ).rowcount
+
+    def complete(self, station_id: int, worker: str, result: dict) -> bool:
+        """Store the result of a station. Returns False if the worker lost its lease meanwhile."""
+        return (
+            self._execute(
+                _COMPLETE, station_id=int(station_id), worker=worker, result=json.dumps(result, default=str)
+            ).rowcount
+            == 1
+        )
+
+    def fail(self, station_id: int, worker: str, error: str) -> bool:
+        """Release a station after an error, to be retried unless it has used all its attempts."""
+        return (
+            self._execute(
+                _FAIL, station_id=int(station_id), worker=worker, error=str(error), max_attempts=self.max_attempts
+            ).rowcount
+            == 1
+        )
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of stations of the run per status."""
+        return {status: int(count) for status, count in self._execute(_COUNTS)}
+
+    def results(self) -> dict[int, dict]:
+        """Return the results of the completed stations."""
+        return {int(station_id): json.loads(result) for station_id, result in self._execute(_RESULTS)}
+
+    def is_finished(self) -> bool:
+        """Whether every station of the run is done or failed."""
+        counts = self.counts()
+        return counts.get("pending", 0) == 0 and counts.get("claimed", 0) == 0
+
+
+class FileWorkQueue:
+    """
+    Queue of the stations of a run in a directory, for a single host or a shared filesystem.
+
+    Each station is a file moved between the 'pending', 'claimed', 'done' and 'failed'
+    subdirectories. Claims rely on the atomicity of `os.rename`, and the lease of a claim
+    is the modification time of its file.
+
+    Parameters
+    ----------
+    queue_dir : str
+        Root directory of the queues, the run is stored in its `run_id` subdirectory
+    run_id : str
+        Identifier of the run, shared by its coordinator and workers
+    lease_seconds : float
+        Duration of a claim before the station can be claimed by another worker
+    max_attempts : int
+        Number of claims of a station before it is marked as failed
+    """
+
+    _STATUSES = ("pending", "claimed", "done", "failed")
+
+    def __init__(self, queue_dir: str, run_id: str, lease_seconds: float = 900, max_attempts: int = 3):
+        self.run_id = run_id
+        self.root = os.path.join(queue_dir, run_id)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        for status in self._STATUSES:
+            os.makedirs(os.path.join(self.root, status), exist_ok=True)
+
+    def _path(self, status, name):
+        return os.path.join(self.root, status, name)
+
+    def _claimed_name(self, station_id, worker):
+        return f"{int(station_id)}@{worker.replace(os.sep, '_')}"
+
+    @staticmethod
+    def _read(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write(path, record):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp_path, path)
+
+    def _release(self, claimed_path, station_id, record):
+        # Stations that used all their attempts are given up instead of being queued again
+        status = "failed" if record.get("attempts", 0) >= self.max_attempts else "pending"
+        self._write(claimed_path, record)
+        os.rename(claimed_path, self._path(status, str(int(station_id))))
+
+    def enqueue(self, station_ids: list[int]) -> int:
+        """Add stations to the run, stations already queued are left untouched. Returns the number of new stations."""
+        existing = {
+            name.split("@")[0].removesuffix(".json")
+            for status in self._STATUSES
+            for name in os.listdir(os.path.join(self.root, status))
+        }
+        added = 0
+        for station_id in station_ids:
+            if str(int(station_id)) not in existing:
+                self._write(self._path("pending", str(int(station_id))), {"attempts": 0})
+                added += 1
+        return added
+
+    def _expire_leases(self):
+        deadline = time.time() - self.lease_seconds
+        for name in os.listdir(os.path.join(self.root, "claimed")):
+            path = self._path("claimed", name)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    record = self._read(path)
+                    record["error"] = "lease expired"
+                    self._release(path, name.split("@")[0], record)
+            except (FileNotFoundError, ValueError):
+                # Completed, released or reclaimed by another process meanwhile
+                continue
+
+    def claim(self, worker: str, batch: int = 1) -> list[int]:
+        """Lease up to `batch` stations to a worker and return their IDs."""
+        self._expire_leases()
+
+        claimed = []
+        for name in sorted(os.listdir(os.path.join(self.root, "pending")), key=lambda name: (len(name), name)):
+            if len(claimed) >= batch or name.endswith(".tmp"):
+                continue
+            claimed_path = self._path("claimed", self._claimed_name(name, worker))
+            try:
+                os.rename(self._path("pending", name), claimed_path)
+                # The rename keeps the modification time of the enqueue, the lease starts now
+                os.utime(claimed_path)
+                record = self._read(claimed_path)
+            except FileNotFoundError:
+                # Claimed by another worker first, or released by a concurrent lease expiry
+                continue
+
+            record.update(attempts=record.get("attempts", 0) + 1, worker=worker)
+            self._write(claimed_path, record)
+            claimed.append(int(name))
+        return claimed
+
+    def renew(self, station_ids: list[int], worker: str) -> int:
+        """Extend the leases of stations still claimed by a worker."""
+        renewed = 0
+        for station_id in station_ids:
+            try:
+                os.utime(self._path("claimed", self._claimed_name(station_id, worker)))
+                renewed += 1
+            except FileNotFoundError:
+                continue
+        return renewed
+
+    def complete(self, station_id: int, worker: str, result: dict) -> bool:
+        """Store the result of a station. Returns False if the worker lost its lease meanwhile."""
+        claimed_path = self._path("claimed", self._claimed_name(station_id, worker))
+        try:
+            record = self._read(claimed_path)
+        except FileNotFoundError:
+            return False
+
+        record.update(result=result, error=None)
+        self._write(claimed_path, record)
+        try:
+            os.rename(claimed_path, self._path("done", f"{int(station_id)}.json"))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def fail(self, station_id: int, worker: str, error: str) -> bool:
+        """Release a station after an error, to be retried unless it has used all its attempts."""
+        claimed_path = self._path("claimed", self._claimed_name(station_id, worker))
+        try:
+            record = self._read(claimed_path)
+            record["error"] = str(error)
+            self._release(claimed_path, station_id, record)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def counts(self) -> dict[str, int]:
+        """Return the number of stations of the run per status."""
+        counts = {}
+        for status in self._STATUSES:
+            count = sum(not name.endswith(".tmp") for name in os.listdir(os.path.join(self.root, status)))
+            if count:
+                counts[status] = count
+        return counts
+
+    def results(self) -> dict[int, dict]:
+        """Return the results of the completed stations."""
+        return {
+            int(name.removesuffix(".json")): self._read(self._path("done", name))["result"]
+            for name in os.listdir(os.path.join(self.root, "done"))
+            if name.endswith(".json")
+        }
+
+    def is_finished(self) -> bool:
+        """Whether every station of the run is done or failed."""
+        counts = self.counts()
+        return counts.get("pending", 0) == 0 and counts.get("claimed", 0) == 0
+
+
+class _LeaseHeartbeat:
+    """Renew the leases of the stations held by a worker from a background thread, while it fits them."""
+
+    def __init__(self, queue, worker, interval):
+        self.queue = queue
+        self.worker = worker
+        self.interval = interval
+        self._held = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-heartbeat-{worker}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def hold(self, station_ids):
+        with self._lock:
+            self._held.update(station_ids)
+
+    def release(self, station_id):
+        with self._lock:
+            self._held.discard(station_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                station_ids = sorted(self._held)
+            if not station_ids:
+                continue
+            try:
+                self.queue.renew(station_ids, self.worker)
+            except Exception as e:
+                logger.warning(f"Worker {self.worker} could not renew its leases: {e}")
+
+
+def process_station(predictor, station_id: int, optimize: bool = True) -> dict:
+    """
+    Optimize the ARIMA order of a station, if requested, and forecast it.
+
+    Returns
+    -------
+    dict
+        Grid search result of the station (without optimization, only its 'order') and its 'total_validations'
+    """
+    result = {}
+    if optimize:
+        # The queue keeps track of the completed stations, the grid search checkpoint is not needed,
+        # and the coordinator saves the parameters of the whole run once
+        result = dict(
+            predictor.optimize_stations([station_id], workers=1, checkpoint=False, export=False).get(station_id, {})
+        )
+
+    predictions, total = predictor.predict_for_station(station_id)
+    if predictions is None:
+        raise RuntimeError(f"No predictions for station {station_id}")
+
+    result["order"] = list(result.get("order") or predictor.station_params.get(station_id))
+    result["total_validations"] = int(total)
+    return result
+
+
+def run_worker(
+    queue,
+    predictor=None,
+    worker: str | None = None,
+    optimize: bool = True,
+    batch: int = 1,
+    poll_interval: float = 10,
+    heartbeat_interval: float | None = None,
+) -> int:
+    """
+    Claim and process stations of a queue until every station of the run is done or failed.
+
+    Parameters
+    ----------
+    queue : PostgresWorkQueue or FileWorkQueue
+        Queue of the run
+    predictor : ArimaPredictor, optional
+        Predictor fitting the stations, created from the configuration if None
+    worker : str, optional
+        Identifier of the worker, defaults to the host name and process ID
+    optimize : bool
+        If True, the ARIMA order of each station is searched before forecasting it
+    batch : int
+        Number of stations claimed at a time
+    poll_interval : float
+        Delay (in seconds) between two claims when every remaining station is leased to other workers
+    heartbeat_interval : float, optional
+        Delay (in seconds) between two renewals of the leases of the claimed stations,
+        defaults to a third of the lease duration
+
+    Returns
+    -------
+    int
+        Number of stations completed by this worker
+    """
+    if predictor is None:
+        from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
+
+        predictor = ArimaPredictor()
+
+    worker = worker or default_worker_id()
+    completed = 0
+    logger.info(f"Worker {worker} started on run {queue.run_id}")
+
+    # Leases are renewed while a station is fitted, so a fit longer than the lease is not given to another worker
+    with _LeaseHeartbeat(queue, worker, heartbeat_interval or queue.lease_seconds / 3) as heartbeat:
+        while True:
+            station_ids = queue.claim(worker, batch)
+            if not station_ids:
+                # Stations leased to other workers may still come back if their worker dies
+                if queue.is_finished():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            heartbeat.hold(station_ids)
+            for station_id in station_ids:
+                try:
+                    result = process_station(predictor, station_id, optimize)
+                except Exception as e:
+                    logger.error(f"Worker {worker} failed on station {station_id}: {e}")
+                    heartbeat.release(station_id)
+                    queue.fail(station_id, worker, e)
+                    continue
+
+                heartbeat.release(station_id)
+                if queue.complete(station_id, worker, result):
+                    completed += 1
+                else:
+                    logger.warning(f"Worker {worker} lost the lease of station {station_id}, its result is discarded")
+
+    logger.info(f"Worker {worker} completed {completed} stations of run {queue.run_id}")
+    return completed
+
+
+def run_coordinator(
+    queue,
+    station_ids: list[int],
+    predictor=None,
+    poll_interval: float = 10,
+    timeout: float | None = None,
+) -> dict[int, dict]:
+    """
+    Enqueue the stations of a run, wait for the workers and save the collected parameters.
+
+    Parameters
+    ----------
+    queue : PostgresWorkQueue or FileWorkQueue
+        Queue of the run
+    station_ids : list[int]
+        Stations of the run
+    predictor : ArimaPredictor, optional
+        Predictor whose parameters are updated and saved, created from the configuration if None
+    poll_interval : float
+        Delay (in seconds) between two progress checks
+    timeout : float, optional
+        Maximum duration of the wait, in seconds. The results collected so far are saved on timeout.
+
+    Returns
+    -------
+    dict[int, dict]
+        Results of the completed stations
+    """
+    if predictor is None:
+        from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
+
+        predictor = ArimaPredictor()
+
+    added = queue.enqueue(station_ids)
+    logger.info(f"Enqueued {added} stations on run {queue.run_id}")
+
+    deadline = datetime.now() + timedelta(seconds=timeout) if timeout is not None else None
+    while not queue.is_finished():
+        if deadline is not None and datetime.now() >= deadline:
+            logger.warning(f"Run {queue.run_id} did not finish in {timeout}s, saving the results collected so far")
+            break
+        logger.info(f"Run {queue.run_id} progress: {queue.counts()}")
+        time.sleep(poll_interval)
+
+    results = queue.results()
+    records = {station_id: {**result, "order": tuple(result["order"])} for station_id, result in results.items()}
+    if records:
+        predictor.station_params.update({station_id: record["order"] for station_id, record in records.items()})
+        predictor.save_params(records)
+
+    logger.info(f"Run {queue.run_id} finished: {queue.counts()}")
+    return results
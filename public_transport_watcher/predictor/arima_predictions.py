@@ -1,29 +1,102 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
 import json
+import multiprocessing
 import os
+import signal
+import threading
+import time
 
 import pandas as pd
 
 from public_transport_watcher.logging_config import get_logger
 from public_transport_watcher.predictor.arima import (
+    ArimaModelCache,
+    ArimaParamStore,
+    ForecastFrame,
+    HourlyProfileCube,
+    StationSeriesCache,
+    correct_intraday,
+    fast_forecast,
     find_optimal_params,
+    forecast_day_ahead,
+    get_bulk_data_from_db,
     get_data_from_db,
     predict_navigo_validations,
+    run_grid_search,
+    save_station_params,
 )
 from public_transport_watcher.predictor.configuration import ARIMA_CONFIG
 
 logger = get_logger()
 
+# Predictor instance owned by each worker process of the station pool
+_worker_predictor = None
+
+
+class StationTimeoutError(BaseException):
+    """Raised when a station forecast exceeds its time budget.
+
+    It derives from BaseException so the broad `except Exception` blocks of the
+    forecasting steps cannot swallow it and keep fitting models past the deadline.
+    """
+
 
 class ArimaPredictor:
-    def __init__(self):
-        self.params_file = ARIMA_CONFIG["params_station_file"]
-        self.p_range = ARIMA_CONFIG["p_range"]
-        self.d_range = ARIMA_CONFIG["d_range"]
-        self.q_range = ARIMA_CONFIG["q_range"]
-        self._load_all_station_params()
+    def __init__(self, station_params=None, config=None):
+        # Kept to build the predictors of the station worker processes
+        self.config = config = ARIMA_CONFIG if config is None else config
+        self.params_file = config["params_station_file"]
+        self.p_range = config["p_range"]
+        self.d_range = config["d_range"]
+        self.q_range = config["q_range"]
+        self.parallel_config = config.get("parallel", {})
+        self.bulk_config = config.get("bulk_loading")
+        self.forecasts_dir = config.get("forecasts_dir")
+        self.forecasts_keep = config.get("forecasts_keep")
+        self.grid_search_config = config.get("grid_search", {})
+        self.engine = config.get("engine", "arima")
+        self.fast_engine_config = config.get("fast_engine", {})
+        self.day_ahead_config = config.get("day_ahead", {})
+        # Nightly forecast, kept uncorrected so every hourly correction starts from it
+        self.day_ahead_forecast = None
+        self.corrected_day_ahead_forecast = None
+        self.last_run_stats = {}
+        self.last_forecast = None
+
+        params_store = config.get("params_store")
+        self.params_store = ArimaParamStore(params_store) if params_store else None
+
+        model_cache = config.get("model_cache")
+        self.model_cache = ArimaModelCache(**model_cache) if model_cache else None
+
+        series_cache = config.get("series_cache")
+        self.series_cache = StationSeriesCache(**series_cache) if series_cache else None
+
+        self.profile_cube_file = config.get("profile_cube_file")
+        self.load_profile_cube()
+
+        if station_params is None:
+            self._load_all_station_params()
+        else:
+            self.station_params = dict(station_params)
 
     def _load_all_station_params(self):
         self.station_params = {}
+        if self.params_store is not None:
+            try:
+                self.station_params = self.params_store.load_all()
+                if not self.station_params and os.path.exists(self.params_file):
+                    logger.info(f"Parameters store is empty, importing {self.params_file}")
+                    self.params_store.import_json(self.params_file)
+                    self.station_params = self.params_store.load_all()
+
+                logger.info(f"Loaded ARIMA parameters for {len(self.station_params)} stations from parameters store")
+                return
+            except Exception as e:
+                logger.error(f"Error loading ARIMA parameters from store, falling back to the JSON file: {e}")
+
         if os.path.exists(self.params_file):
             try:
                 with open(self.params_file, "r") as f:
@@ -38,10 +111,151 @@ class ArimaPredictor:
         else:
             logger.error("No consolidated ARIMA parameters file found")
 
-    def predict_for_station(self, station_id, optimize_params=False):
+    def load_profile_cube(self):
+        """Load the precomputed hourly profiles, if they have been built."""
+        self.profile_cube = None
+        if self.profile_cube_file and os.path.exists(self.profile_cube_file):
+            try:
+                self.profile_cube = HourlyProfileCube.load(self.profile_cube_file)
+                logger.info(f"Loaded hourly profiles of {len(self.profile_cube.station_ids)} stations")
+            except Exception as e:
+                logger.error(f"Error loading hourly profile cube: {e}")
+        return self.profile_cube
+
+    def load_stations_data(self, station_ids):
+        """Load the traffic history of several stations at once, or None if bulk loading is disabled."""
+        if self.series_cache is not None:
+            try:
+                self.series_cache.update(station_ids)
+                return self.series_cache.load_many(station_ids, weeks=(self.bulk_config or {}).get("history_weeks"))
+            except Exception as e:
+                logger.error(f"Error reading the series cache, loading the history from the database: {e}")
+
+        if self.bulk_config is None:
+            return None
+
+        return get_bulk_data_from_db(
+            station_ids,
+            weeks=self.bulk_config.get("history_weeks"),
+            partitions=self.bulk_config.get("partitions", 1),
+            chunksize=self.bulk_config.get("chunksize", 100000),
+        )
+
+    def _load_station_data(self, station_id):
+        if self.series_cache is not None:
+            try:
+                self.series_cache.update([station_id])
+                return self.series_cache.load(station_id)
+            except Exception as e:
+                logger.error(f"Error reading the series cache of station {station_id}: {e}")
+        return get_data_from_db(station_id)
+
+    def save_params(self, records=None):
+        """
+        Save ARIMA parameters to the parameters store and the consolidated JSON file exported from it,
+        or to the JSON file alone without store.
+
+        Parameters
+        ----------
+        records : dict, optional
+            Dictionary of station_id -> (p, d, q) or grid search result to save.
+            If None, all the parameters of the predictor are saved.
+        """
+        save_station_params(self.station_params, self.params_file, params_store=self.params_store, records=records)
+
+    def export_params(self):
+        """
+        Rewrite the consolidated JSON file once at the end of a run, from the parameters store
+        where the stations were upserted one by one, or from the predictor parameters without store.
+        """
+        save_station_params(self.station_params, self.params_file, params_store=self.params_store, records={})
+
+    def optimize_stations(
+        self, station_ids=None, workers=None, resume=False, max_age_days=None, checkpoint=True, export=True
+    ):
+        """
+        Search the best ARIMA order of several stations with the parallel grid search.
+
+        Parameters
+        ----------
+        station_ids : list[int], optional
+            Stations to optimize. If None, the stations of the parameters file are optimized.
+        workers : int, optional
+            Number of worker processes, defaults to the grid search configuration
+        resume : bool
+            If True, stations completed by a previous interrupted run are not searched again
+        max_age_days : float, optional
+            If set, only the stations never optimized or optimized more than `max_age_days` ago
+            are searched (requires the parameters store)
+        checkpoint : bool
+            If False, the completed stations are not written to the grid search checkpoint file
+        export : bool
+            If False, the consolidated JSON file is not rewritten at the end of the search,
+            for callers optimizing the stations one at a time
+
+        Returns
+        -------
+        dict[int, dict]
+            Grid search results per station
+        """
+        config = self.grid_search_config
+        if station_ids is None:
+            station_ids = self.station_params.keys()
+        station_ids = [int(station_id) for station_id in station_ids]
+        workers = workers or config.get("workers", 1)
+
+        if max_age_days is not None:
+            if self.params_store is None:
+                logger.warning("No parameters store configured, all stations will be optimized")
+            else:
+                station_ids = self.params_store.stale_stations(max_age_days, station_ids)
+                logger.info(f"{len(station_ids)} stations have parameters older than {max_age_days} days")
+
+        if not station_ids:
+            return {}
+
+        stations_data = self.load_stations_data(station_ids)
+        if stations_data is None:
+            stations_data = {station_id: get_data_from_db(station_id) for station_id in station_ids}
+
+        results = run_grid_search(
+            stations_data,
+            self.p_range,
+            self.d_range,
+            self.q_range,
+            workers=workers,
+            top_k=config.get("top_k"),
+            prune_window=config.get("prune_window"),
+            train_ratio=config.get("train_ratio", 0.8),
+            default_order=self.config.get("default_order", (1, 1, 1)),
+            checkpoint_file=config.get("checkpoint_file") if checkpoint else None,
+            resume=resume,
+            # Each station is committed to the store as soon as it is done, so nothing is lost on interruption,
+            # and the JSON file is exported once at the end
+            on_station_done=self._save_optimized_station,
+        )
+
+        for station_id, result in results.items():
+            self.station_params[station_id] = result["order"]
+        if export:
+            self.export_params()
+
+        return results
+
+    def _save_optimized_station(self, station_id, result):
+        self.station_params[station_id] = result["order"]
+        if self.params_store is None:
+            return
+        try:
+            self.params_store.upsert_many({station_id: result})
+        except Exception as e:
+            logger.error(f"Error saving the ARIMA parameters of station {station_id}: {e}")
+
+    def predict_for_station(self, station_id, optimize_params=False, data_raw=None):
         try:
             logger.info(f"Starting prediction for station {station_id}")
-            data_raw = get_data_from_db(station_id)
+            if data_raw is None:
+                data_raw = self._load_station_data(station_id)
 
             if data_raw.empty:
                 logger.error(f"No data available for station {station_id}")
@@ -59,13 +273,16 @@ class ArimaPredictor:
                     self.q_range,
                     self.station_params,
                     self.params_file,
+                    params_store=self.params_store,
                 )
             else:
                 arima_params = self.station_params[station_id]
 
             logger.info(f"Using ARIMA{arima_params} model for station {station_id}")
 
-            predictions, total = predict_navigo_validations(data_raw, station_id, arima_params)
+            predictions, total = predict_navigo_validations(
+                data_raw, station_id, arima_params, model_cache=self.model_cache, profile_cube=self.profile_cube
+            )
 
             logger.info(f"Prediction completed successfully for station {station_id}")
             return predictions, total
@@ -87,17 +304,52 @@ class ArimaPredictor:
                 return pd.DataFrame()
 
             logger.info(f"Found {len(station_ids)} stations to process")
-            all_predictions = pd.DataFrame(columns=["station_id", "predictions", "total"])
 
-            for station_id in station_ids:
-                logger.info(f"Processing station {station_id}")
-                predictions, total = self.predict_for_station(station_id, optimize_params)
+            if self.engine == "fast":
+                return self._predict_fast(station_ids)
 
-                if predictions is not None:
-                    new_row = pd.DataFrame([{"station_id": station_id, "predictions": predictions, "total": total}])
-                    all_predictions = pd.concat([all_predictions, new_row], ignore_index=True)
+            workers = min(self.parallel_config.get("workers", 1) or 1, len(station_ids))
+            timeout = self.parallel_config.get("station_timeout")
+            start_time = time.perf_counter()
+
+            stations_data = self.load_stations_data(station_ids)
+
+            if workers > 1 or (timeout and hasattr(signal, "SIGALRM") and not _on_main_thread()):
+                # Off the main thread the timeout cannot be armed here, the stations then run in a
+                # worker process whose main thread enforces it
+                chunksize = max(1, self.parallel_config.get("chunksize", 1))
+                results = self._predict_in_pool(
+                    station_ids, optimize_params, workers, chunksize, timeout, stations_data
+                )
+            else:
+                results = self._predict_sequentially(station_ids, optimize_params, timeout, stations_data)
+            if optimize_params:
+                # The searched stations are only upserted into the store, the JSON file is rewritten once
+                self.export_params()
+
+            succeeded = []
+            for result in results:
+                if result["status"] == "ok":
+                    succeeded.append(result)
                 else:
-                    logger.warning(f"Could not generate predictions for station {station_id}")
+                    logger.warning(
+                        f"Could not generate predictions for station {result['station_id']} ({result['status']})"
+                    )
+
+            all_predictions = pd.DataFrame(
+                [
+                    {"station_id": result["station_id"], "predictions": result["predictions"], "total": result["total"]}
+                    for result in succeeded
+                ],
+                columns=["station_id", "predictions", "total"],
+            )
+            self.last_forecast = ForecastFrame.from_predictions(
+                [result["station_id"] for result in succeeded], [result["predictions"] for result in succeeded]
+            )
+            self.save_forecast(self.last_forecast)
+            if self.model_cache is not None:
+                self.model_cache.evict()
+            self.last_run_stats = _summarize_run(results, time.perf_counter() - start_time, workers)
 
             logger.info(f"Successfully generated predictions for {all_predictions.shape[0]} stations")
             return all_predictions
@@ -109,6 +361,313 @@ class ArimaPredictor:
             logger.error(traceback.format_exc())
             return pd.DataFrame()
 
+    def _predict_fast(self, station_ids):
+        start_time = time.perf_counter()
+
+        stations_data = self.load_stations_data(station_ids)
+        if stations_data is None:
+            # The fast engine needs every station at once, whatever the bulk loading configuration
+            stations_data = get_bulk_data_from_db(station_ids)
+
+        forecast = fast_forecast(
+            {station_id: stations_data.get(station_id, pd.DataFrame()) for station_id in station_ids},
+            profile_cube=self.profile_cube,
+            **self.fast_engine_config,
+        )
+
+        forecasted_ids, totals = forecast.totals()
+        predictions = forecast.to_frame().astype({"forecast": int, "forecast_complete": int})
+        all_predictions = pd.DataFrame(
+            [
+                {
+                    "station_id": int(station_id),
+                    "predictions": station_predictions.set_index("target_hour")[["forecast", "forecast_complete"]],
+                    "total": int(total),
+                }
+                for (station_id, station_predictions), total in zip(
+                    predictions.groupby("station_id", sort=False), totals
+                )
+            ],
+            columns=["station_id", "predictions", "total"],
+        )
+
+        self.last_forecast = forecast
+        self.save_forecast(forecast)
+
+        wall_time = time.perf_counter() - start_time
+        self.last_run_stats = {
+            "stations": len(station_ids),
+            "succeeded": len(forecasted_ids),
+            "failed": len(station_ids) - len(forecasted_ids),
+            "timed_out": 0,
+            "workers": 1,
+            "wall_time": wall_time,
+        }
+        logger.info(f"Fast engine generated predictions for {len(forecasted_ids)} stations in {wall_time:.2f}s")
+        return all_predictions
+
+    def forecast_day_ahead(self, start=None, horizon=None):
+        """
+        Forecast every hour of the current or coming day(s) for all stations and save the station x hour forecast.
+
+        The forecast is saved to the day-ahead forecast file, and to the corrected forecast file
+        until the first intraday correction replaces it.
+
+        Parameters
+        ----------
+        start : datetime, optional
+            First forecasted hour, defaults to midnight of the current day
+        horizon : int, optional
+            Number of forecasted hours, defaults to the day-ahead configuration
+
+        Returns
+        -------
+        ForecastFrame or None
+            Day-ahead forecast, or None if it could not be computed
+        """
+        config = self.day_ahead_config
+        try:
+            station_ids = [int(station_id) for station_id in self.station_params.keys()]
+            stations_data = self.load_stations_data(station_ids)
+            if stations_data is None:
+                stations_data = get_bulk_data_from_db(station_ids)
+
+            forecast = forecast_day_ahead(
+                stations_data,
+                start=start,
+                horizon=horizon or config.get("horizon", 24),
+                profile_cube=self.profile_cube,
+                recent_days=self.fast_engine_config.get("recent_days", 28),
+            )
+            self.day_ahead_forecast = forecast
+            self.corrected_day_ahead_forecast = forecast
+            _save_forecast_file(forecast, config.get("forecast_file"))
+            _save_forecast_file(forecast, config.get("corrected_file"))
+            return forecast
+        except Exception as e:
+            logger.error(f"Error during day-ahead forecast: {e}")
+            return None
+
+    def correct_day_ahead(self, now=None):
+        """
+        Rescale the remaining hours of the day-ahead forecast with the validations observed so far.
+
+        The correction always starts from the uncorrected nightly forecast, so corrections do not
+        stack up from one hour to the next, and is saved to the corrected forecast file.
+
+        Parameters
+        ----------
+        now : datetime, optional
+            Time of the correction, defaults to the current time
+
+        Returns
+        -------
+        ForecastFrame or None
+            Corrected forecast, or None if no day-ahead forecast is available
+        """
+        config = self.day_ahead_config
+        forecast = self.day_ahead_forecast
+        forecast_file = config.get("forecast_file")
+        if forecast is None and forecast_file and os.path.exists(forecast_file):
+            forecast = self.day_ahead_forecast = ForecastFrame.load(forecast_file)
+        if forecast is None or len(forecast) == 0:
+            logger.warning("No day-ahead forecast to correct")
+            return None
+
+        try:
+            # One week of history is enough to cover the correction window
+            stations_data = get_bulk_data_from_db(
+                [int(station_id) for station_id in forecast.unique_station_ids], weeks=1
+            )
+            corrected = correct_intraday(
+                forecast,
+                stations_data,
+                now=now,
+                window=config.get("correction_window", 3),
+                bounds=config.get("correction_bounds", (0.5, 2.0)),
+            )
+            self.corrected_day_ahead_forecast = corrected
+            _save_forecast_file(corrected, config.get("corrected_file"))
+            return corrected
+        except Exception as e:
+            logger.error(f"Error during intraday correction of the day-ahead forecast: {e}")
+            return None
+
+    def save_forecast(self, forecast):
+        """Save the forecasts of a run in the forecasts directory, if one is configured."""
+        if not self.forecasts_dir or len(forecast) == 0:
+            return None
+
+        try:
+            path = forecast.save(os.path.join(self.forecasts_dir, f"forecast_{datetime.now():%Y%m%d_%H%M}.npz"))
+            self._prune_forecasts()
+            return path
+        except Exception as e:
+            logger.error(f"Error saving forecasts: {e}")
+            return None
+
+    def _prune_forecasts(self):
+        # Run files are named after their time, so the name order is the chronological order
+        if not self.forecasts_keep:
+            return
+        run_files = sorted(
+            name for name in os.listdir(self.forecasts_dir) if name.startswith("forecast_") and name.endswith(".npz")
+        )
+        for name in run_files[: -self.forecasts_keep]:
+            os.remove(os.path.join(self.forecasts_dir, name))
+        if len(run_files) > self.forecasts_keep:
+            logger.info(f"Deleted {len(run_files) - self.forecasts_keep} old forecast files")
+
+    def _predict_sequentially(self, station_ids, optimize_params, timeout, stations_data=None):
+        results = []
+        for i, station_id in enumerate(station_ids, 1):
+            logger.info(f"Processing station {station_id} ({i}/{len(station_ids)})")
+            data_raw = _station_data(stations_data, station_id)
+            results.append(_timed_station_prediction(self, station_id, optimize_params, timeout, data_raw))
+        return results
+
+    def _predict_in_pool(self, station_ids, optimize_params, workers, chunksize, timeout, stations_data=None):
+        chunks = [
+            [(station_id, _station_data(stations_data, station_id)) for station_id in station_ids[i : i + chunksize]]
+            for i in range(0, len(station_ids), chunksize)
+        ]
+        logger.info(f"Dispatching {len(station_ids)} stations to {workers} workers in {len(chunks)} chunks")
+
+        results = []
+        pending = set(station_ids)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                # Forking a process whose other threads may hold locks (scheduler jobs, logging) can deadlock
+                mp_context=_pool_context(self.parallel_config.get("start_method", "forkserver")),
+                initializer=_init_station_worker,
+                # Workers build their own predictor from the configuration and load the profile cube
+                # from its file, instead of receiving a copy of this predictor and its profiles
+                initargs=(self.station_params, self.config),
+            ) as executor:
+                futures = [executor.submit(_predict_station_chunk, chunk, optimize_params, timeout) for chunk in chunks]
+
+                for future in as_completed(futures):
+                    chunk_results = future.result()
+                    results.extend(chunk_results)
+
+                    for result in chunk_results:
+                        pending.discard(result["station_id"])
+                        if result["params"] is not None:
+                            self.station_params[result["station_id"]] = result["params"]
+                        logger.info(f"Station {result['station_id']} {result['status']} in {result['elapsed']:.2f}s")
+
+                    logger.info(f"Progress: {len(station_ids) - len(pending)}/{len(station_ids)} stations processed")
+
+        except BrokenProcessPool as e:
+            logger.error(f"Station worker pool crashed: {e}")
+            results.extend(_station_result(station_id, None, 0, 0.0, "failed") for station_id in pending)
+
+        order = {station_id: i for i, station_id in enumerate(station_ids)}
+        return sorted(results, key=lambda result: order[result["station_id"]])
+
+
+def _pool_context(start_method):
+    if start_method not in multiprocessing.get_all_start_methods():
+        start_method = "spawn"
+    return multiprocessing.get_context(start_method)
+
+
+def _init_station_worker(station_params, config):
+    global _worker_predictor
+    _worker_predictor = ArimaPredictor(station_params=station_params, config=config)
+
+
+def _predict_station_chunk(chunk, optimize_params, timeout):
+    return [
+        _timed_station_prediction(_worker_predictor, station_id, optimize_params, timeout, data_raw)
+        for station_id, data_raw in chunk
+    ]
+
+
+def _save_forecast_file(forecast, forecast_file):
+    if forecast_file and len(forecast) > 0:
+        # Written to a temporary file first so readers never see a partial forecast
+        tmp_file = forecast.save(f"{os.path.splitext(forecast_file)[0]}.tmp.npz")
+        os.replace(tmp_file, forecast_file)
+
+
+def _station_data(stations_data, station_id):
+    if stations_data is None:
+        return None
+    return stations_data.get(station_id, pd.DataFrame())
+
+
+def _timed_station_prediction(predictor, station_id, optimize_params, timeout, data_raw=None):
+    start_time = time.perf_counter()
+    try:
+        predictions, total = _run_with_timeout(
+            predictor.predict_for_station, timeout, station_id, optimize_params=optimize_params, data_raw=data_raw
+        )
+        status = "ok" if predictions is not None else "failed"
+    except StationTimeoutError:
+        logger.error(f"Prediction for station {station_id} exceeded the {timeout}s timeout")
+        predictions, total, status = None, 0, "timeout"
+
+    elapsed = time.perf_counter() - start_time
+    return _station_result(station_id, predictions, total, elapsed, status, predictor.station_params.get(station_id))
+
+
+def _station_result(station_id, predictions, total, elapsed, status, params=None):
+    return {
+        "station_id": station_id,
+        "predictions": predictions,
+        "total": total,
+        "elapsed": elapsed,
+        "status": status,
+        "params": params,
+    }
+
+
+def _on_main_thread():
+    return threading.current_thread() is threading.main_thread()
+
+
+def _run_with_timeout(func, timeout, *args, **kwargs):
+    # SIGALRM is only available on POSIX systems and can only be armed from the main thread
+    if not timeout or not hasattr(signal, "SIGALRM") or not _on_main_thread():
+        return func(*args, **kwargs)
+
+    def _raise_timeout(signum, frame):
+        raise StationTimeoutError
+
+    previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+
+
+def _summarize_run(results, wall_time, workers):
+    station_times = {result["station_id"]: result["elapsed"] for result in results}
+    statuses = [result["status"] for result in results]
+    stats = {
+        "stations": len(results),
+        "succeeded": statuses.count("ok"),
+        "failed": statuses.count("failed"),
+        "timed_out": statuses.count("timeout"),
+        "workers": workers,
+        "wall_time": wall_time,
+        "station_times": station_times,
+    }
+
+    if station_times:
+        times = pd.Series(station_times)
+        logger.info(
+            f"Processed {stats['stations']} stations in {wall_time:.1f}s with {workers} worker(s): "
+            f"{stats['succeeded']} succeeded, {stats['failed']} failed, {stats['timed_out']} timed out "
+            f"(per station: mean {times.mean():.2f}s, median {times.median():.2f}s, max {times.max():.2f}s)"
+        )
+
+    return stats
+
 
 if __name__ == "__main__":
     logger = get_logger()
@@ -8,24 +8,108 @@ ARIMA_DIR = CONFIG_DIR.parent
 
 ARIMA_CONFIG = {
     "graphs_dir": os.path.join(ARIMA_DIR, "model_performance", "graphs"),
+    "forecasts_dir": os.path.join(ARIMA_DIR, "model_performance", "forecasts"),
+    # Number of run files kept in the forecasts directory, the oldest are deleted (None keeps them all)
+    "forecasts_keep": 24 * 7,
     "params_station_file": os.path.join(CONFIG_DIR, "station_arima_params.json"),
+    # SQLite store of the ARIMA parameters and their fit metadata, seeded from the JSON file when empty
+    "params_store": os.path.join(CONFIG_DIR, "station_arima_params.sqlite"),
     "p_range": [0, 1, 2],
     "d_range": [0, 1],
     "q_range": [0, 1, 2],
     "default_order": (1, 1, 1),
+    # Forecasting engine of `predict_for_all_stations`: "arima" fits a model per station,
+    # "fast" forecasts all stations at once with `fast_forecast`
+    "engine": "arima",
+    "fast_engine": {
+        # Number of lags of the batched autoregressive term replacing the per-station ARIMA
+        "ar_order": 2,
+        "recent_days": 28,
+        "min_observations": 20,
+    },
+    "parallel": {
+        # Number of worker processes used by `predict_for_all_stations` (1 keeps the sequential loop)
+        "workers": os.cpu_count() or 1,
+        # Number of stations sent to a worker at once
+        "chunksize": 4,
+        # Maximum duration (in seconds) of a single station forecast before it is abandoned
+        "station_timeout": 120,
+        # Start method of the worker processes, "forkserver" or "spawn" ("fork" is unsafe from the scheduler threads)
+        "start_method": "forkserver",
+    },
+    "grid_search": {
+        # Number of worker processes fitting (station, order) pairs
+        "workers": os.cpu_count() or 1,
+        # Number of orders of each d with the best AIC kept for the out-of-sample RMSE step (None scores every order)
+        "top_k": 3,
+        # Number of most recent training hours used to rank orders by AIC (None uses the whole training set)
+        "prune_window": 24 * 7 * 12,
+        "train_ratio": 0.8,
+        # Completed stations of an optimization run, used to resume it
+        "checkpoint_file": os.path.join(ARIMA_DIR, "model_performance", "grid_search_checkpoint.jsonl"),
+    },
+    "work_queue": {
+        # Queue shared by the coordinator and the workers of a distributed run: "postgres" or "file"
+        "backend": "postgres",
+        # Directory of the "file" queues, which need a filesystem shared by the workers
+        "queue_dir": os.path.join(ARIMA_DIR, "model_performance", "work_queue"),
+        # Duration (in seconds) of a station claim, after which the station is given to another worker
+        "lease_seconds": 900,
+        # Number of claims of a station before it is marked as failed
+        "max_attempts": 3,
+        # Delay (in seconds) between two checks of the queue
+        "poll_interval": 10,
+    },
+    # Historical hourly profiles of all stations, rebuilt nightly by `build_profile_cube`
+    "profile_cube_file": os.path.join(ARIMA_DIR, "model_performance", "profile_cube.npz"),
+    "model_cache": {
+        # Fitted ARIMA parameters per (station, hour, order), updated by filtering instead of refitting
+        "cache_dir": os.path.join(ARIMA_DIR, "model_performance", "model_cache"),
+        # Total size above which the least recently used entries are evicted
+        "max_bytes": 64 * 1024 * 1024,
+        # Age (in hours) after which a cached model is fully refitted
+        "refit_hours": 24 * 7,
+        # Mean absolute standardized error of the new observations that triggers a refit
+        "drift_threshold": 3.0,
+    },
+    "series_cache": {
+        # Preprocessed traffic series per station, updated with the new and revised hours before each run
+        "cache_dir": os.path.join(ARIMA_DIR, "model_performance", "series_cache"),
+        # Number of cached hours read again by each update, to pick up revised or late validations
+        "revision_hours": 48,
+    },
+    "forecast_table": {
+        # Upsert the forecasts of each run into transport.forecast
+        "enabled": True,
+        # Maximum age (in seconds) of the API snapshot of the latest forecasts
+        "snapshot_ttl": 60,
+    },
+    "day_ahead": {
+        # Station x hour forecast of the current day(s), computed nightly, kept as the base of the corrections
+        "forecast_file": os.path.join(ARIMA_DIR, "model_performance", "day_ahead_forecast.npz"),
+        # Latest intraday correction of the forecast, read by routing and dashboards
+        "corrected_file": os.path.join(ARIMA_DIR, "model_performance", "day_ahead_forecast_corrected.npz"),
+        # Number of forecasted hours from midnight of the current day (24, or 48 to include the next day)
+        "horizon": 24,
+        # Rescale the remaining hours every hour with the validations observed during the last hours
+        "intraday_correction": True,
+        "correction_window": 3,
+        "correction_bounds": (0.5, 2.0),
+    },
+    "backtest": {
+        # Engines replayed by `python -m public_transport_watcher.predictor.arima.backtest`
+        "engines": ["blend", "arima", "fast"],
+        # Number of replayed hours, ending one hour before the latest observation
+        "hours": 24,
+        "workers": os.cpu_count() or 1,
+        "report_file": os.path.join(ARIMA_DIR, "model_performance", "backtest_report.json"),
+    },
+    "bulk_loading": {
+        # Weeks of history loaded for each station (None loads the whole history, needed for yearly profiles)
+        "history_weeks": None,
+        # Number of queries the stations are split into
+        "partitions": 1,
+        # Number of rows fetched from the database cursor at a time
+        "chunksize": 100000,
+    },
 }
-
-
-def get_station_params_file(station_id):
-    """
-    Get the path to a station-specific parameters file.
-
-    Args:
-        station_id (int): The station ID
-
-    Returns:
-        str: Path to the station parameters file
-    """
-    station_params_dir = ARIMA_CONFIG["params_dir"]
-    station_params_file = os.path.join(station_params_dir, f"station_{station_id}_params.json")
-    return station_params_file
@@ -12,6 +12,12 @@ PREDICTION_CONFIG = {
             "transfer_multiplier": 2.0,
         },
     },
+    "scheduler": {
+        # Worker threads running the scheduled jobs, so a long prediction run does not delay the other jobs
+        "workers": 2,
+        # Delay (in seconds) between two checks of the pending scheduled jobs
+        "poll_interval": 30,
+    },
     "arima": {
         "graphs_dir": "graphs",
         "params_station_file": os.path.join(os.path.dirname(__file__), "station_arima_params.json"),
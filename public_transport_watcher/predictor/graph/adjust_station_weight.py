@@ -1,6 +1,8 @@
 import networkx as nx
 import pandas as pd
 
+from public_transport_watcher.predictor.arima.forecast_frame import ForecastFrame
+
 
 def adjust_station_weights(
     G: nx.DiGraph,
@@ -19,8 +21,8 @@ def adjust_station_weights(
     ----------
     G : networkx.DiGraph
         The transport network graph
-    frequency_data : pd.DataFrame
-        DataFrame with 'station_id' and 'predictions' columns
+    frequency_data : pd.DataFrame or ForecastFrame
+        DataFrame with 'station_id' and 'predictions' columns, or the ForecastFrame of a prediction run
     weight_factor : float, default=0.1
         Factor to control how much the frequency affects weights (higher means more impact)
     base_penalty : float, default=5.0
@@ -33,7 +35,10 @@ def adjust_station_weights(
     networkx.DiGraph
         The modified graph with adjusted weights or congestion penalties
     """
-    if isinstance(frequency_data, dict):
+    if isinstance(frequency_data, ForecastFrame):
+        station_ids, totals = frequency_data.totals()
+        frequency_df = pd.DataFrame({"station_id": station_ids, "normalized_predictions": totals})
+    elif isinstance(frequency_data, dict):
         frequency_df = pd.DataFrame(
             {"station_id": list(frequency_data.keys()), "predictions": list(frequency_data.values())}
         )
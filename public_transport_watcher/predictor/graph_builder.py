@@ -1,3 +1,4 @@
+import os
 import pickle
 
 import pandas as pd
@@ -63,8 +64,11 @@ class GraphBuilder:
             raise ValueError(f"Graph object is required when saving {graph_type} graph")
 
         network_path = self._get_network_path(graph_type)
-        with open(network_path, "wb") as f:
+        # Readers of the file never see a partially written graph
+        tmp_path = f"{network_path}.tmp"
+        with open(tmp_path, "wb") as f:
             pickle.dump(graph, f)
+        os.replace(tmp_path, network_path)
         logger.info(f"{graph_type.title()} graph saved to {network_path}")
 
     def load_graph(self, graph_type="base"):
@@ -79,9 +83,10 @@ class GraphBuilder:
         G = self.load_graph(graph_type)
         return visualize_network(G)
 
-    def find_optimal_route(self, start_coords: tuple, end_coords: tuple, use_weighted=False) -> dict:
+    def find_optimal_route(self, start_coords: tuple, end_coords: tuple, use_weighted=False, graph=None) -> dict:
         graph_type = "weighted" if use_weighted else "base"
-        G = self.load_graph(graph_type)
+        # An in-memory graph avoids loading the pickle on every query
+        G = graph if graph is not None else self.load_graph(graph_type)
         (start_lat, start_lon) = start_coords
         (end_lat, end_lon) = end_coords
 
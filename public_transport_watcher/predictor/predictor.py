@@ -1,10 +1,13 @@
-import time
+import threading
 
 import schedule
 
 from public_transport_watcher.logging_config import get_logger
+from public_transport_watcher.predictor.arima import ForecastFrame, build_profile_cube, write_forecast
 from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
+from public_transport_watcher.predictor.configuration import ARIMA_CONFIG, PREDICTION_CONFIG
 from public_transport_watcher.predictor.graph_builder import GraphBuilder
+from public_transport_watcher.predictor.scheduler import BackgroundRunner, GraphBuffer
 
 logger = get_logger()
 
@@ -13,6 +16,13 @@ class Predictor:
     def __init__(self, build_graph_if_missing=True):
         self.arima_predictor = ArimaPredictor()
         self.graph_builder = GraphBuilder()
+        self.runner = None
+        # Double buffers of the graphs, a rebuilt graph is published without blocking route queries
+        self._base_graphs = GraphBuffer()
+        self._weighted_graphs = GraphBuffer()
+        # The background jobs run in several threads but share the ARIMA predictor state
+        # (station parameters, profile cube, forecasts), so they use it one at a time
+        self._arima_lock = threading.Lock()
 
         try:
             self.base_graph = self.graph_builder.load_graph("base")
@@ -35,11 +45,31 @@ class Predictor:
             logger.warning(f"Weighted graph not available: {e}. Will be created during first prediction update.")
             self.weighted_graph = None
 
+    @property
+    def base_graph(self):
+        return self._base_graphs.current
+
+    @base_graph.setter
+    def base_graph(self, graph):
+        self._base_graphs.publish(graph)
+
+    @property
+    def weighted_graph(self):
+        return self._weighted_graphs.current
+
+    @weighted_graph.setter
+    def weighted_graph(self, graph):
+        # The new graph is fully built before being published, route queries keep the previous one meanwhile
+        self._weighted_graphs.publish(graph)
+
     def predict_and_update_graph(self, optimize_arima_params=False):
         try:
             logger.info("Starting hourly prediction and graph update")
 
-            predictions_df = self.arima_predictor.predict_for_all_stations(optimize_params=optimize_arima_params)
+            with self._arima_lock:
+                predictions_df = self.arima_predictor.predict_for_all_stations(optimize_params=optimize_arima_params)
+                # The columnar forecasts of the run avoid unwrapping one DataFrame per station
+                forecast = self.arima_predictor.last_forecast
 
             if predictions_df.empty:
                 logger.error("Failed to generate predictions for stations")
@@ -47,9 +77,14 @@ class Predictor:
 
             logger.info(f"Generated predictions for {predictions_df.shape[0]} stations")
 
-            self.weighted_graph = self.graph_builder.update_weighted_graph(predictions_df)
+            frequency_data = forecast if isinstance(forecast, ForecastFrame) and len(forecast) > 0 else predictions_df
+
+            self.weighted_graph = self.graph_builder.update_weighted_graph(frequency_data)
             logger.info("Successfully updated weighted graph based on predictions")
 
+            if frequency_data is forecast:
+                self.save_forecast(forecast, self.arima_predictor.engine)
+
             return True
 
         except Exception as e:
@@ -59,18 +94,34 @@ class Predictor:
             logger.error(traceback.format_exc())
             return False
 
+    def save_forecast(self, forecast, model):
+        """Upsert the forecasts of a run into the forecast table, if enabled."""
+        if not ARIMA_CONFIG.get("forecast_table", {}).get("enabled"):
+            return 0
+
+        try:
+            return write_forecast(forecast, model)
+        except Exception as e:
+            logger.error(f"Error saving forecasts to the database: {e}")
+            return 0
+
     def find_optimal_route(self, start_coords, end_coords, use_weighted=None):
         try:
+            # A single read of each buffer, so a graph published during the query is not mixed in
+            weighted_graph = self.weighted_graph
             if use_weighted is None:
-                use_weighted = self.weighted_graph is not None
-            elif use_weighted and self.weighted_graph is None:
+                use_weighted = weighted_graph is not None
+            elif use_weighted and weighted_graph is None:
                 logger.warning("Weighted graph requested but not available. Using base graph.")
                 use_weighted = False
+            graph = weighted_graph if use_weighted else self.base_graph
 
             logger.info(
                 f"Finding optimal route from {start_coords} to {end_coords} using {'weighted' if use_weighted else 'base'} graph"
             )
-            route_info = self.graph_builder.find_optimal_route(start_coords, end_coords, use_weighted=use_weighted)
+            route_info = self.graph_builder.find_optimal_route(
+                start_coords, end_coords, use_weighted=use_weighted, graph=graph
+            )
             logger.info(
                 f"Found optimal route with total time: {route_info['total_time']} minutes using {route_info['graph_type']} graph"
             )
@@ -93,30 +144,88 @@ class Predictor:
             logger.error(f"Error rebuilding base graph: {e}")
             return False
 
+    def rebuild_profile_cube(self):
+        """Rebuild the historical hourly profiles of all stations and reload them in the ARIMA predictor."""
+        try:
+            logger.info("Rebuilding hourly profile cube")
+            with self._arima_lock:
+                build_profile_cube(self.arima_predictor.profile_cube_file)
+                self.arima_predictor.load_profile_cube()
+            return True
+        except Exception as e:
+            logger.error(f"Error rebuilding hourly profile cube: {e}")
+            return False
+
+    def update_day_ahead_forecast(self):
+        """Compute the station x hour forecast of the current day, read by routing and dashboards."""
+        with self._arima_lock:
+            forecast = self.arima_predictor.forecast_day_ahead()
+        return forecast is not None
+
+    def correct_day_ahead_forecast(self):
+        """Correct the remaining hours of the day-ahead forecast with the validations of the last hours."""
+        with self._arima_lock:
+            forecast = self.arima_predictor.correct_day_ahead()
+        return forecast is not None
+
+    def _background_runner(self):
+        runner = self.runner
+        if runner is None:
+            scheduler_config = PREDICTION_CONFIG.get("scheduler", {})
+            runner = BackgroundRunner(
+                workers=scheduler_config.get("workers", 2), poll_interval=scheduler_config.get("poll_interval", 30)
+            )
+            self.runner = runner
+        return runner
+
     def schedule_hourly_updates(self):
         logger.info("Setting up hourly prediction and graph update schedule")
-        schedule.every().hour.do(self.predict_and_update_graph)
+        runner = self._background_runner()
+        # Jobs run in background workers, a run still in progress when the next one is due is skipped
+        schedule.every().hour.do(runner.job("predict_and_update_graph", self.predict_and_update_graph))
+        schedule.every().day.at("03:00").do(runner.job("rebuild_profile_cube", self.rebuild_profile_cube))
+        # After the profile cube rebuild, so the forecast uses the fresh profiles
+        schedule.every().day.at("03:30").do(runner.job("update_day_ahead_forecast", self.update_day_ahead_forecast))
+        if ARIMA_CONFIG.get("day_ahead", {}).get("intraday_correction"):
+            schedule.every().hour.do(runner.job("correct_day_ahead_forecast", self.correct_day_ahead_forecast))
 
         logger.info("Hourly prediction schedule is set")
         return True
 
+    def start_background_scheduler(self):
+        """Run the scheduled jobs in the background and return the runner, without blocking the caller."""
+        runner = self._background_runner()
+        runner.submit("predict_and_update_graph", self.predict_and_update_graph)
+        runner.start()
+        return runner
+
+    def stop_background_scheduler(self, wait=True):
+        """Stop the background scheduler started by `start_background_scheduler`."""
+        runner = self.runner
+        if runner is not None:
+            runner.stop(wait=wait)
+            self.runner = None
+
+    def get_scheduler_metrics(self):
+        """Get the run counts and durations of the scheduled jobs."""
+        return self.runner.metrics() if self.runner is not None else {}
+
     def run_scheduled_tasks(self, run_forever=True):
         logger.info("Starting scheduled task runner")
 
-        self.predict_and_update_graph()
-
         if run_forever:
             logger.info("Entering scheduled task loop")
-            while True:
-                schedule.run_pending()
-                time.sleep(60)
+            self.start_background_scheduler().join()
         else:
-            schedule.run_pending()
+            runner = self._background_runner()
+            runner.run("predict_and_update_graph", self.predict_and_update_graph)
+            runner.run_pending()
             logger.info("Completed one-time run of scheduled tasks")
 
     def optimize_all_arima_models(self):
         logger.info("Starting optimization of ARIMA parameters for all stations")
-        predictions_df = self.arima_predictor.predict_for_all_stations(optimize_params=True)
+        with self._arima_lock:
+            predictions_df = self.arima_predictor.predict_for_all_stations(optimize_params=True)
         logger.info(f"Completed optimization for {predictions_df.shape[0]} stations")
         return predictions_df
 
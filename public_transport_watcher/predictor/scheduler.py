@@ -0,0 +1,210 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import threading
+import time
+
+import schedule
+
+from public_transport_watcher.logging_config import get_logger
+
+logger = get_logger()
+
+
+class GraphBuffer:
+    """
+    Double buffer of a transport network graph.
+
+    A new graph is built aside and published by swapping a single reference, so readers
+    always get a complete graph, never wait for a rebuild, and keep using the graph they
+    read even if a newer one is published meanwhile. The previous graph is kept as the
+    back buffer.
+
+    Parameters
+    ----------
+    graph : networkx.DiGraph, optional
+        Initial graph
+    """
+
+    def __init__(self, graph=None):
+        self._front = graph
+        self._back = None
+        self.version = 0 if graph is None else 1
+        self.published_at = None if graph is None else datetime.now()
+        self._lock = threading.Lock()
+
+    @property
+    def current(self):
+        """Graph currently served to readers."""
+        return self._front
+
+    @property
+    def previous(self):
+        """Graph served before the last publication."""
+        return self._back
+
+    def publish(self, graph):
+        """Make `graph` the current graph and return its version."""
+        with self._lock:
+            self._back, self._front = self._front, graph
+            self.version += 1
+            self.published_at = datetime.now()
+            return self.version
+
+
+class BackgroundRunner:
+    """
+    Runs scheduled jobs in background worker threads.
+
+    Each job is single-flight: a run requested while the previous one of the same job is
+    still going is skipped instead of queued. The duration and outcome of every run are
+    recorded in `metrics`.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker threads, i.e. of different jobs that can run at the same time
+    poll_interval : float
+        Delay (in seconds) between two checks of the pending scheduled jobs
+    scheduler : schedule.Scheduler, optional
+        Scheduler whose pending jobs are run, defaults to the default `schedule` scheduler
+    """
+
+    def __init__(self, workers: int = 2, poll_interval: float = 30, scheduler=None):
+        self.poll_interval = poll_interval
+        self.scheduler = scheduler
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="predictor-job")
+        self._running = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _acquire(self, name):
+        with self._lock:
+            if self._running.get(name):
+                self._job_metrics(name)["skipped"] += 1
+                logger.warning(f"Job {name} is still running, skipping this run")
+                return False
+            self._running[name] = True
+            return True
+
+    def _job_metrics(self, name):
+        return self._metrics.setdefault(
+            name,
+            {
+                "runs": 0,
+                "failures": 0,
+                "skipped": 0,
+                "last_started": None,
+                "last_duration": None,
+                "max_duration": 0.0,
+                "total_duration": 0.0,
+                "last_result": None,
+            },
+        )
+
+    def _execute(self, name, func, *args, **kwargs):
+        started_at = datetime.now()
+        start = time.perf_counter()
+        result = None
+        failed = False
+        try:
+            result = func(*args, **kwargs)
+            # The jobs of the predictor report their own errors by returning False
+            failed = result is False
+        except Exception as e:
+            failed = True
+            logger.error(f"Error during job {name}: {e}")
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                metrics = self._job_metrics(name)
+                metrics["runs"] += 1
+                metrics["failures"] += int(failed)
+                metrics["last_started"] = started_at.isoformat()
+                metrics["last_duration"] = duration
+                metrics["max_duration"] = max(metrics["max_duration"], duration)
+                metrics["total_duration"] += duration
+                metrics["last_result"] = "failed" if failed else "succeeded"
+                self._running[name] = False
+            logger.info(f"Job {name} {'failed' if failed else 'succeeded'} in {duration:.1f}s")
+        return result
+
+    def run(self, name: str, func, *args, **kwargs):
+        """Run a job in the calling thread, unless it is already running. Returns its result or None if skipped."""
+        if not self._acquire(name):
+            return None
+        return self._execute(name, func, *args, **kwargs)
+
+    def submit(self, name: str, func, *args, **kwargs):
+        """Run a job in a worker thread, unless it is already running. Returns its future or None if skipped."""
+        if not self._acquire(name):
+            return None
+        try:
+            return self._executor.submit(self._execute, name, func, *args, **kwargs)
+        except RuntimeError:
+            # The executor is shut down
+            with self._lock:
+                self._running[name] = False
+            raise
+
+    def job(self, name: str, func):
+        """Wrap `func` into a scheduled job submitted to the workers."""
+
+        def submit_job(*args, **kwargs):
+            self.submit(name, func, *args, **kwargs)
+
+        submit_job.__name__ = name
+        return submit_job
+
+    def is_running(self, name: str) -> bool:
+        """Whether a run of the job is in progress."""
+        return bool(self._running.get(name))
+
+    def metrics(self) -> dict:
+        """Return the run counts and durations (in seconds) of each job."""
+        with self._lock:
+            metrics = {
+                name: dict(job_metrics, running=bool(self._running.get(name)))
+                for name, job_metrics in self._metrics.items()
+            }
+        for job_metrics in metrics.values():
+            runs = job_metrics["runs"]
+            job_metrics["mean_duration"] = job_metrics["total_duration"] / runs if runs else None
+        return metrics
+
+    def run_pending(self):
+        """Start the scheduled jobs that are due."""
+        (self.scheduler or schedule).run_pending()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Error running scheduled jobs: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        """Start checking the scheduled jobs in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="predictor-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Background scheduler started, checking jobs every {self.poll_interval}s")
+        return self._thread
+
+    def join(self, timeout: float | None = None):
+        """Wait for the background scheduler thread to stop."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stop(self, wait: bool = True):
+        """Stop the background scheduler and, if `wait` is set, wait for the running jobs to finish."""
+        self._stop.set()
+        if wait:
+            self.join()
+        self._executor.shutdown(wait=wait)
+        logger.info("Background scheduler stopped")
@@ -0,0 +1,107 @@
+"""Micro-benchmark of the address parsing on a file the size of the Paris addresses file.
+
+Run with `make benchmark` or `python -m public_transport_watcher.tests.benchmarks.addresses`.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from public_transport_watcher.extractor.extract.addresses import _parse_addresses
+from public_transport_watcher.extractor.extract.typed_csv import read_typed_csv
+
+# Number of addresses of the Paris addresses file
+PARIS_ADDRESSES = 150_000
+
+_STREET_TYPES = ["RUE", "AVENUE", "BOULEVARD", "PLACE", "QUAI", "IMPASSE"]
+
+
+def write_addresses_file(path: str, rows: int = PARIS_ADDRESSES, seed: int = 0) -> None:
+    """Write a synthetic addresses file with the columns and value shapes of the Paris file."""
+    rng = np.random.default_rng(seed)
+    numbers = rng.integers(1, 300, rows)
+    suffixes = rng.choice(["", "B", "T", "Q"], rows, p=[0.9, 0.06, 0.03, 0.01])
+    streets = [
+        f"{street_type} DE LA VOIE {index}"
+        for street_type, index in zip(rng.choice(_STREET_TYPES, rows), rng.integers(0, 6000, rows))
+    ]
+    pd.DataFrame(
+        {
+            "N_SQ_AD": np.arange(rows) + 750000000,
+            "N_VOIE": numbers,
+            "C_SUF1": suffixes,
+            "C_SUF2": "",
+            "C_SUF3": "",
+            "C_AR": rng.integers(1, 21, rows) + 75000,
+            "L_ADR": [
+                f"{number}{' ' + suffix if suffix else ''} {street}"
+                for number, suffix, street in zip(numbers, suffixes, streets)
+            ],
+            "Geometry X Y": [
+                f"{lat:.6f},{lon:.6f}"
+                for lat, lon in zip(rng.uniform(48.81, 48.90, rows), rng.uniform(2.25, 2.41, rows))
+            ],
+            "L_VOIE": streets,
+        }
+    ).to_csv(path, sep=";", index=False)
+
+
+def parse_addresses_row_wise(addresses_df: pd.DataFrame) -> pd.DataFrame:
+    """Reference implementation with one `apply` per row, as before the vectorized parsing."""
+    df = addresses_df.copy()
+    df[["latitude", "longitude"]] = df["Geometry X Y"].str.split(",", expand=True)
+    df = df.astype(
+        {"N_VOIE": int, "C_SUF1": str, "C_SUF2": str, "C_SUF3": str, "C_AR": int, "latitude": float, "longitude": float}
+    )
+
+    def street_name(row):
+        name = row["L_ADR"].replace(str(row["N_VOIE"]), "")
+        for column in ("C_SUF1", "C_SUF2", "C_SUF3"):
+            name = name.replace(row[column], "")
+        return name.strip()
+
+    def street_number(row):
+        suffixes = [row[column] for column in ("C_SUF1", "C_SUF2", "C_SUF3") if row[column] not in ["nan", ""]]
+        return " ".join([str(row["N_VOIE"])] + suffixes).strip()
+
+    df["street_name"] = df.apply(street_name, axis=1)
+    df["number"] = df.apply(street_number, axis=1)
+    return df[["C_AR", "latitude", "longitude", "street_name", "number"]]
+
+
+def _best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows: int = PARIS_ADDRESSES, repeat: int = 3) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "adresses.csv")
+        write_addresses_file(path, rows)
+
+        read_time = _best_of(lambda: read_typed_csv(path, "paris_addresses"), repeat)
+        addresses_df = read_typed_csv(path, "paris_addresses")
+
+    row_wise_time = _best_of(lambda: parse_addresses_row_wise(addresses_df), repeat)
+    vectorized_time = _best_of(lambda: _parse_addresses(addresses_df), repeat)
+
+    print(f"{rows} addresses, best of {repeat}")
+    print(f"  read (typed CSV)      {read_time:8.3f} s")
+    print(f"  parse (row-wise)      {row_wise_time:8.3f} s")
+    print(f"  parse (vectorized)    {vectorized_time:8.3f} s  x{row_wise_time / vectorized_time:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=PARIS_ADDRESSES)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
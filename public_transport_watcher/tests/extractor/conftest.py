@@ -51,7 +51,15 @@ def mock_navigo_df():
 @pytest.fixture
 def mock_addresses_df():
     """Create a mock addresses DataFrame for testing."""
-    return pd.DataFrame({"street_name": ["Rue de la Paix", "Avenue des Champs-Élysées"], "C_AR": ["75001", "75008"]})
+    return pd.DataFrame(
+        {
+            "street_name": ["Rue de la Paix", "Avenue des Champs-Élysées"],
+            "C_AR": [75001, 75008],
+            "number": ["1", "2"],
+            "longitude": [2.3522, 2.3523],
+            "latitude": [48.8566, 48.8567],
+        }
+    )
 
 
 @pytest.fixture
@@ -1,7 +1,25 @@
 """Tests for the extraction functionality."""
 
+import os
+from types import SimpleNamespace
 from unittest.mock import patch
 
+import pandas as pd
+import pytest
+
+from public_transport_watcher.extractor.extract import (
+    NavigoProgress,
+    extract_addresses_informations,
+    extract_stations_informations,
+    iter_navigo_validations,
+    iter_schedule_informations,
+)
+from public_transport_watcher.extractor.extract.addresses import _parse_addresses
+from public_transport_watcher.extractor.extract.typed_csv import read_typed_csv
+from public_transport_watcher.extractor.extractor import Extractor
+from public_transport_watcher.extractor.manifest import DatalakeManifest, _file_hash
+from public_transport_watcher.utils import get_day_categories
+
 
 def test_extractor_initialization(extractor):
     """Test that the Extractor class initializes correctly."""
@@ -31,19 +49,19 @@ class TestNavigoExtraction:
     """Tests for Navigo validations extraction."""
 
     @patch("public_transport_watcher.extractor.extractor.get_query_result")
-    @patch("public_transport_watcher.extractor.extractor.extract_navigo_validations_informations")
+    @patch("public_transport_watcher.extractor.extractor.iter_navigo_validations")
     def test_extract_navigo_with_existing_stations(
         self, mock_extract, mock_get_query, extractor, mock_stations_df, mock_navigo_df
     ):
         """Test Navigo extraction when stations exist."""
         mock_get_query.return_value = mock_stations_df
-        mock_extract.return_value = mock_navigo_df
+        mock_extract.return_value = iter([mock_navigo_df])
         extractor.extract_navigo_validations()
         mock_get_query.assert_called_once_with("get_existing_stations")
         mock_extract.assert_called_once()
 
     @patch("public_transport_watcher.extractor.extractor.get_query_result")
-    @patch("public_transport_watcher.extractor.extractor.extract_navigo_validations_informations")
+    @patch("public_transport_watcher.extractor.extractor.iter_navigo_validations")
     def test_extract_navigo_without_stations(self, mock_extract, mock_get_query, extractor, mock_empty_df):
         """Test Navigo extraction when no stations exist."""
         mock_get_query.return_value = mock_empty_df
@@ -52,6 +70,110 @@ class TestNavigoExtraction:
         mock_extract.assert_not_called()
 
 
+class TestNavigoStreaming:
+    """Tests for the chunked extraction of Navigo validations."""
+
+    @staticmethod
+    def _write_period(root):
+        period_dir = root / "validations_navigo" / "2024" / "s1"
+        period_dir.mkdir(parents=True)
+        rows = [f"0{day}/01/2024;100;110;{ida};Station {ida};{ida};NAVIGO;10" for day in (1, 2) for ida in (1, 2, 3)]
+        (period_dir / "2024_s1_validations.csv").write_text(
+            "JOUR;CODE_STIF_TRNS;CODE_STIF_RES;CODE_STIF_ARRET;LIBELLE_ARRET;ID_REFA_LDA;CATEGORIE_TITRE;NB_VALD\n"
+            + "\n".join(rows)
+            + "\n",
+            encoding="latin1",
+        )
+        profiles = [
+            f"100;110;{ida};Station {ida};{ida};{cat_day};{hours};50"
+            for ida in (1, 2, 3)
+            for cat_day in ("JOHV", "DIJFP")
+            for hours in ("8H-9H", "9H-10H")
+        ]
+        (period_dir / "2024_s1_profils.csv").write_text(
+            "CODE_STIF_TRNS;CODE_STIF_RES;CODE_STIF_ARRET;LIBELLE_ARRET;ID_REFA_LDA;CAT_JOUR;TRNC_HORR_60;POURC\n"
+            + "\n".join(profiles)
+            + "\n",
+            encoding="latin1",
+        )
+
+    def test_chunks_are_resumed_after_an_interruption(self, tmp_path, monkeypatch):
+        """Test that an interrupted load resumes after the last inserted chunk."""
+        self._write_period(tmp_path)
+        monkeypatch.setenv("DATALAKE_ROOT", str(tmp_path))
+        config = {"files": {2024: ["s1"]}, "batch_size": 4, "memory_limit_mb": None}
+        progress_file = str(tmp_path / "progress.json")
+
+        chunks = iter_navigo_validations(config, NavigoProgress(progress_file))
+        first = next(chunks)
+        next(chunks)
+        chunks.close()  # interrupted while inserting the second chunk
+
+        assert NavigoProgress(progress_file).rows("2024/s1") == 4
+        assert sorted(first["ida"].unique()) == [1, 2, 3]
+
+        resumed = list(iter_navigo_validations(config, NavigoProgress(progress_file)))
+
+        assert len(resumed) == 1
+        assert sorted(resumed[0]["ida"].unique()) == [2, 3]
+        assert NavigoProgress(progress_file).is_done("2024/s1")
+        assert list(iter_navigo_validations(config, NavigoProgress(progress_file))) == []
+
+    def test_process_pool_yields_the_chunks_in_order(self, tmp_path, monkeypatch):
+        """Test that the process pool mode yields the same chunks as the in-process mode."""
+        self._write_period(tmp_path)
+        monkeypatch.setenv("DATALAKE_ROOT", str(tmp_path))
+        config = {"files": {2024: ["s1"]}, "batch_size": 2, "memory_limit_mb": None}
+
+        in_order = list(iter_navigo_validations(config, NavigoProgress()))
+        progress = NavigoProgress()
+        in_pool = list(iter_navigo_validations({**config, "workers": 2}, progress))
+
+        assert len(in_pool) == len(in_order) == 3
+        for pool_chunk, chunk in zip(in_pool, in_order):
+            pd.testing.assert_frame_equal(pool_chunk, chunk)
+        assert progress.is_done("2024/s1") and progress.rows("2024/s1") == 6
+
+
+class TestTypedCsv:
+    """Tests for the schema-based CSV reader."""
+
+    def test_columns_and_dtypes_follow_the_schema(self, tmp_path):
+        """Test that only the schema columns are read, with their dtypes."""
+        path = tmp_path / "trips.txt"
+        path.write_text("route_id,service_id,trip_id,trip_headsign\nC01,S1,T1,Home\nC01,S2,T2,Work\n")
+
+        trips = read_typed_csv(str(path), "gtfs_trips")
+
+        assert list(trips.columns) == ["route_id", "service_id", "trip_id"]
+        assert isinstance(trips["route_id"].dtype, pd.CategoricalDtype)
+
+    def test_mismatched_columns_are_rejected_before_parsing(self, tmp_path):
+        """Test that a file whose columns do not match its schema raises an explicit error."""
+        trips = tmp_path / "trips.txt"
+        trips.write_text("route_id,trip_id\nC01,T1\n")
+        validations = tmp_path / "validations.csv"
+        validations.write_text("JOUR;IDA;NB_VALD\n01/01/2024;1;5\n")
+
+        with pytest.raises(ValueError, match="service_id"):
+            read_typed_csv(str(trips), "gtfs_trips")
+        with pytest.raises(ValueError, match="has 3 columns"):
+            read_typed_csv(str(validations), "navigo_validations")
+
+
+class TestDayCategories:
+    """Tests for the day category calendar."""
+
+    def test_day_categories_of_any_year(self):
+        """Test that bank holidays are DIJFP whatever the year, and missing dates stay missing."""
+        dates = pd.Series(pd.to_datetime(["2024-05-01", "2024-05-02", "2031-12-25", "2031-12-27", None]))
+
+        categories = get_day_categories(dates)
+
+        assert categories.iloc[:4].tolist() == ["DIJFP", "JOHV", "DIJFP", "SAHV"]
+        assert pd.isna(categories.iloc[4])
+
+
 class TestAddressesExtraction:
     """Tests for addresses extraction."""
 
@@ -70,6 +192,31 @@ class TestAddressesExtraction:
         mock_extract.assert_called_once()
 
 
+class TestAddressesParsing:
+    """Tests for the vectorized parsing of raw addresses."""
+
+    def test_house_number_and_suffixes_are_split_from_the_street(self):
+        """Test that only the leading number and suffixes are removed from the street name."""
+        raw = pd.DataFrame(
+            {
+                "N_VOIE": [4, 12, 7],
+                "C_SUF1": [None, "B", "T"],
+                "C_SUF2": [None, None, None],
+                "C_SUF3": [None, None, None],
+                "C_AR": [75011, 75008, 75013],
+                "L_ADR": ["4 RUE DU 8 MAI 1945", "12 B BOULEVARD BEAUMARCHAIS", "7T RUE NATIONALE"],
+                "Geometry X Y": ["48.87,2.36", "48.86,2.37", "48.83,2.36"],
+            }
+        )
+
+        addresses = _parse_addresses(raw)
+
+        assert addresses["street_name"].tolist() == ["RUE DU 8 MAI 1945", "BOULEVARD BEAUMARCHAIS", "RUE NATIONALE"]
+        assert addresses["number"].tolist() == ["4", "12 B", "7 T"]
+        assert addresses["latitude"].tolist() == [48.87, 48.86, 48.83]
+        assert addresses["longitude"].tolist() == [2.36, 2.37, 2.36]
+
+
 class TestTransportCategoriesExtraction:
     """Tests for transport categories extraction."""
 
@@ -109,16 +256,154 @@ class TestTransportLinesExtraction:
 class TestScheduleExtraction:
     """Tests for schedule extraction."""
 
-    @patch("public_transport_watcher.extractor.extractor.extract_schedule_informations")
-    def test_extract_schedule_with_data(self, mock_extract, extractor, mock_schedule_df):
+    @patch("public_transport_watcher.extractor.extractor.ScheduleLoader")
+    @patch("public_transport_watcher.extractor.extractor.iter_schedule_informations")
+    def test_extract_schedule_with_data(self, mock_extract, mock_loader, extractor, mock_schedule_df):
         """Test schedule extraction when data is available."""
-        mock_extract.return_value = mock_schedule_df
+        mock_extract.return_value = iter([mock_schedule_df])
         extractor.extract_schedule_data()
         mock_extract.assert_called_once()
 
-    @patch("public_transport_watcher.extractor.extractor.extract_schedule_informations")
-    def test_extract_schedule_without_data(self, mock_extract, extractor, mock_empty_df):
+    @patch("public_transport_watcher.extractor.extractor.ScheduleLoader")
+    @patch("public_transport_watcher.extractor.extractor.iter_schedule_informations")
+    def test_extract_schedule_without_data(self, mock_extract, mock_loader, extractor, mock_empty_df):
         """Test schedule extraction when no data is available."""
-        mock_extract.return_value = mock_empty_df
+        mock_extract.return_value = iter([])
         extractor.extract_schedule_data()
         mock_extract.assert_called_once()
+
+
+class TestScheduleStreaming:
+    """Tests for the chunked processing of the GTFS schedule."""
+
+    @pytest.fixture
+    def gtfs_dir(self, tmp_path):
+        files = {
+            "trips.txt": "route_id,service_id,trip_id\nIDFM:C01371,S1,T1\nIDFM:C01372,S1,T2\nIDFM:X,S1,T3-C00042\n",
+            "calendar.txt": "service_id,start_date,end_date\nS1,20250401,20250430\n",
+            "stops.txt": "stop_id,parent_station\nA,IDFM:monomodalStopPlace:11\nB,IDFM:monomodalStopPlace:12\nC,\n",
+            "stop_times.txt": "trip_id,arrival_time,stop_id,stop_sequence\n"
+            "T1,23:58:00,A,1\nT1,24:05:00,B,2\n"
+            "T2,08:00:00,B,1\nT2,08:02:00,A,2\nT2,08:04:00,B,3\n"
+            "T3-C00042,09:00:00,C,1\nT3-C00042,09:03:00,A,2\n",
+        }
+        for name, content in files.items():
+            (tmp_path / name).write_text(content)
+        return [str(tmp_path / name) for name in files]
+
+    def test_chunks_keep_trips_whole(self, gtfs_dir):
+        """Trips split between chunks keep their next stations, whatever the chunk size."""
+        with patch("public_transport_watcher.extractor.extract.schedule.get_datalake_file", return_value=gtfs_dir):
+            whole = pd.concat(iter_schedule_informations(chunksize=100), ignore_index=True)
+            chunked = list(iter_schedule_informations(chunksize=2))
+
+        assert len(chunked) > 1
+        pd.testing.assert_frame_equal(pd.concat(chunked, ignore_index=True), whole)
+        assert whole["journey_id"].tolist() == ["T1", "T1", "T2", "T2", "T2", "T3-C00042"]
+        assert whole["next_station_id"].tolist() == [12, pd.NA, 11, 12, pd.NA, pd.NA]
+        assert whole["line_numeric_id"].tolist() == [1371, 1371, 1372, 1372, 1372, 42]
+
+    def test_times_after_midnight(self, gtfs_dir):
+        """Times past 24:00:00 fall on the day after the service date."""
+        with patch("public_transport_watcher.extractor.extract.schedule.get_datalake_file", return_value=gtfs_dir):
+            df = pd.concat(iter_schedule_informations(), ignore_index=True)
+
+        assert df["arrival_timestamp"].iloc[:2].tolist() == [
+            pd.Timestamp("2025-04-01 23:58:00"),
+            pd.Timestamp("2025-04-02 00:05:00"),
+        ]
+
+
+class TestDatalakeManifest:
+    """Tests for the manifest of the loaded datalake files."""
+
+    @staticmethod
+    def _entry(path, version="1", **changes):
+        stat = os.stat(path)
+        entry = {
+            "path": str(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_hash": _file_hash(str(path)),
+            "extractor_version": version,
+            "status": "loaded",
+        }
+        return SimpleNamespace(**{**entry, **changes})
+
+    def test_only_new_changed_or_unfinished_files_are_pending(self, tmp_path, monkeypatch):
+        """Test that a loaded file is pending again only when its content or the version changes."""
+        monkeypatch.delenv("DATALAKE_ROOT", raising=False)
+        files = {name: tmp_path / f"{name}.csv" for name in ("loaded", "touched", "changed", "failed", "new")}
+        for path in files.values():
+            path.write_text("a;b\n1;2\n")
+        entries = {
+            str(files["loaded"]): self._entry(files["loaded"]),
+            str(files["touched"]): self._entry(files["touched"], mtime=0.0),
+            str(files["changed"]): self._entry(files["changed"], mtime=0.0, content_hash="0" * 64),
+            str(files["failed"]): self._entry(files["failed"], status="failed"),
+        }
+        manifest = DatalakeManifest("1")
+
+        with patch.object(DatalakeManifest, "_entries", return_value=entries), patch.object(
+            DatalakeManifest, "_update"
+        ):
+            pending = manifest.pending([str(path) for path in files.values()])
+            assert pending == [str(files["changed"]), str(files["failed"]), str(files["new"])]
+            assert DatalakeManifest("2").pending([str(files["loaded"])]) == [str(files["loaded"])]
+
+    def test_partial_navigo_progress_reset_when_file_changed(self, tmp_path, monkeypatch):
+        """Test that an interrupted period restarts from its first row once its file content changed."""
+        monkeypatch.delenv("DATALAKE_ROOT", raising=False)
+        files = {period: tmp_path / f"{period}.csv" for period in ("s1", "s2")}
+        for path in files.values():
+            path.write_text("a;b\n1;2\n3;4\n")
+        # Both loads were interrupted, then the s2 file was replaced by a different content
+        entries = {str(path): self._entry(path, status="loading") for path in files.values()}
+        files["s2"].write_text("a;b\n5;6\n7;8\n9;0\n")
+        progress = NavigoProgress()
+        progress.mark("2024/s1", 1)
+        progress.mark("2024/s2", 1)
+
+        with patch(
+            "public_transport_watcher.extractor.extractor.get_navigo_period_files",
+            return_value={f"2024/{period}": [str(path)] for period, path in files.items()},
+        ):
+            with patch.object(DatalakeManifest, "_entries", return_value=entries), patch.object(
+                DatalakeManifest, "_update"
+            ):
+                pending = Extractor(DatalakeManifest("1"))._pending_navigo_periods({"files": {}}, progress)
+
+        assert list(pending) == ["2024/s1", "2024/s2"]
+        assert progress.rows("2024/s1") == 1
+        assert progress.rows("2024/s2") == 0
+
+    @patch("public_transport_watcher.extractor.extractor.get_datalake_file", return_value=["/datalake/stations.csv"])
+    @patch("public_transport_watcher.extractor.extractor.extract_stations_informations")
+    def test_steps_with_loaded_files_are_skipped(self, mock_extract, mock_files):
+        """Test that a step is skipped when the manifest records its files as loaded."""
+        manifest = DatalakeManifest("1")
+        with patch.object(DatalakeManifest, "pending", return_value=[]):
+            Extractor(manifest).extract_stations_data()
+
+        mock_extract.assert_not_called()
+
+    @patch("public_transport_watcher.utils.get_datalake_file", return_value=[])
+    @patch("public_transport_watcher.extractor.extract.stations.get_datalake_file", return_value=[])
+    @patch("public_transport_watcher.extractor.extract.schedule.get_datalake_file", return_value=[])
+    def test_extraction_reads_the_manifest_folders(
+        self, mock_schedule_files, mock_stations_files, mock_addresses_files
+    ):
+        """Test that the extraction steps read the datalake folders whose files the manifest records."""
+        config = {
+            "stations": {"datalake": ["geography", "stations_v2"]},
+            "addresses": {"datalake": ["geography", "addresses_v2"]},
+            "schedule": {"datalake": ["schedule", "2025", "may"]},
+        }
+        with patch.dict("public_transport_watcher.extractor.configuration.EXTRACTION_CONFIG", config):
+            extract_stations_informations()
+            extract_addresses_informations()
+            assert list(iter_schedule_informations()) == []
+
+        mock_stations_files.assert_called_once_with("geography", "stations_v2")
+        mock_addresses_files.assert_called_once_with("geography", "addresses_v2")
+        mock_schedule_files.assert_called_once_with("schedule", "2025", "may")
@@ -1,6 +1,19 @@
 """Tests for the insertion functionality."""
 
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+import warnings
+
+import pandas as pd
+import pytest
+
+from public_transport_watcher.extractor.insert import (
+    ScheduleLoader,
+    insert_addresses_informations,
+    insert_navigo_validations,
+    insert_schedule_informations,
+    refresh_station_hour,
+)
+from public_transport_watcher.extractor.insert.navigo import _prepare_data
 
 
 class TestStationsInsertion:
@@ -27,30 +40,127 @@ class TestNavigoInsertion:
     """Tests for Navigo validations insertion."""
 
     @patch("public_transport_watcher.extractor.extractor.get_query_result")
-    @patch("public_transport_watcher.extractor.extractor.extract_navigo_validations_informations")
+    @patch("public_transport_watcher.extractor.extractor.iter_navigo_validations")
     @patch("public_transport_watcher.extractor.extractor.insert_navigo_validations")
     def test_insert_navigo_with_data(
         self, mock_insert, mock_extract, mock_get_query, extractor, mock_stations_df, mock_navigo_df
     ):
         """Test Navigo insertion when data is available."""
         mock_get_query.return_value = mock_stations_df
-        mock_extract.return_value = mock_navigo_df
+        mock_extract.return_value = iter([mock_navigo_df])
         extractor.extract_navigo_validations()
         mock_insert.assert_called_once_with(mock_navigo_df)
 
     @patch("public_transport_watcher.extractor.extractor.get_query_result")
-    @patch("public_transport_watcher.extractor.extractor.extract_navigo_validations_informations")
+    @patch("public_transport_watcher.extractor.extractor.iter_navigo_validations")
     @patch("public_transport_watcher.extractor.extractor.insert_navigo_validations")
     def test_insert_navigo_without_data(
         self, mock_insert, mock_extract, mock_get_query, extractor, mock_stations_df, mock_empty_df
     ):
         """Test Navigo insertion when no data is available."""
         mock_get_query.return_value = mock_stations_df
-        mock_extract.return_value = mock_empty_df
+        mock_extract.return_value = iter([])
         extractor.extract_navigo_validations()
         mock_insert.assert_not_called()
 
 
+class TestNavigoBulkLoad:
+    """Tests for the set-based load of Navigo validations."""
+
+    @patch("public_transport_watcher.extractor.insert.navigo.refresh_station_hour")
+    @patch("public_transport_watcher.extractor.insert.navigo.get_engine")
+    def test_batch_is_copied_then_upserted_set_based(self, mock_engine, mock_refresh, mock_navigo_df):
+        """Test that a batch is one COPY and a fixed number of statements, whatever its size."""
+        conn = mock_engine.return_value.begin.return_value.__enter__.return_value
+        cursor = conn.connection.cursor.return_value.__enter__.return_value
+        copied = []
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(buffer.read())
+
+        insert_navigo_validations(pd.concat([mock_navigo_df, mock_navigo_df.assign(validations_horaires=[1, 2])]))
+
+        assert copied == [
+            "1,2024-03-20 10:00:00,2024-03-20 11:00:00,JOHV,1\n2,2024-03-20 11:00:00,2024-03-20 12:00:00,JOHV,2\n"
+        ]
+        statements = [str(call.args[0]) for call in conn.execute.call_args_list]
+        assert len(statements) == 3
+        assert "ON CONFLICT (start_timestamp, end_timestamp) DO NOTHING" in statements[1]
+        assert "JOIN transport.time_bin tb" in statements[2]
+        mock_refresh.assert_called_once()
+
+    @patch("public_transport_watcher.extractor.insert.navigo.refresh_station_hour")
+    @patch("public_transport_watcher.extractor.insert.navigo.get_engine")
+    def test_rows_with_missing_values_are_dropped_without_warning(self, mock_engine, mock_refresh, mock_navigo_df):
+        """Test that incomplete rows are dropped without a SettingWithCopyWarning on the prepared columns."""
+        conn = mock_engine.return_value.begin.return_value.__enter__.return_value
+        cursor = conn.connection.cursor.return_value.__enter__.return_value
+        copied = []
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(buffer.read())
+        mock_navigo_df.loc[1, "validations_horaires"] = None
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", pd.errors.SettingWithCopyWarning)
+            insert_navigo_validations(mock_navigo_df)
+
+        assert copied == ["1,2024-03-20 10:00:00,2024-03-20 11:00:00,JOHV,100\n"]
+
+    def test_timestamps_from_day_and_time_range(self):
+        """Test that the hourly time ranges of both source formats give the bounds of each time bin."""
+        df = pd.DataFrame(
+            {
+                "ida": [1, 2, 3],
+                "libelle_arret": ["Station 1", "Station 2", "Station 3"],
+                "jour": ["2024-03-20", pd.Timestamp("2024-03-21"), "2024-03-22"],
+                "tranche_horaire": ["7H-8H", "10-11", "23H-24H"],
+                "validations_horaires": [100.0, 150.0, 5.0],
+            }
+        )
+
+        prepared = _prepare_data(df)
+
+        assert prepared["start_timestamp"].tolist() == [
+            pd.Timestamp("2024-03-20 07:00"),
+            pd.Timestamp("2024-03-21 10:00"),
+            pd.Timestamp("2024-03-22 23:00"),
+        ]
+        assert prepared["end_timestamp"].tolist() == [
+            pd.Timestamp("2024-03-20 08:00"),
+            pd.Timestamp("2024-03-21 11:00"),
+            pd.Timestamp("2024-03-23 00:00"),
+        ]
+
+
+class TestStationHourRefresh:
+    """Tests for the refresh of the station-hour fact table."""
+
+    def test_refresh_filters_the_loaded_batch(self):
+        """Test that only the stations and hours of a batch are refreshed."""
+        conn = MagicMock()
+        conn.execute.return_value.scalar.return_value = False
+        conn.execute.return_value.rowcount = 48
+
+        assert refresh_station_hour(conn, start="2024-01-01", end="2024-01-01 23:00", station_ids=[1, 2]) == 48
+
+        refresh, params = conn.execute.call_args.args
+        assert "t.station_id = ANY(:station_ids)" in str(refresh)
+        assert "ON CONFLICT (station_id, start_timestamp) DO UPDATE" in str(refresh)
+        assert params["station_ids"] == [1, 2]
+
+    def test_refresh_creates_missing_monthly_partitions(self):
+        """Test that a partitioned table gets a partition for each refreshed month."""
+        conn = MagicMock()
+        conn.execute.return_value.scalar.return_value = True
+
+        refresh_station_hour(conn, start="2024-01-31", end="2024-03-01")
+
+        statements = [str(call.args[0]) for call in conn.execute.call_args_list]
+        partitions = [statement for statement in statements if "PARTITION OF" in statement]
+        assert [partition.split()[5] for partition in partitions] == [
+            "transport.station_hour_202401",
+            "transport.station_hour_202402",
+            "transport.station_hour_202403",
+        ]
+
+
 class TestAddressesInsertion:
     """Tests for addresses insertion."""
 
@@ -71,6 +181,26 @@ class TestAddressesInsertion:
         mock_insert.assert_not_called()
 
 
+class TestAddressesBulkLoad:
+    """Tests for the set-based load of addresses."""
+
+    @patch("public_transport_watcher.extractor.insert.addresses.get_engine")
+    def test_addresses_are_copied_then_inserted_set_based(self, mock_engine, mock_addresses_df):
+        """Test that the load is a COPY and two statements, without reading the existing addresses."""
+        conn = mock_engine.return_value.begin.return_value.__enter__.return_value
+        cursor = conn.connection.cursor.return_value.__enter__.return_value
+        copied = []
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(buffer.read())
+
+        insert_addresses_informations(mock_addresses_df, batch_size=1000)
+
+        assert copied == ["Rue de la Paix,75001,1,2.3522,48.8566\nAvenue des Champs-Élysées,75008,2,2.3523,48.8567\n"]
+        statements = [str(call.args[0]) for call in conn.execute.call_args_list]
+        assert len(statements) == 2
+        assert "ON CONFLICT (name, arrondissement) DO NOTHING" in statements[0]
+        assert "WHERE NOT EXISTS" in statements[1]
+
+
 class TestTransportCategoriesInsertion:
     """Tests for transport categories insertion."""
 
@@ -114,18 +244,79 @@ class TestTransportLinesInsertion:
 class TestScheduleInsertion:
     """Tests for schedule insertion."""
 
-    @patch("public_transport_watcher.extractor.extractor.extract_schedule_informations")
+    @patch("public_transport_watcher.extractor.extractor.ScheduleLoader")
+    @patch("public_transport_watcher.extractor.extractor.iter_schedule_informations")
     @patch("public_transport_watcher.extractor.extractor.insert_schedule_informations")
-    def test_insert_schedule_with_data(self, mock_insert, mock_extract, extractor, mock_schedule_df):
+    def test_insert_schedule_with_data(self, mock_insert, mock_extract, mock_loader, extractor, mock_schedule_df):
         """Test schedule insertion when data is available."""
-        mock_extract.return_value = mock_schedule_df
+        mock_extract.return_value = iter([mock_schedule_df])
         extractor.extract_schedule_data()
-        mock_insert.assert_called_once_with(mock_schedule_df, extractor.extract_config.get("schedule", {}))
+        mock_insert.assert_called_once_with(
+            mock_schedule_df,
+            extractor.extract_config.get("schedule", {}),
+            mock_loader.return_value.__enter__.return_value,
+        )
 
-    @patch("public_transport_watcher.extractor.extractor.extract_schedule_informations")
+    @patch("public_transport_watcher.extractor.extractor.ScheduleLoader")
+    @patch("public_transport_watcher.extractor.extractor.iter_schedule_informations")
     @patch("public_transport_watcher.extractor.extractor.insert_schedule_informations")
-    def test_insert_schedule_without_data(self, mock_insert, mock_extract, extractor, mock_empty_df):
+    def test_insert_schedule_without_data(self, mock_insert, mock_extract, mock_loader, extractor, mock_empty_df):
         """Test schedule insertion when no data is available."""
-        mock_extract.return_value = mock_empty_df
+        mock_extract.return_value = iter([])
         extractor.extract_schedule_data()
         mock_insert.assert_not_called()
+
+
+class TestScheduleBulkLoad:
+    """Tests for the COPY-based load of schedules."""
+
+    @staticmethod
+    def _loader(mock_engine, swap):
+        conn = mock_engine.return_value.begin.return_value.__enter__.return_value
+        conn.execute.return_value.scalars.return_value.all.side_effect = [[1, 2], [14]]
+        return ScheduleLoader({"swap": swap}), conn
+
+    @patch("public_transport_watcher.extractor.insert.schedule.get_engine")
+    def test_rows_are_filtered_then_copied(self, mock_engine):
+        """Test that unknown stations and lines are filtered out before the COPY."""
+        loader, conn = self._loader(mock_engine, swap=False)
+        cursor = conn.connection.cursor.return_value.__enter__.return_value
+        copied = []
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.append((sql, buffer.read()))
+        df = pd.DataFrame(
+            {
+                "arrival_timestamp": pd.to_datetime(["2025-04-01 08:00", "2025-04-01 08:05", "2025-04-02 00:10"]),
+                "stop_id": pd.array([1, 3, 2], dtype="Int64"),
+                "next_station_id": pd.array([2, None, None], dtype="Int64"),
+                "line_numeric_id": pd.array([14, 14, 14], dtype="Int64"),
+                "journey_id": ["J1", "J1", "J2"],
+            }
+        )
+
+        with loader:
+            assert insert_schedule_informations(df, {}, loader) == 2
+
+        assert copied == [
+            (
+                'COPY transport.schedule ("timestamp", station_id, next_station_id, transport_id, journey_id) '
+                "FROM STDIN WITH (FORMAT csv)",
+                "08:00:00,1,2,14,J1\n00:10:00,2,,14,J2\n",
+            )
+        ]
+
+    @patch("public_transport_watcher.extractor.insert.schedule.get_engine")
+    def test_swap_replaces_the_table_only_after_a_complete_load(self, mock_engine):
+        """Test that a swap load goes to a new table, swapped in on success and dropped on failure."""
+        loader, conn = self._loader(mock_engine, swap=True)
+        with loader:
+            loader.inserted = 10
+        statements = [str(call.args[0]) for call in conn.execute.call_args_list]
+        assert "CREATE TABLE transport.schedule_load" in statements[2]
+        assert "RENAME TO schedule" in statements[-1]
+
+        loader, conn = self._loader(mock_engine, swap=True)
+        with pytest.raises(RuntimeError):
+            with loader:
+                loader.inserted = 10
+                raise RuntimeError("extraction failed")
+        assert str(conn.execute.call_args.args[0]) == "DROP TABLE IF EXISTS transport.schedule_load"
@@ -4,10 +4,12 @@ import json
 import networkx as nx
 import pandas as pd
 import pytest
+from sqlalchemy import text
 
 from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
 from public_transport_watcher.predictor.graph_builder import GraphBuilder
 from public_transport_watcher.predictor.predictor import Predictor
+from public_transport_watcher.utils import get_engine
 
 
 @pytest.fixture
@@ -206,3 +208,16 @@ def mock_route_info():
         },
         "graph_type": "base",
     }
+
+
+@pytest.fixture
+def station_queue_engine():
+    """Engine of a database with the `transport.station_queue` table, the test is skipped without one."""
+    try:
+        engine = get_engine()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM transport.station_queue LIMIT 0"))
+    except Exception as e:
+        pytest.skip(f"No database with the station queue table: {e}")
+    yield engine
+    engine.dispose()
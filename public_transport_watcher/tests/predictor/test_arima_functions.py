@@ -1,8 +1,41 @@
-from unittest.mock import Mock, patch
-
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import importlib
+import json
+import os
+import threading
+import time
+from unittest.mock import MagicMock, Mock, patch
+
+import numpy as np
 import pandas as pd
-
+import pytest
+from sqlalchemy import text
+
+from public_transport_watcher.predictor.arima import grid_search
+from public_transport_watcher.predictor.arima.backtest import load_fixture, run_backtest, save_report
+from public_transport_watcher.predictor.arima.day_ahead import correct_intraday, forecast_day_ahead
+from public_transport_watcher.predictor.arima.fast_forecast import _batched_ar_forecast, fast_forecast
+from public_transport_watcher.predictor.arima.forecast_frame import ForecastFrame
+from public_transport_watcher.predictor.arima.forecast_store import ForecastSnapshot, write_forecast
+from public_transport_watcher.predictor.arima.get_bulk_data import (
+    _build_query,
+    _split_stations,
+    get_bulk_data_from_db,
+)
 from public_transport_watcher.predictor.arima.get_data import get_data_from_db
+from public_transport_watcher.predictor.arima.grid_search import _shortlist, candidate_orders, run_grid_search
+from public_transport_watcher.predictor.arima.model_cache import ArimaModelCache, forecast_with_cache
+from public_transport_watcher.predictor.arima.param_store import ArimaParamStore
+from public_transport_watcher.predictor.arima.preprocess_data import preprocess_data
+from public_transport_watcher.predictor.arima.profile_cube import CAT_DAYS, HourlyProfileCube
+from public_transport_watcher.predictor.arima.series_cache import StationSeriesCache
+from public_transport_watcher.predictor.arima.work_queue import (
+    FileWorkQueue,
+    PostgresWorkQueue,
+    run_coordinator,
+    run_worker,
+)
 
 
 class TestGetDataFromDB:
@@ -94,6 +127,206 @@ class TestGetDataFromDB:
                     assert result.index.name != "datetime"
 
 
+class TestGetBulkDataFromDB:
+    """Tests for get_bulk_data_from_db function."""
+
+    @staticmethod
+    def _traffic_rows(station_id, hours):
+        timestamps = pd.date_range("2024-01-01", periods=hours, freq="h")
+        return pd.DataFrame(
+            {
+                "station_id": [station_id] * hours,
+                "station_name": [f"Station {station_id}"] * hours,
+                "time_bin_id": range(1, hours + 1),
+                "cat_day": ["JOHV"] * hours,
+                "start_timestamp": timestamps,
+                "end_timestamp": timestamps + pd.Timedelta(hours=1),
+                "validations": range(hours),
+            }
+        )
+
+    def test_streamed_chunks_are_dispatched_per_station(self):
+        """Test that rows from several chunks end up in one frame per station."""
+        first = self._traffic_rows(70671, 3)
+        second = pd.concat([self._traffic_rows(70671, 5).iloc[3:], self._traffic_rows(59403, 2)])
+        mock_engine = MagicMock()
+
+        with patch("public_transport_watcher.predictor.arima.get_bulk_data.get_engine", return_value=mock_engine):
+            with patch("pandas.read_sql", return_value=iter([first, second])) as mock_read_sql:
+                result = get_bulk_data_from_db([70671, 59403], chunksize=3)
+
+        assert mock_read_sql.call_count == 1
+        assert set(result) == {70671, 59403}
+        assert len(result[70671]) == 5
+        assert len(result[59403]) == 2
+        assert result[70671].index.name == "datetime"
+        assert isinstance(result[70671].index, pd.DatetimeIndex)
+        mock_engine.dispose.assert_called_once()
+
+    def test_one_query_per_partition(self):
+        """Test that stations are split into the requested number of queries."""
+        mock_engine = MagicMock()
+
+        with patch("public_transport_watcher.predictor.arima.get_bulk_data.get_engine", return_value=mock_engine):
+            with patch("pandas.read_sql", side_effect=lambda *args, **kwargs: iter([])) as mock_read_sql:
+                result = get_bulk_data_from_db([1, 2, 3, 4, 5], partitions=2)
+
+        assert result == {}
+        assert mock_read_sql.call_count == 2
+        assert mock_read_sql.call_args_list[0].kwargs["params"]["station_ids"] == [1, 2, 3]
+        assert mock_read_sql.call_args_list[1].kwargs["params"]["station_ids"] == [4, 5]
+
+    def test_split_stations(self):
+        """Test splitting station IDs into partitions."""
+        assert _split_stations(None, 4) == [None]
+        assert _split_stations([1, 2, 3], 5) == [[1], [2], [3]]
+        assert _split_stations([], 2) == []
+
+    def test_build_query_with_history_window(self):
+        """Test that the history window is expressed as a query parameter."""
+        query, params = _build_query([70671], weeks=8)
+
+        assert "make_interval(weeks => %(weeks)s)" in query
+        assert params == {"station_ids": [70671], "weeks": 8}
+
+        query, params = _build_query(None, None)
+        assert params == {}
+
+
+class TestForecastFrame:
+    """Tests for the ForecastFrame columnar forecast store."""
+
+    @staticmethod
+    def _forecast_df(first_hour, values):
+        index = pd.date_range(first_hour, periods=len(values), freq="h")
+        return pd.DataFrame({"forecast": values, "forecast_complete": [v * 2 for v in values]}, index=index)
+
+    def test_from_predictions(self):
+        """Test that per-station forecast DataFrames are flattened into columns."""
+        predictions = [self._forecast_df("2024-01-01 08:00", [10, 20]), self._forecast_df("2024-01-01 08:00", [5, 7])]
+
+        forecast = ForecastFrame.from_predictions([70671, 59403], predictions)
+
+        assert len(forecast) == 4
+        assert forecast.n_stations == 2
+        assert list(forecast.station_id) == [70671, 70671, 59403, 59403]
+        assert list(forecast.forecast) == [10, 20, 5, 7]
+        assert list(forecast.forecast_complete) == [20, 40, 10, 14]
+        assert forecast.target_hour[1] == np.datetime64("2024-01-01T09:00")
+
+    def test_totals(self):
+        """Test the total forecasted validations per station."""
+        forecast = ForecastFrame.from_predictions([70671, 59403], [[120, 130], [90, 100]])
+
+        station_ids, totals = forecast.totals()
+
+        assert list(station_ids) == [70671, 59403]
+        assert list(totals) == [250, 190]
+
+    def test_window_and_matrix(self):
+        """Test the selection of an hour window and the station x hour matrix."""
+        predictions = [
+            self._forecast_df("2024-01-01 08:00", [10, 20, 30]),
+            self._forecast_df("2024-01-01 08:00", [5, 7, 9]),
+        ]
+        forecast = ForecastFrame.from_predictions([70671, 59403], predictions)
+
+        window = forecast.window("2024-01-01 09:15", hours=2)
+        matrix = forecast.to_matrix()
+
+        assert list(window.forecast) == [20, 30, 7, 9]
+        assert matrix.shape == (2, 3)
+        assert matrix.loc[59403, pd.Timestamp("2024-01-01 10:00")] == 18
+
+    def test_save_and_load(self, tmp_path):
+        """Test that forecasts survive a round trip to disk."""
+        forecast = ForecastFrame.from_predictions([70671], [self._forecast_df("2024-01-01 08:00", [10, 20])])
+
+        path = forecast.save(str(tmp_path / "forecasts" / "run"))
+        loaded = ForecastFrame.load(path)
+
+        assert path.endswith(".npz")
+        pd.testing.assert_frame_equal(loaded.to_frame(), forecast.to_frame())
+
+    def test_empty(self):
+        """Test a run without any successful forecast."""
+        forecast = ForecastFrame.from_predictions([], [])
+
+        assert len(forecast) == 0
+        assert forecast.to_frame().empty
+
+
+class TestForecastStore:
+    """Tests for the forecast table writer and the in-memory forecast snapshot."""
+
+    @staticmethod
+    def _latest_rows(value=55.0):
+        return pd.DataFrame(
+            {
+                "station_id": [70671, 70671, 59403],
+                "target_hour": pd.to_datetime(["2024-01-01 08:00", "2024-01-01 09:00", "2024-01-01 08:00"]),
+                "model": ["arima", "arima", "arima"],
+                "value": [value, 60.0, 12.0],
+                "generated_at": pd.to_datetime(["2024-01-01 08:05"] * 3),
+            }
+        )
+
+    @patch("public_transport_watcher.predictor.arima.forecast_store.get_engine")
+    def test_write_forecast_copies_and_upserts(self, mock_get_engine):
+        """Test that the forecasts are copied to a staging table and merged in one transaction."""
+        connection = mock_get_engine.return_value.raw_connection.return_value
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.rowcount = 2
+        copied = []
+        cursor.copy_expert.side_effect = lambda sql, buffer: copied.append(buffer.read())
+        forecast = ForecastFrame.from_predictions(
+            [70671],
+            [
+                pd.DataFrame(
+                    {"forecast": [30, 60], "forecast_complete": [55, 60]},
+                    index=pd.date_range("2024-01-01 08:00", periods=2, freq="h"),
+                )
+            ],
+        )
+
+        upserted = write_forecast(forecast, "arima", generated_at=datetime(2024, 1, 1, 8, 5))
+
+        assert upserted == 2
+        assert copied[0].splitlines() == [
+            "70671,2024-01-01 08:00:00,arima,55.0,2024-01-01 08:05:00",
+            "70671,2024-01-01 09:00:00,arima,60.0,2024-01-01 08:05:00",
+        ]
+        assert "ON CONFLICT" in cursor.execute.call_args_list[-1].args[0]
+        connection.commit.assert_called_once()
+        connection.close.assert_called_once()
+
+    def test_snapshot_lookups_and_ttl(self):
+        """Test that the snapshot serves precomputed forecasts and only reloads once expired."""
+        loader = Mock(return_value=self._latest_rows())
+        snapshot = ForecastSnapshot(ttl=3600, loader=loader)
+
+        station = snapshot.station(70671, "arima")
+        stations = snapshot.stations("arima", [59403, 1])
+
+        loader.assert_called_once()
+        assert station["generated_at"] == "2024-01-01T08:05:00"
+        assert station["forecast"] == [
+            {"target_hour": "2024-01-01T08:00:00", "value": 55.0},
+            {"target_hour": "2024-01-01T09:00:00", "value": 60.0},
+        ]
+        assert [forecast["station_id"] for forecast in stations] == [59403]
+        assert snapshot.station(70671, "fast") is None
+
+    def test_snapshot_keeps_previous_on_error(self):
+        """Test that a failed reload keeps serving the previous snapshot."""
+        loader = Mock(side_effect=[self._latest_rows(), Exception("database unavailable")])
+        snapshot = ForecastSnapshot(ttl=0, loader=loader)
+
+        assert snapshot.station(70671, "arima")["forecast"][0]["value"] == 55.0
+        assert snapshot.station(70671, "arima")["forecast"][0]["value"] == 55.0
+        assert loader.call_count == 2
+
+
 class TestArimaParameterOptimization:
     """Tests for ARIMA parameter optimization functions."""
 
@@ -109,6 +342,626 @@ class TestArimaParameterOptimization:
         assert result == (2, 1, 1)
 
 
+class TestArimaGridSearch:
+    """Tests for the parallel ARIMA grid search."""
+
+    def test_candidate_orders(self):
+        """Test that the grid skips the (0, 0, 0) model."""
+        orders = candidate_orders([0, 1], [0], [0, 1])
+
+        assert orders == [(0, 0, 1), (1, 0, 0), (1, 0, 1)]
+
+    def test_grid_search_prunes_and_checkpoints(self, mock_traffic_data, tmp_path):
+        """Test that only the best AIC orders reach the RMSE step and completed stations are checkpointed."""
+        checkpoint_file = str(tmp_path / "checkpoint.jsonl")
+
+        with patch.object(grid_search, "_rmse_task", wraps=grid_search._rmse_task) as mock_rmse_task:
+            results = run_grid_search(
+                {70671: mock_traffic_data},
+                [0, 1],
+                [0],
+                [0, 1],
+                top_k=1,
+                prune_window=200,
+                checkpoint_file=checkpoint_file,
+            )
+
+        assert mock_rmse_task.call_count == 1
+        assert results[70671]["order"] in candidate_orders([0, 1], [0], [0, 1])
+        assert results[70671]["rmse"] is not None
+        with open(checkpoint_file) as f:
+            assert len(f.readlines()) == 1
+
+    def test_grid_search_resume(self, mock_traffic_data, tmp_path):
+        """Test that stations of the checkpoint file are not searched again."""
+        checkpoint_file = tmp_path / "checkpoint.jsonl"
+        checkpoint_file.write_text(
+            '{"station_id": 70671, "order": [2, 0, 2], "rmse": 1.0, "aic": 2.0, "fit_seconds": 3.0, '
+            '"optimized_at": "2024-01-01T00:00:00"}\n{"station_id": 594'
+        )
+
+        with patch.object(grid_search, "_split_series") as mock_split:
+            results = run_grid_search(
+                {70671: mock_traffic_data}, [0, 1], [0], [0, 1], checkpoint_file=str(checkpoint_file), resume=True
+            )
+
+        mock_split.assert_not_called()
+        assert results[70671]["order"] == (2, 0, 2)
+
+    def test_shortlist_ranks_aic_within_each_d(self):
+        """Test that AIC values are only compared between orders with the same differencing."""
+        aic_scores = [(100.0, (1, 0, 0)), (90.0, (2, 0, 1)), (500.0, (1, 1, 0)), (450.0, (0, 1, 1)), (80.0, (1, 0, 1))]
+
+        assert _shortlist(aic_scores, top_k=1) == [(1, 0, 1), (0, 1, 1)]
+        assert _shortlist(aic_scores, top_k=2) == [(1, 0, 1), (2, 0, 1), (0, 1, 1), (1, 1, 0)]
+
+
+class TestArimaParamStore:
+    """Tests for the SQLite ARIMA parameters store."""
+
+    def test_upsert_many_and_load(self, tmp_path):
+        """Test that a batch of orders is written and read back."""
+        store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+
+        assert store.upsert_many({70671: (1, 1, 2), 59403: {"order": [2, 0, 2], "rmse": 12.5}}) == 2
+
+        assert store.load_all() == {70671: (1, 1, 2), 59403: (2, 0, 2)}
+        assert store.get(59403) == (2, 0, 2)
+        assert store.get(1) is None
+
+    def test_metadata_kept_when_order_unchanged(self, tmp_path):
+        """Test that saving an unchanged order without metadata keeps the fit metadata."""
+        store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+        store.upsert(70671, (1, 1, 2), rmse=10.0, aic=200.0, fit_seconds=1.5, optimized_at="2024-01-01T00:00:00")
+
+        store.upsert_many({70671: (1, 1, 2)})
+        assert store.metadata().iloc[0]["rmse"] == 10.0
+
+        store.upsert_many({70671: (2, 1, 2)})
+        metadata = store.metadata().iloc[0]
+        assert metadata["p"] == 2
+        assert pd.isna(metadata["rmse"])
+
+    def test_stale_stations(self, tmp_path):
+        """Test that only old or never optimized stations are considered stale."""
+        store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+        store.upsert(1, (1, 1, 1), optimized_at="2000-01-01T00:00:00")
+        store.upsert(2, (1, 1, 1), optimized_at="2999-01-01T00:00:00")
+        store.upsert(3, (1, 1, 1))
+
+        assert store.stale_stations(30) == [1, 3]
+        assert store.stale_stations(30, [2, 4]) == [4]
+
+    def test_import_and_export_json(self, tmp_path, mock_station_params_file):
+        """Test the conversion from and to the consolidated JSON file."""
+        store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+
+        assert store.import_json(mock_station_params_file) == 4
+
+        export_file = tmp_path / "export.json"
+        store.export_json(str(export_file))
+        with open(mock_station_params_file) as f:
+            assert json.loads(export_file.read_text()) == json.load(f)
+
+    def test_concurrent_json_exports(self, tmp_path):
+        """Test that concurrent exports to the same file never share a temporary file."""
+        params_file = str(tmp_path / "station_arima_params.json")
+        stores = []
+        for i in range(2):
+            store = ArimaParamStore(str(tmp_path / f"params_{i}.sqlite"))
+            store.upsert_many({station_id: (i, 0, 1) for station_id in range(500)})
+            stores.append(store)
+
+        def export(store):
+            for _ in range(20):
+                store.export_json(params_file)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for future in [executor.submit(export, store) for store in stores]:
+                future.result()
+
+        with open(params_file) as f:
+            orders = {tuple(order) for order in json.load(f).values()}
+        assert orders in ({(0, 0, 1)}, {(1, 0, 1)})
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    def test_concurrent_writers(self, tmp_path):
+        """Test that writers sharing the database do not lose each other's updates."""
+        path = str(tmp_path / "params.sqlite")
+        ArimaParamStore(path)
+
+        def write(first_station):
+            store = ArimaParamStore(path)
+            for station_id in range(first_station, first_station + 20):
+                store.upsert(station_id, (1, 0, 1))
+
+        threads = [threading.Thread(target=write, args=(i * 100,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(ArimaParamStore(path).load_all()) == 80
+
+
+class TestArimaModelCache:
+    """Tests for the fitted ARIMA model cache."""
+
+    @staticmethod
+    def _same_hour_series(days=28, seed=0):
+        rng = np.random.default_rng(seed)
+        index = pd.date_range("2024-01-01 08:00", periods=days, freq="D")
+        return pd.Series(100 + rng.normal(0, 5, days), index=index)
+
+    def test_put_and_get(self, tmp_path):
+        """Test that a cache entry is read back."""
+        cache = ArimaModelCache(str(tmp_path))
+        cache.put(70671, 8, (1, 0, 1), [0.5, 0.1, 2.0], pd.Timestamp("2024-01-28 08:00"), pd.Timestamp("2024-01-28"))
+
+        entry = cache.get(70671, 8, (1, 0, 1))
+
+        assert list(entry["params"]) == [0.5, 0.1, 2.0]
+        assert entry["last_timestamp"] == pd.Timestamp("2024-01-28 08:00")
+        assert cache.get(70671, 9, (1, 0, 1)) is None
+
+    def test_evict_least_recently_used(self, tmp_path):
+        """Test that the oldest entries are removed first once the size bound is exceeded."""
+        cache = ArimaModelCache(str(tmp_path), max_bytes=None)
+        for hour in range(3):
+            cache.put(70671, hour, (1, 0, 1), [0.5, 0.1, 2.0], pd.Timestamp("2024-01-28"), pd.Timestamp("2024-01-28"))
+            path = cache._path(70671, hour, (1, 0, 1))
+            os.utime(path, (1000 + hour, 1000 + hour))
+        entry_size = os.path.getsize(cache._path(70671, 0, (1, 0, 1)))
+
+        cache.max_bytes = 2 * entry_size
+
+        assert cache.evict() == 1
+        assert cache.get(70671, 0, (1, 0, 1)) is None
+        assert cache.get(70671, 2, (1, 0, 1)) is not None
+
+    def test_forecast_reuses_cached_model(self, tmp_path):
+        """Test that a cached model is filtered instead of refitted until it is too old."""
+        cache = ArimaModelCache(str(tmp_path), refit_hours=24)
+        series = self._same_hour_series()
+        now = pd.Timestamp("2024-01-28 09:00")
+
+        first_forecast, first_refit = forecast_with_cache(series, 70671, 8, (1, 0, 1), cache, now=now)
+        second_forecast, second_refit = forecast_with_cache(series, 70671, 8, (1, 0, 1), cache, now=now)
+        _, late_refit = forecast_with_cache(series, 70671, 8, (1, 0, 1), cache, now=now + pd.Timedelta(days=2))
+
+        assert first_refit is True
+        assert second_refit is False
+        assert late_refit is True
+        np.testing.assert_allclose(second_forecast.to_numpy(), first_forecast.to_numpy())
+
+    def test_forecast_refits_on_drift(self, tmp_path):
+        """Test that new observations far from the cached model trigger a refit."""
+        cache = ArimaModelCache(str(tmp_path), drift_threshold=3.0)
+        series = self._same_hour_series()
+        now = pd.Timestamp("2024-01-28 09:00")
+        forecast_with_cache(series, 70671, 8, (1, 0, 1), cache, now=now)
+
+        next_day = pd.Series([400.0], index=[series.index[-1] + pd.Timedelta(days=1)])
+        _, refitted = forecast_with_cache(
+            pd.concat([series.iloc[1:], next_day]), 70671, 8, (1, 0, 1), cache, now=now + pd.Timedelta(days=1)
+        )
+
+        assert refitted is True
+
+
+class TestStationSeriesCache:
+    """Tests for the incremental per-station series cache."""
+
+    def test_merge_after_watermark(self, mock_traffic_data, tmp_path):
+        """Test that merged rows extend the series once each and that loads match preprocess_data."""
+        cache = StationSeriesCache(str(tmp_path))
+        assert cache.watermark(70671) is None
+
+        assert cache.merge(70671, mock_traffic_data.iloc[:500]) == 500
+        assert cache.watermark(70671) == mock_traffic_data["start_timestamp"].iloc[499]
+        assert cache.merge(70671, mock_traffic_data.iloc[400:]) == len(mock_traffic_data) - 500
+
+        cached = preprocess_data(cache.load(70671), 70671)
+        expected = preprocess_data(mock_traffic_data, 70671)
+        pd.testing.assert_frame_equal(cached, expected[cached.columns], check_dtype=False, check_names=False)
+        assert len(cache.load(70671, weeks=1)) == 7 * 24 + 1
+        assert cache.load_many([70671, 59403]).keys() == {70671}
+
+    def test_merge_revised_and_backfilled_rows(self, mock_traffic_data, tmp_path):
+        """Test that revised hours replace the cached ones and that older hours are inserted in order."""
+        cache = StationSeriesCache(str(tmp_path))
+        cache.merge(70671, mock_traffic_data.iloc[100:200])
+
+        revised = mock_traffic_data.iloc[[150, 160]].assign(validations=[1, 2])
+        assert cache.merge(70671, pd.concat([revised, mock_traffic_data.iloc[50:100].iloc[::-1]])) == 52
+        assert cache.merge(70671, mock_traffic_data.iloc[50:200].iloc[::3]) == 0
+
+        cached = cache.load(70671)
+        assert cached.index.is_monotonic_increasing
+        assert len(cached) == 150
+        assert cached.loc[mock_traffic_data.index[150], "validations"] == 1
+        assert cached.loc[mock_traffic_data.index[199], "validations"] == mock_traffic_data["validations"].iloc[199]
+
+    @patch("public_transport_watcher.predictor.arima.series_cache.pd.read_sql")
+    @patch("public_transport_watcher.predictor.arima.series_cache.get_engine")
+    def test_update_reads_revision_window(self, mock_get_engine, mock_read_sql, mock_traffic_data, tmp_path):
+        """Test that an update reads the recent hours of every station again, in a single query."""
+        cache = StationSeriesCache(str(tmp_path), revision_hours=24)
+        cache.merge(70671, mock_traffic_data.iloc[:100])
+        mock_read_sql.return_value = (
+            mock_traffic_data.iloc[76:].assign(validations=lambda df: df["validations"] + 1).reset_index(drop=True)
+        )
+
+        assert cache.update([70671, 59403]) == len(mock_traffic_data) - 76
+
+        mock_read_sql.assert_called_once()
+        params = mock_read_sql.call_args.kwargs["params"]
+        assert params["station_ids"] == [70671, 59403]
+        assert params["since"] == [mock_traffic_data["start_timestamp"].iloc[75].to_pydatetime(), None]
+        assert cache.watermark(70671) == mock_traffic_data["start_timestamp"].iloc[-1]
+        assert cache.load(70671)["validations"].iloc[99] == mock_traffic_data["validations"].iloc[99] + 1
+
+    @patch("public_transport_watcher.predictor.arima.series_cache.pd.read_sql")
+    @patch("public_transport_watcher.predictor.arima.series_cache.get_engine")
+    def test_rebuild_reads_whole_series(self, mock_get_engine, mock_read_sql, mock_traffic_data, tmp_path):
+        """Test that a rebuild drops the cached series and reads it again from the start."""
+        cache = StationSeriesCache(str(tmp_path))
+        cache.merge(70671, mock_traffic_data.iloc[:100])
+        cache.merge(59403, mock_traffic_data.iloc[:100])
+        mock_read_sql.return_value = mock_traffic_data.reset_index(drop=True)
+
+        assert cache.rebuild([70671]) == len(mock_traffic_data)
+
+        assert mock_read_sql.call_args.kwargs["params"] == {"station_ids": [70671], "since": [None]}
+        assert len(cache.load(70671)) == len(mock_traffic_data)
+        assert cache.invalidate() == 2
+        assert cache.load_many([70671, 59403]) == {}
+
+
+class TestWorkQueue:
+    """Tests for the shared station queue of distributed runs."""
+
+    def test_claims_are_exclusive_and_leases_expire(self, tmp_path):
+        """Test that a station is leased to a single worker and is claimed again once its lease expires."""
+        queue = FileWorkQueue(str(tmp_path), "run", lease_seconds=60, max_attempts=2)
+        assert queue.enqueue([3, 1, 2]) == 3
+        assert queue.enqueue([1, 4]) == 1
+
+        assert queue.claim("worker-a", batch=2) == [1, 2]
+        assert queue.claim("worker-b", batch=5) == [3, 4]
+        assert queue.complete(1, "worker-a", {"order": [1, 0, 1]}) is True
+        assert queue.fail(3, "worker-b", "error") is True
+        assert queue.counts() == {"pending": 1, "claimed": 2, "done": 1}
+
+        # worker-a dies with station 2: once its lease has expired the station goes to another worker
+        queue.lease_seconds = 0
+        assert queue.claim("worker-c", batch=5) == [2, 3, 4]
+        assert queue.complete(2, "worker-a", {"order": [0, 0, 0]}) is False
+
+        # Stations that used all their attempts are given up
+        assert queue.claim("worker-d", batch=5) == []
+        assert queue.counts() == {"done": 1, "failed": 3}
+        assert queue.is_finished()
+        assert queue.results() == {1: {"order": [1, 0, 1]}}
+
+    def test_claim_starts_a_new_lease(self, tmp_path):
+        """Test that a station enqueued long ago is not released by another worker right after being claimed."""
+        queue = FileWorkQueue(str(tmp_path), "run", lease_seconds=60)
+        other_worker = FileWorkQueue(str(tmp_path), "run", lease_seconds=60)
+        queue.enqueue([1, 2])
+        for name in os.listdir(os.path.join(queue.root, "pending")):
+            os.utime(os.path.join(queue.root, "pending", name), (0, 0))
+
+        read = FileWorkQueue._read
+
+        def read_after_other_claim(path):
+            # Another worker expires the leases between the rename of the claim and its read
+            other_worker._expire_leases()
+            return read(path)
+
+        with patch.object(FileWorkQueue, "_read", side_effect=read_after_other_claim):
+            assert queue.claim("worker-a") == [1]
+
+        assert queue.claim("worker-b", batch=5) == [2]
+        assert queue.complete(1, "worker-a", {"order": [1, 0, 1]}) is True
+
+    def test_leases_renewed_during_long_fit(self, tmp_path):
+        """Test that a station fitted longer than its lease is not given to another worker meanwhile."""
+        queue = FileWorkQueue(str(tmp_path), "run", lease_seconds=0.3)
+        fitting = threading.Event()
+        predictor = Mock(station_params={1: (1, 0, 1)})
+
+        def slow_prediction(station_id):
+            fitting.set()
+            time.sleep(1)
+            return [100, 110], 210
+
+        predictor.predict_for_station.side_effect = slow_prediction
+        queue.enqueue([1])
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(
+                run_worker,
+                queue,
+                predictor,
+                worker="worker-a",
+                optimize=False,
+                poll_interval=0,
+                heartbeat_interval=0.05,
+            )
+            assert fitting.wait(5)
+            time.sleep(0.6)
+            assert queue.claim("worker-b") == []
+            assert future.result(5) == 1
+
+        assert queue.results() == {1: {"order": [1, 0, 1], "total_validations": 210}}
+
+    def test_postgres_claims_skip_locked_rows(self, station_queue_engine):
+        """Test that Postgres claims skip the rows locked by another transaction and never share a station."""
+        queue = PostgresWorkQueue(f"test-{os.getpid()}-{time.time_ns()}", lease_seconds=60)
+        queue._engine = station_queue_engine
+        lock_station = (
+            "SELECT station_id FROM transport.station_queue WHERE run_id = :run_id AND station_id = 1 FOR UPDATE"
+        )
+        try:
+            assert queue.enqueue([3, 1, 2]) == 3
+
+            with station_queue_engine.connect() as conn, conn.begin():
+                conn.execute(text(lock_station), {"run_id": queue.run_id})
+                with ThreadPoolExecutor(max_workers=1) as executor:
+                    # Without SKIP LOCKED the claim would wait for the transaction holding station 1
+                    assert executor.submit(queue.claim, "worker-a", 5).result(timeout=10) == [2, 3]
+
+            assert queue.claim("worker-b", batch=5) == [1]
+            assert queue.renew([2, 3], "worker-a") == 2
+            assert queue.complete(1, "worker-a", {"order": [1, 0, 1]}) is False
+            assert queue.complete(1, "worker-b", {"order": [1, 0, 1]}) is True
+            assert queue.counts() == {"claimed": 2, "done": 1}
+
+            assert queue.enqueue(range(10, 30)) == 20
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                claims = list(executor.map(lambda i: queue.claim(f"worker-{i}", 3), range(8)))
+            claimed = [station_id for claim in claims for station_id in claim]
+            assert sorted(claimed) == list(range(10, 30))
+        finally:
+            with station_queue_engine.begin() as conn:
+                conn.execute(
+                    text("DELETE FROM transport.station_queue WHERE run_id = :run_id"), {"run_id": queue.run_id}
+                )
+
+    def test_worker_and_coordinator(self, tmp_path):
+        """Test that workers process every station and that the coordinator saves the collected orders."""
+        queue = FileWorkQueue(str(tmp_path), "run")
+        predictor = Mock(station_params={})
+        predictor.optimize_stations.side_effect = lambda station_ids, **kwargs: {
+            station_ids[0]: {"order": (1, 0, station_ids[0] % 3), "rmse": 1.0}
+        }
+        predictor.predict_for_station.side_effect = lambda station_id: (
+            (None, 0) if station_id == 13 else ([100, 110], 210)
+        )
+
+        queue.enqueue([11, 12, 13])
+        assert run_worker(queue, predictor, worker="worker-a", batch=2, poll_interval=0) == 2
+        predictor.optimize_stations.assert_called_with([13], workers=1, checkpoint=False, export=False)
+
+        results = run_coordinator(queue, [11, 12, 13], predictor, poll_interval=0)
+
+        assert results[12] == {"order": [1, 0, 0], "rmse": 1.0, "total_validations": 210}
+        assert predictor.station_params == {11: (1, 0, 2), 12: (1, 0, 0)}
+        predictor.save_params.assert_called_once()
+        assert queue.counts() == {"done": 2, "failed": 1}
+
+
+class TestHourlyProfileCube:
+    """Tests for the precomputed hourly profile cube."""
+
+    @staticmethod
+    def _with_categories(df):
+        df = df.copy()
+        df["cat_day"] = np.where(df.index.weekday >= 5, "SAHV", np.where(df.index.day % 3 == 0, "JOVS", "JOHV"))
+        return df
+
+    def test_lookup_matches_groupby(self, mock_traffic_data):
+        """Test that the cube gives the same historical averages as the per-station groupby."""
+        predict_module = importlib.import_module("public_transport_watcher.predictor.arima.predict_navigo_validations")
+        df = self._with_categories(mock_traffic_data)
+        cube = HourlyProfileCube.build({70671: df})
+        data_df = preprocess_data(df, 70671)
+
+        for day_of_week in range(7):
+            exact_same_days = predict_module._get_exact_same_days(data_df, 1, day_of_week)
+            expected_weighted, expected = predict_module._calculate_hourly_averages(exact_same_days)
+
+            weighted, simple = cube.lookup(70671, 1, day_of_week)
+
+            np.testing.assert_allclose(weighted.to_numpy(), expected_weighted.to_numpy(), rtol=1e-5)
+            np.testing.assert_allclose(simple.to_numpy(), expected.to_numpy(), rtol=1e-5)
+            assert list(weighted.index) == list(expected_weighted.index)
+
+    def test_empty_cell_and_missing_station(self, mock_traffic_data):
+        """Test lookups without observations."""
+        cube = HourlyProfileCube.build({70671: mock_traffic_data})
+
+        weighted, simple = cube.lookup(70671, 6, 0)
+
+        assert weighted.empty and simple.empty
+        assert 70671 in cube
+        assert 59403 not in cube
+        assert cube.weighted_mean.shape == (1, 12, 7, len(CAT_DAYS), 24)
+        assert cube.weighted_mean.dtype == np.float32
+
+    def test_save_and_load(self, mock_traffic_data, tmp_path):
+        """Test that the cube survives a round trip to disk."""
+        cube = HourlyProfileCube.build({70671: self._with_categories(mock_traffic_data)})
+
+        loaded = HourlyProfileCube.load(cube.save(str(tmp_path / "cube.npz")))
+
+        np.testing.assert_array_equal(loaded.count, cube.count)
+        pd.testing.assert_series_equal(loaded.profile(70671, 1, 2), cube.profile(70671, 1, 2))
+
+
+class TestFastForecast:
+    """Tests for the vectorized all-stations engine."""
+
+    def test_matches_blend_without_time_series_term(self, mock_traffic_data):
+        """Test that the engine reproduces the per-station blend when there is too little data for ARIMA."""
+        predict_module = importlib.import_module("public_transport_watcher.predictor.arima.predict_navigo_validations")
+        current_time = datetime(2024, 1, 31, 14, 20)
+        stations_data = {
+            70671: mock_traffic_data.loc["2024-01-17":],
+            59403: mock_traffic_data.loc["2024-01-17":].assign(
+                station_id=59403, validations=lambda df: df["validations"] * 2
+            ),
+        }
+
+        forecast = fast_forecast(stations_data, current_time=current_time)
+
+        assert list(forecast.unique_station_ids) == [59403, 70671]
+        for station_id, df in stations_data.items():
+            expected, total = predict_module.predict_navigo_validations(
+                df, station_id, (1, 1, 1), current_time=current_time
+            )
+            rows = forecast.station_id == station_id
+
+            np.testing.assert_array_equal(forecast.forecast[rows], expected["forecast"].to_numpy())
+            np.testing.assert_array_equal(forecast.forecast_complete[rows], expected["forecast_complete"].to_numpy())
+            np.testing.assert_array_equal(forecast.target_hour[rows], expected.index.values)
+            assert forecast.forecast[rows].sum() == total
+
+    def test_time_series_term_uses_each_station_window(self, mock_traffic_data):
+        """Test that the autoregressive term is fitted on the window ending at each station's last observation."""
+        fast_forecast_module = importlib.import_module("public_transport_watcher.predictor.arima.fast_forecast")
+        current_time = datetime(2024, 1, 31, 14, 20)
+        lagging = mock_traffic_data.loc[:"2024-01-29 14:00"].assign(station_id=59403)
+        stations_data = {70671: mock_traffic_data, 59403: lagging}
+
+        with patch.object(
+            fast_forecast_module, "_batched_ar_forecast", wraps=fast_forecast_module._batched_ar_forecast
+        ) as mock_ar:
+            forecast = fast_forecast(stations_data, current_time=current_time)
+        without_ar = fast_forecast(stations_data, current_time=current_time, min_observations=10**6)
+
+        series = mock_ar.call_args.args[0]
+        expected_lagging = lagging.loc[lagging.index.hour == 14, "validations"].iloc[-29:].to_numpy(dtype=float)
+        np.testing.assert_array_equal(series[0], expected_lagging)
+        assert np.count_nonzero(~np.isnan(series[1])) == 28
+        assert series[1, -1] == mock_traffic_data.loc["2024-01-30 14:00", "validations"]
+        assert not np.array_equal(forecast.forecast_complete, without_ar.forecast_complete)
+
+    def test_batched_ar_forecast(self):
+        """Test that the batched least squares fit recovers autoregressive processes."""
+        rng = np.random.default_rng(0)
+        matrix = np.empty((2, 200))
+        matrix[:, 0] = 50.0
+        for t in range(1, 200):
+            matrix[:, t] = np.array([10.0, 30.0]) + np.array([0.8, 0.4]) * matrix[:, t - 1] + rng.normal(0, 0.1, 2)
+        sparse = np.full((1, 200), np.nan)
+        sparse[0, ::20] = 1.0
+
+        forecast = _batched_ar_forecast(np.vstack([matrix, sparse]), ar_order=1, min_observations=20)
+
+        np.testing.assert_allclose(forecast[0, 0], 10 + 0.8 * matrix[0, -1], atol=0.5)
+        np.testing.assert_allclose(forecast[1, 1], 30 + 0.4 * forecast[1, 0], atol=0.5)
+        assert np.isnan(forecast[2]).all()
+
+    def test_empty_input(self):
+        """Test that stations without data are skipped."""
+        forecast = fast_forecast({70671: pd.DataFrame()})
+
+        assert len(forecast) == 0
+
+
+class TestDayAheadForecast:
+    """Tests for the day-ahead batch forecast and its intraday correction."""
+
+    @staticmethod
+    def _constant_data(station_id, value, end="2024-01-31 23:00"):
+        index = pd.date_range("2024-01-01", end, freq="h", name="datetime")
+        return pd.DataFrame({"station_id": station_id, "cat_day": "JOHV", "validations": value}, index=index)
+
+    def test_forecast_day_ahead(self, mock_traffic_data):
+        """Test that every hour of the horizon is forecasted for every station."""
+        stations_data = {70671: mock_traffic_data, 59403: self._constant_data(59403, 100)}
+
+        forecast = forecast_day_ahead(stations_data, start=datetime(2024, 1, 30), horizon=48)
+        matrix = forecast.to_matrix()
+
+        assert matrix.shape == (2, 48)
+        assert matrix.columns[0] == pd.Timestamp("2024-01-30")
+        assert matrix.columns[-1] == pd.Timestamp("2024-01-31 23:00")
+        assert (matrix.loc[59403] == 100).all()
+        assert matrix.loc[70671].notna().all()
+        np.testing.assert_array_equal(forecast.forecast, forecast.forecast_complete)
+
+    def test_correct_intraday(self):
+        """Test that the remaining hours are rescaled by the observed to forecasted ratio."""
+        forecast = forecast_day_ahead(
+            {
+                70671: self._constant_data(70671, 100),
+                59403: self._constant_data(59403, 100),
+                59420: self._constant_data(59420, 100),
+            },
+            start=datetime(2024, 1, 30),
+        )
+        observed = {
+            70671: self._constant_data(70671, 150, end="2024-01-30 08:00"),
+            59403: self._constant_data(59403, 1000, end="2024-01-30 08:00"),
+        }
+
+        corrected = correct_intraday(forecast, observed, now=datetime(2024, 1, 30, 8, 30), window=3).to_matrix()
+
+        assert (corrected.loc[70671, :"2024-01-30 07:00"] == 100).all()
+        assert (corrected.loc[70671, "2024-01-30 08:00":] == 150).all()
+        assert (corrected.loc[59403, "2024-01-30 08:00":] == 200).all()
+        assert (corrected.loc[59420] == 100).all()
+
+
+class TestBacktest:
+    """Tests for the backtesting harness."""
+
+    def test_run_backtest_report(self, mock_traffic_data, tmp_path):
+        """Test that each engine is scored on the replayed hours and the report is saved."""
+        stations_data = {
+            70671: mock_traffic_data,
+            59403: mock_traffic_data.assign(station_id=59403, validations=lambda df: df["validations"] * 3),
+        }
+
+        report = run_backtest(stations_data, engines=["blend", "fast"], hours=3, station_params={70671: (1, 0, 0)})
+
+        assert report["replay_hours"] == {"start": "2024-01-30T21:00:00", "end": "2024-01-30T23:00:00", "count": 3}
+        assert report["stations"] == {"59403": "medium", "70671": "low"}
+        for engine in ("blend", "fast"):
+            engine_report = report["engines"][engine]
+            assert engine_report["metrics"]["all"]["forecasts"] == 12
+            assert engine_report["metrics"]["low"]["forecasts"] == 6
+            assert engine_report["metrics"]["high"]["forecasts"] == 0
+            assert engine_report["wall_time_per_station"] > 0
+
+        save_report(report, str(tmp_path / "report.json"))
+        save_report(report, str(tmp_path / "report.csv"))
+
+        with open(tmp_path / "report.json") as f:
+            assert json.load(f)["engines"].keys() == {"blend", "fast"}
+        csv_report = pd.read_csv(tmp_path / "report.csv")
+        assert len(csv_report) == 8
+        assert list(csv_report.columns[:3]) == ["engine", "station_class", "mae"]
+
+    def test_unknown_engine(self, mock_traffic_data):
+        """Test that unknown engines are rejected."""
+        with pytest.raises(ValueError):
+            run_backtest({70671: mock_traffic_data}, engines=["prophet"])
+
+    def test_load_fixture(self, mock_traffic_data, tmp_path):
+        """Test that a CSV fixture is loaded in the bulk data format."""
+        mock_traffic_data.to_csv(tmp_path / "traffic.csv", index=False)
+
+        stations_data = load_fixture(str(tmp_path / "traffic.csv"))
+
+        assert list(stations_data) == [70671]
+        assert stations_data[70671].index[0] == pd.Timestamp("2024-01-01")
+        assert stations_data[70671]["validations"].sum() == mock_traffic_data["validations"].sum()
+
+
 class TestArimaPrediction:
     """Tests for ARIMA prediction functions."""
 
@@ -1,9 +1,17 @@
+from datetime import datetime
 import json
-from unittest.mock import patch
+import multiprocessing
+import os
+import threading
+import time
+from unittest.mock import Mock, patch
 
 import pandas as pd
+import pytest
 
-from public_transport_watcher.predictor.arima_predictions import ArimaPredictor
+from public_transport_watcher.predictor import arima_predictions
+from public_transport_watcher.predictor.arima import ArimaModelCache, ArimaParamStore, ForecastFrame
+from public_transport_watcher.predictor.arima_predictions import ArimaPredictor, _init_station_worker, _pool_context
 
 
 class TestArimaPredictorInitialization:
@@ -117,6 +125,16 @@ class TestArimaPredictorStationPrediction:
         mock_find_params.assert_called_once()
         mock_predict.assert_called_once()
 
+    @patch("public_transport_watcher.predictor.arima_predictions.predict_navigo_validations")
+    def test_predict_for_station_with_model_cache(self, mock_predict, arima_predictor, mock_traffic_data, tmp_path):
+        """Test that the fitted-model cache is handed to the prediction step."""
+        arima_predictor.model_cache = ArimaModelCache(str(tmp_path))
+        mock_predict.return_value = ([120, 130], 250)
+
+        arima_predictor.predict_for_station(70671, data_raw=mock_traffic_data)
+
+        assert mock_predict.call_args.kwargs["model_cache"] is arima_predictor.model_cache
+
     @patch("public_transport_watcher.predictor.arima_predictions.get_data_from_db")
     def test_predict_for_station_with_no_data(self, mock_get_data, arima_predictor):
         """Test prediction for station with no available data."""
@@ -158,11 +176,101 @@ class TestArimaPredictorAllStationsPrediction:
 
         assert mock_predict_station.call_count == 4
 
+    @patch("public_transport_watcher.predictor.arima_predictions.ArimaPredictor.predict_for_station")
+    def test_predict_for_all_stations_saves_forecast(self, mock_predict_station, arima_predictor, tmp_path):
+        """Test that the run forecasts are kept in columnar form and saved to a single file."""
+        mock_predict_station.return_value = ([120, 130], 250)
+        arima_predictor.forecasts_dir = str(tmp_path)
+
+        arima_predictor.predict_for_all_stations()
+
+        assert len(arima_predictor.last_forecast) == 8
+        assert arima_predictor.last_forecast.n_stations == 4
+        assert list(arima_predictor.last_forecast.totals()[1]) == [250] * 4
+        assert len(list(tmp_path.glob("forecast_*.npz"))) == 1
+
+    def test_save_forecast_keeps_latest_files(self, arima_predictor, tmp_path):
+        """Test that only the most recent run files are kept in the forecasts directory."""
+        for hour in range(5):
+            (tmp_path / f"forecast_20240101_{hour:02d}00.npz").touch()
+        arima_predictor.forecasts_dir = str(tmp_path)
+        arima_predictor.forecasts_keep = 3
+
+        arima_predictor.save_forecast(ForecastFrame.from_predictions([70671], [[120, 130]]))
+
+        kept = sorted(path.name for path in tmp_path.glob("forecast_*.npz"))
+        assert len(kept) == 3
+        assert kept[:2] == ["forecast_20240101_0300.npz", "forecast_20240101_0400.npz"]
+
+    @patch("public_transport_watcher.predictor.arima_predictions.get_bulk_data_from_db")
+    def test_forecast_day_ahead_and_correction(self, mock_get_bulk_data, arima_predictor, mock_traffic_data, tmp_path):
+        """Test that the day-ahead forecast is saved and corrected from the saved file."""
+        mock_get_bulk_data.return_value = {70671: mock_traffic_data}
+        arima_predictor.bulk_config = None
+        arima_predictor.day_ahead_config = {"forecast_file": str(tmp_path / "day_ahead.npz"), "horizon": 48}
+
+        forecast = arima_predictor.forecast_day_ahead(start=pd.Timestamp("2024-01-30"))
+
+        assert len(forecast.forecast) == 48
+        assert os.path.exists(tmp_path / "day_ahead.npz")
+        assert not os.path.exists(tmp_path / "day_ahead.tmp.npz")
+
+        arima_predictor.day_ahead_forecast = None
+        corrected = arima_predictor.correct_day_ahead(now=pd.Timestamp("2024-01-30 12:00"))
+
+        mock_get_bulk_data.assert_called_with([70671], weeks=1)
+        assert corrected is arima_predictor.corrected_day_ahead_forecast
+        assert len(corrected.forecast) == 48
+
+    @patch("public_transport_watcher.predictor.arima_predictions.get_bulk_data_from_db")
+    def test_scheduled_day_ahead_is_corrected_without_stacking(
+        self, mock_get_bulk_data, arima_predictor, mock_traffic_data, tmp_path
+    ):
+        """Test that the hourly correction applies to the forecast of the 03:30 job, always from its uncorrected values."""
+
+        class Clock(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return cls(2024, 1, 30, 3, 30)
+
+        history = mock_traffic_data.loc[:"2024-01-30 03:00"].assign(validations=100)
+        arima_predictor.bulk_config = None
+        arima_predictor.day_ahead_config = {
+            "forecast_file": str(tmp_path / "day_ahead.npz"),
+            "corrected_file": str(tmp_path / "day_ahead_corrected.npz"),
+            "horizon": 24,
+        }
+        mock_get_bulk_data.return_value = {70671: history}
+        with patch("public_transport_watcher.predictor.arima.day_ahead.datetime", Clock):
+            forecast = arima_predictor.forecast_day_ahead()
+
+        observed = pd.concat(
+            [history, mock_traffic_data.loc["2024-01-30 04:00":"2024-01-30 09:00"].assign(validations=150)]
+        )
+        mock_get_bulk_data.return_value = {70671: observed}
+        corrections = [
+            arima_predictor.correct_day_ahead(now=pd.Timestamp(f"2024-01-30 {hour}:00")) for hour in (9, 10, 10)
+        ]
+
+        base = forecast.to_matrix().loc[70671]
+        assert base.index[0] == pd.Timestamp("2024-01-30 00:00")
+        assert (base == 100).all()
+        for corrected in corrections:
+            corrected = corrected.to_matrix().loc[70671]
+            assert (corrected[:"2024-01-30 08:00"] == 100).all()
+            assert (corrected["2024-01-30 10:00":] == 150).all()
+        pd.testing.assert_frame_equal(
+            ForecastFrame.load(str(tmp_path / "day_ahead.npz")).to_frame(), forecast.to_frame()
+        )
+        pd.testing.assert_frame_equal(
+            ForecastFrame.load(str(tmp_path / "day_ahead_corrected.npz")).to_frame(), corrections[-1].to_frame()
+        )
+
     @patch("public_transport_watcher.predictor.arima_predictions.ArimaPredictor.predict_for_station")
     def test_predict_for_all_stations_with_failures(self, mock_predict_station, arima_predictor):
         """Test prediction for all stations with some failures."""
 
-        def mock_predict_side_effect(station_id, optimize_params=False):
+        def mock_predict_side_effect(station_id, optimize_params=False, data_raw=None):
             if station_id == 59403:
                 return (None, 0)
             else:
@@ -208,6 +316,265 @@ class TestArimaPredictorAllStationsPrediction:
         assert len(result) == 0
 
 
+class TestArimaPredictorParallelPrediction:
+    """Tests for the process pool execution mode of all stations prediction."""
+
+    @pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="Mocks only reach forked workers")
+    @patch("public_transport_watcher.predictor.arima_predictions.ArimaPredictor.predict_for_station")
+    def test_predict_for_all_stations_in_pool(self, mock_predict_station, arima_predictor):
+        """Test that the pool mode returns one row per station in the original order."""
+        mock_predict_station.return_value = ([120, 130], 250)
+        arima_predictor.parallel_config = {"workers": 2, "chunksize": 2, "station_timeout": 30, "start_method": "fork"}
+
+        result = arima_predictor.predict_for_all_stations()
+
+        assert list(result["station_id"]) == [70671, 59403, 59420, 59429]
+        assert list(result["total"]) == [250] * 4
+        assert arima_predictor.last_run_stats["succeeded"] == 4
+        assert arima_predictor.last_run_stats["workers"] == 2
+
+    def test_worker_predictor_built_from_config(self, arima_predictor):
+        """Test that station workers build their own predictor from the parameters and configuration."""
+        _init_station_worker({70671: (1, 1, 2)}, arima_predictor.config)
+
+        worker_predictor = arima_predictions._worker_predictor
+        assert worker_predictor is not arima_predictor
+        assert worker_predictor.station_params == {70671: (1, 1, 2)}
+        assert worker_predictor.params_file == arima_predictor.params_file
+
+    @patch("public_transport_watcher.predictor.arima_predictions.ArimaPredictor.predict_for_station")
+    def test_slow_station_times_out_without_blocking_batch(self, mock_predict_station, arima_predictor):
+        """Test that a station exceeding the timeout is skipped and the others still succeed."""
+
+        def mock_predict_side_effect(station_id, optimize_params=False, data_raw=None):
+            if station_id == 59403:
+                time.sleep(5)
+            return ([120, 130], 250)
+
+        mock_predict_station.side_effect = mock_predict_side_effect
+        arima_predictor.parallel_config = {"workers": 1, "station_timeout": 0.2}
+
+        result = arima_predictor.predict_for_all_stations()
+
+        assert len(result) == 3
+        assert 59403 not in result["station_id"].tolist()
+        assert arima_predictor.last_run_stats["timed_out"] == 1
+        assert arima_predictor.last_run_stats["station_times"][59403] < 5
+
+    @pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="Mocks only reach forked workers")
+    @patch("public_transport_watcher.predictor.arima_predictions.ArimaPredictor.predict_for_station")
+    def test_slow_station_times_out_off_main_thread(self, mock_predict_station, arima_predictor):
+        """Test that the station timeout still applies when the batch runs in a scheduler thread."""
+
+        def mock_predict_side_effect(station_id, optimize_params=False, data_raw=None):
+            if station_id == 59403:
+                time.sleep(5)
+            return ([120, 130], 250)
+
+        mock_predict_station.side_effect = mock_predict_side_effect
+        arima_predictor.parallel_config = {"workers": 1, "station_timeout": 0.2, "start_method": "fork"}
+
+        thread = threading.Thread(target=arima_predictor.predict_for_all_stations)
+        thread.start()
+        thread.join(10)
+
+        assert arima_predictor.last_run_stats["succeeded"] == 3
+        assert arima_predictor.last_run_stats["timed_out"] == 1
+
+    def test_pool_start_method(self):
+        """Test that the worker pool uses the configured start method, or spawn when it is not available."""
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            assert _pool_context("forkserver").get_start_method() == "forkserver"
+        assert _pool_context("unknown").get_start_method() == "spawn"
+
+    @patch("public_transport_watcher.predictor.arima_predictions.ArimaPredictor.predict_for_station")
+    def test_run_stats_report_failures(self, mock_predict_station, arima_predictor):
+        """Test that failed stations are counted in the run statistics."""
+        mock_predict_station.side_effect = lambda station_id, optimize_params=False, data_raw=None: (
+            (None, 0) if station_id == 59420 else ([120, 130], 250)
+        )
+
+        arima_predictor.predict_for_all_stations()
+
+        assert arima_predictor.last_run_stats["stations"] == 4
+        assert arima_predictor.last_run_stats["succeeded"] == 3
+        assert arima_predictor.last_run_stats["failed"] == 1
+
+
+class TestArimaPredictorParamsStore:
+    """Tests for ArimaPredictor with a parameters store."""
+
+    def test_store_seeded_from_json(self, mock_station_params_file, tmp_path):
+        """Test that an empty store is filled from the JSON file and then used."""
+        store_path = str(tmp_path / "params.sqlite")
+        config = {
+            "params_station_file": mock_station_params_file,
+            "params_store": store_path,
+            "p_range": [0, 1, 2],
+            "d_range": [0, 1],
+            "q_range": [0, 1, 2],
+        }
+
+        with patch("public_transport_watcher.predictor.arima_predictions.ARIMA_CONFIG", config):
+            predictor = ArimaPredictor()
+            predictor.params_store.upsert(70671, (0, 1, 0))
+            reloaded = ArimaPredictor()
+
+        assert predictor.station_params[59403] == (2, 0, 2)
+        assert len(reloaded.station_params) == 4
+        assert reloaded.station_params[70671] == (0, 1, 0)
+
+    @patch("public_transport_watcher.predictor.arima_predictions.run_grid_search")
+    def test_optimize_only_stale_stations(self, mock_grid_search, arima_predictor, mock_traffic_data, tmp_path):
+        """Test that re-optimization targets the stations with old parameters."""
+        arima_predictor.params_store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+        arima_predictor.params_store.upsert(70671, (1, 1, 2), optimized_at="2999-01-01T00:00:00")
+        arima_predictor.bulk_config = None
+        results = {59403: {"order": (1, 0, 1), "rmse": 3.0, "optimized_at": "2999-01-01"}}
+
+        def grid_search(*args, on_station_done=None, **kwargs):
+            for station_id, result in results.items():
+                on_station_done(station_id, result)
+            return results
+
+        mock_grid_search.side_effect = grid_search
+
+        with patch(
+            "public_transport_watcher.predictor.arima_predictions.get_data_from_db", return_value=mock_traffic_data
+        ) as mock_get_data:
+            arima_predictor.optimize_stations([70671, 59403], max_age_days=7)
+
+        mock_get_data.assert_called_once_with(59403)
+        assert arima_predictor.params_store.get(59403) == (1, 0, 1)
+        assert arima_predictor.station_params[59403] == (1, 0, 1)
+        with open(arima_predictor.params_file) as f:
+            assert json.load(f)["59403"] == [1, 0, 1]
+
+    @patch("public_transport_watcher.predictor.arima_predictions.run_grid_search")
+    def test_optimize_exports_json_once(self, mock_grid_search, arima_predictor, mock_traffic_data, tmp_path):
+        """Test that the stations completed by the grid search are upserted one by one and exported once."""
+        arima_predictor.params_store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+        arima_predictor.bulk_config = None
+        station_ids = [70671, 59403, 59420, 59429]
+
+        def grid_search(stations_data, *args, on_station_done=None, **kwargs):
+            results = {}
+            for station_id in stations_data:
+                results[station_id] = {"order": (1, 0, 1), "rmse": 3.0, "optimized_at": "2999-01-01"}
+                on_station_done(station_id, results[station_id])
+            return results
+
+        mock_grid_search.side_effect = grid_search
+        with patch(
+            "public_transport_watcher.predictor.arima_predictions.get_data_from_db", return_value=mock_traffic_data
+        ):
+            with patch.object(ArimaParamStore, "export_json", autospec=True) as mock_export:
+                arima_predictor.optimize_stations(station_ids)
+
+        mock_export.assert_called_once()
+        assert arima_predictor.params_store.load_all() == {station_id: (1, 0, 1) for station_id in station_ids}
+
+    def test_json_file_follows_store(self, arima_predictor, tmp_path):
+        """Test that the JSON file is rewritten from the store, so both hold the same orders."""
+        arima_predictor.params_store = ArimaParamStore(str(tmp_path / "params.sqlite"))
+        arima_predictor.params_store.upsert(12345, (2, 1, 2))
+
+        arima_predictor.station_params[70671] = (0, 1, 1)
+        arima_predictor.save_params({70671: {"order": (0, 1, 1), "rmse": 4.0, "optimized_at": "2024-01-01"}})
+
+        with open(arima_predictor.params_file) as f:
+            params_dict = json.load(f)
+        assert params_dict == {
+            str(station_id): list(order) for station_id, order in arima_predictor.params_store.load_all().items()
+        }
+        assert params_dict["70671"] == [0, 1, 1]
+        assert params_dict["12345"] == [2, 1, 2]
+
+
+class TestArimaPredictorOptimization:
+    """Tests for the optimization of the ARIMA parameters of all stations."""
+
+    @patch("public_transport_watcher.predictor.arima_predictions.run_grid_search")
+    @patch("public_transport_watcher.predictor.arima_predictions.get_bulk_data_from_db")
+    def test_optimize_stations(self, mock_get_bulk_data, mock_grid_search, arima_predictor, mock_traffic_data):
+        """Test that the grid search results are kept and saved to the parameters file."""
+        arima_predictor.bulk_config = {}
+        mock_get_bulk_data.return_value = {70671: mock_traffic_data}
+        mock_grid_search.return_value = {70671: {"order": (0, 1, 1), "rmse": 10.0}}
+
+        results = arima_predictor.optimize_stations([70671], workers=2, resume=True)
+
+        assert results[70671]["order"] == (0, 1, 1)
+        assert arima_predictor.station_params[70671] == (0, 1, 1)
+        assert mock_grid_search.call_args.kwargs["resume"] is True
+        # A single station still fans its orders out to every worker
+        assert mock_grid_search.call_args.kwargs["workers"] == 2
+        with open(arima_predictor.params_file) as f:
+            assert json.load(f)["70671"] == [0, 1, 1]
+
+
+class TestArimaPredictorBulkLoading:
+    """Tests for the bulk loading of station data before predictions."""
+
+    @patch("public_transport_watcher.predictor.arima_predictions.get_data_from_db")
+    @patch("public_transport_watcher.predictor.arima_predictions.get_bulk_data_from_db")
+    @patch("public_transport_watcher.predictor.arima_predictions.predict_navigo_validations")
+    def test_predict_for_all_stations_loads_data_once(
+        self, mock_predict, mock_get_bulk_data, mock_get_data, arima_predictor, mock_traffic_data
+    ):
+        """Test that all stations share a single bulk query instead of one query each."""
+        mock_get_bulk_data.return_value = {70671: mock_traffic_data, 59403: mock_traffic_data}
+        mock_predict.return_value = ([120, 130], 250)
+        arima_predictor.bulk_config = {"history_weeks": 12, "partitions": 1, "chunksize": 1000}
+
+        result = arima_predictor.predict_for_all_stations()
+
+        mock_get_bulk_data.assert_called_once_with([70671, 59403, 59420, 59429], weeks=12, partitions=1, chunksize=1000)
+        mock_get_data.assert_not_called()
+        assert mock_predict.call_count == 2
+        assert list(result["station_id"]) == [70671, 59403]
+
+    @patch("public_transport_watcher.predictor.arima_predictions.get_bulk_data_from_db")
+    def test_bulk_loading_disabled(self, mock_get_bulk_data, arima_predictor):
+        """Test that no bulk query is made when bulk loading is not configured."""
+        arima_predictor.bulk_config = None
+
+        assert arima_predictor.load_stations_data([70671]) is None
+        mock_get_bulk_data.assert_not_called()
+
+    @patch("public_transport_watcher.predictor.arima_predictions.get_bulk_data_from_db")
+    @patch("public_transport_watcher.predictor.arima_predictions.predict_navigo_validations")
+    def test_fast_engine(self, mock_predict, mock_get_bulk_data, arima_predictor, mock_traffic_data):
+        """Test that the fast engine forecasts all stations without fitting a model per station."""
+        mock_get_bulk_data.return_value = {
+            70671: mock_traffic_data,
+            59403: mock_traffic_data.assign(station_id=59403),
+        }
+        arima_predictor.engine = "fast"
+        arima_predictor.bulk_config = None
+
+        result = arima_predictor.predict_for_all_stations()
+
+        mock_predict.assert_not_called()
+        mock_get_bulk_data.assert_called_once_with([70671, 59403, 59420, 59429])
+        assert list(result.columns) == ["station_id", "predictions", "total"]
+        assert sorted(result["station_id"]) == [59403, 70671]
+        assert list(result["predictions"].iloc[0].columns) == ["forecast", "forecast_complete"]
+        assert arima_predictor.last_forecast.n_stations == 2
+        assert arima_predictor.last_run_stats["failed"] == 2
+
+    def test_series_cache_replaces_bulk_loading(self, arima_predictor, mock_traffic_data):
+        """Test that the stations history is read from the series cache after appending the new time bins."""
+        arima_predictor.series_cache = Mock()
+        arima_predictor.series_cache.load_many.return_value = {70671: mock_traffic_data}
+        arima_predictor.bulk_config = {"history_weeks": 8}
+
+        assert arima_predictor.load_stations_data([70671]) == {70671: mock_traffic_data}
+
+        arima_predictor.series_cache.update.assert_called_once_with([70671])
+        arima_predictor.series_cache.load_many.assert_called_once_with([70671], weeks=8)
+
+
 class TestArimaPredictorParameterHandling:
     """Tests for ARIMA parameter handling."""
 
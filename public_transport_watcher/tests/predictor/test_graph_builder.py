@@ -5,6 +5,8 @@ import networkx as nx
 import pandas as pd
 import pytest
 
+from public_transport_watcher.predictor.arima.forecast_frame import ForecastFrame
+from public_transport_watcher.predictor.graph import adjust_station_weights
 from public_transport_watcher.predictor.graph_builder import GraphBuilder
 
 
@@ -272,6 +274,24 @@ class TestGraphBuilderWeightedGraphUpdate:
                 mock_adjust_weights.assert_called_once()
                 mock_save.assert_called_once_with(mock_weighted_graph, "weighted")
 
+    def test_adjust_station_weights_with_forecast_frame(self):
+        """Test that a ForecastFrame gives the same weights as the equivalent predictions DataFrame."""
+        graph = nx.DiGraph()
+        graph.add_edge(70671, 59403, weight=2.0, line="1")
+        graph.add_edge(59403, 59420, weight=3.0, line="4")
+
+        predictions_df = pd.DataFrame(
+            {"station_id": [70671, 59403, 59420], "predictions": [250, 190, 40], "total": [250, 190, 40]}
+        )
+        forecast = ForecastFrame.from_predictions([70671, 59403, 59420], [[120, 130], [90, 100], [15, 25]])
+
+        from_df = adjust_station_weights(graph, predictions_df)
+        from_forecast = adjust_station_weights(graph, forecast)
+
+        for u, v in graph.edges():
+            assert from_forecast[u][v]["weight"] == pytest.approx(from_df[u][v]["weight"])
+        assert from_forecast.nodes[59403]["is_transfer"]
+
 
 class TestGraphBuilderVisualization:
     """Tests for network visualization functionality."""
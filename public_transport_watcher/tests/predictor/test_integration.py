@@ -166,7 +166,9 @@ class TestPredictorIntegration:
 
         route = predictor.find_optimal_route(start_coords, end_coords, use_weighted=True)
 
-        mock_graph_builder.find_optimal_route.assert_called_once_with(start_coords, end_coords, use_weighted=False)
+        mock_graph_builder.find_optimal_route.assert_called_once_with(
+            start_coords, end_coords, use_weighted=False, graph="base_graph"
+        )
         assert route["graph_type"] == "base"
 
     def test_data_flow_integration(self):
@@ -1,10 +1,23 @@
+import threading
+import time
 from unittest.mock import Mock, patch
 
 import pandas as pd
 import pytest
 import schedule
 
+from public_transport_watcher.predictor.arima import ForecastFrame
 from public_transport_watcher.predictor.predictor import Predictor
+from public_transport_watcher.predictor.scheduler import BackgroundRunner, GraphBuffer
+
+
+def _bare_predictor():
+    """Build a Predictor with mocked ARIMA predictor and graph builder, and no graph loaded."""
+    graph_builder = Mock()
+    graph_builder.load_graph.return_value = None
+    with patch("public_transport_watcher.predictor.predictor.ArimaPredictor"):
+        with patch("public_transport_watcher.predictor.predictor.GraphBuilder", return_value=graph_builder):
+            return Predictor()
 
 
 class TestPredictorInitialization:
@@ -102,7 +115,7 @@ class TestPredictorPredictionAndUpdate:
         mock_graph_builder.update_weighted_graph.return_value = "updated_weighted_graph"
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.arima_predictor = mock_arima_predictor
         predictor.graph_builder = mock_graph_builder
 
@@ -115,6 +128,25 @@ class TestPredictorPredictionAndUpdate:
 
         assert predictor.weighted_graph == "updated_weighted_graph"
 
+    @patch("public_transport_watcher.predictor.predictor.write_forecast")
+    def test_predict_and_update_graph_uses_forecast_frame(self, mock_write_forecast):
+        """Test that the columnar forecasts of the run weight the graph and are saved to the forecast table."""
+        mock_arima_predictor = Mock()
+        mock_predictions = pd.DataFrame({"station_id": [70671], "predictions": [[120, 130]], "total": [250]})
+        mock_arima_predictor.predict_for_all_stations.return_value = mock_predictions
+        forecast = ForecastFrame.from_predictions([70671], [[120, 130]])
+        mock_arima_predictor.last_forecast = forecast
+
+        mock_graph_builder = Mock()
+
+        predictor = _bare_predictor()
+        predictor.arima_predictor = mock_arima_predictor
+        predictor.graph_builder = mock_graph_builder
+
+        assert predictor.predict_and_update_graph() is True
+        mock_graph_builder.update_weighted_graph.assert_called_once_with(forecast)
+        mock_write_forecast.assert_called_once_with(forecast, mock_arima_predictor.engine)
+
     @patch("public_transport_watcher.predictor.predictor.ArimaPredictor")
     @patch("public_transport_watcher.predictor.predictor.GraphBuilder")
     def test_predict_and_update_graph_with_optimization(self, mock_graph_class, mock_arima_class):
@@ -128,7 +160,7 @@ class TestPredictorPredictionAndUpdate:
         mock_graph_builder.update_weighted_graph.return_value = "updated_weighted_graph"
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.arima_predictor = mock_arima_predictor
         predictor.graph_builder = mock_graph_builder
 
@@ -149,7 +181,7 @@ class TestPredictorPredictionAndUpdate:
         mock_graph_builder = Mock()
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.arima_predictor = mock_arima_predictor
         predictor.graph_builder = mock_graph_builder
 
@@ -170,7 +202,7 @@ class TestPredictorPredictionAndUpdate:
         mock_graph_builder = Mock()
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.arima_predictor = mock_arima_predictor
         predictor.graph_builder = mock_graph_builder
 
@@ -199,7 +231,7 @@ class TestPredictorRouteFinding:
         mock_graph_builder.find_optimal_route.return_value = mock_route_info
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.graph_builder = mock_graph_builder
         predictor.weighted_graph = None
 
@@ -210,7 +242,9 @@ class TestPredictorRouteFinding:
 
         assert result == mock_route_info
 
-        mock_graph_builder.find_optimal_route.assert_called_once_with(start_coords, end_coords, use_weighted=False)
+        mock_graph_builder.find_optimal_route.assert_called_once_with(
+            start_coords, end_coords, use_weighted=False, graph=None
+        )
 
     @patch("public_transport_watcher.predictor.predictor.GraphBuilder")
     @patch("public_transport_watcher.predictor.predictor.ArimaPredictor")
@@ -229,7 +263,7 @@ class TestPredictorRouteFinding:
         mock_graph_builder.find_optimal_route.return_value = mock_route_info
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.graph_builder = mock_graph_builder
         predictor.weighted_graph = "weighted_graph"
 
@@ -240,7 +274,9 @@ class TestPredictorRouteFinding:
 
         assert result == mock_route_info
 
-        mock_graph_builder.find_optimal_route.assert_called_once_with(start_coords, end_coords, use_weighted=True)
+        mock_graph_builder.find_optimal_route.assert_called_once_with(
+            start_coords, end_coords, use_weighted=True, graph="weighted_graph"
+        )
 
     @patch("public_transport_watcher.predictor.predictor.GraphBuilder")
     @patch("public_transport_watcher.predictor.predictor.ArimaPredictor")
@@ -259,7 +295,7 @@ class TestPredictorRouteFinding:
         mock_graph_builder.find_optimal_route.return_value = mock_route_info
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.graph_builder = mock_graph_builder
         predictor.weighted_graph = None
 
@@ -270,7 +306,9 @@ class TestPredictorRouteFinding:
 
         assert result == mock_route_info
 
-        mock_graph_builder.find_optimal_route.assert_called_once_with(start_coords, end_coords, use_weighted=False)
+        mock_graph_builder.find_optimal_route.assert_called_once_with(
+            start_coords, end_coords, use_weighted=False, graph=None
+        )
 
     @patch("public_transport_watcher.predictor.predictor.GraphBuilder")
     @patch("public_transport_watcher.predictor.predictor.ArimaPredictor")
@@ -280,7 +318,7 @@ class TestPredictorRouteFinding:
         mock_graph_builder.find_optimal_route.side_effect = Exception("Route finding failed")
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.graph_builder = mock_graph_builder
 
         start_coords = (48.8566, 2.3522)
@@ -303,7 +341,7 @@ class TestPredictorGraphManagement:
         mock_graph_builder.load_graph.return_value = "new_base_graph"
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.graph_builder = mock_graph_builder
 
         result = predictor.rebuild_base_graph()
@@ -323,7 +361,7 @@ class TestPredictorGraphManagement:
         mock_graph_builder.save_graph.side_effect = Exception("Save failed")
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.graph_builder = mock_graph_builder
 
         result = predictor.rebuild_base_graph()
@@ -337,7 +375,7 @@ class TestPredictorGraphManagement:
         mock_graph_builder = Mock()
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.base_graph = Mock()
         predictor.weighted_graph = Mock()
 
@@ -369,7 +407,7 @@ class TestPredictorGraphManagement:
         mock_graph_builder = Mock()
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.base_graph = None
         predictor.weighted_graph = None
 
@@ -397,7 +435,7 @@ class TestPredictorScheduling:
         mock_graph_builder = Mock()
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.predict_and_update_graph = Mock()
 
         result = predictor.schedule_hourly_updates()
@@ -414,7 +452,7 @@ class TestPredictorScheduling:
         mock_graph_builder = Mock()
         mock_graph_class.return_value = mock_graph_builder
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.predict_and_update_graph = Mock()
 
         predictor.run_scheduled_tasks(run_forever=False)
@@ -432,7 +470,7 @@ class TestPredictorScheduling:
         mock_arima_predictor.predict_for_all_stations.return_value = mock_predictions
         mock_arima_class.return_value = mock_arima_predictor
 
-        predictor = Predictor.__new__(Predictor)
+        predictor = _bare_predictor()
         predictor.arima_predictor = mock_arima_predictor
 
         result = predictor.optimize_all_arima_models()
@@ -440,3 +478,136 @@ class TestPredictorScheduling:
         assert result.equals(mock_predictions)
 
         mock_arima_predictor.predict_for_all_stations.assert_called_once_with(optimize_params=True)
+
+    @patch("public_transport_watcher.predictor.predictor.build_profile_cube")
+    def test_rebuild_profile_cube(self, mock_build_cube):
+        """Test that the nightly job rebuilds the cube and reloads it in the ARIMA predictor."""
+        predictor = _bare_predictor()
+        predictor.arima_predictor = Mock(profile_cube_file="/tmp/profile_cube.npz")
+
+        assert predictor.rebuild_profile_cube() is True
+
+        mock_build_cube.assert_called_once_with("/tmp/profile_cube.npz")
+        predictor.arima_predictor.load_profile_cube.assert_called_once()
+
+    def test_day_ahead_jobs(self):
+        """Test that the day-ahead jobs delegate to the ARIMA predictor."""
+        predictor = _bare_predictor()
+        predictor.arima_predictor = Mock()
+        predictor.arima_predictor.correct_day_ahead.return_value = None
+
+        assert predictor.update_day_ahead_forecast() is True
+        assert predictor.correct_day_ahead_forecast() is False
+        predictor.arima_predictor.forecast_day_ahead.assert_called_once_with()
+
+
+class TestBackgroundScheduler:
+    """Tests for the background job runner and the graph double buffer."""
+
+    def test_graph_buffer_swap(self):
+        """Test that publishing a graph swaps the buffers and keeps the previous graph."""
+        buffer = GraphBuffer("graph_v1")
+
+        assert buffer.current == "graph_v1"
+        assert buffer.publish("graph_v2") == 2
+        assert buffer.current == "graph_v2"
+        assert buffer.previous == "graph_v1"
+
+    def test_route_query_during_graph_update(self):
+        """Test that route queries keep using the published graph while a new one is built."""
+        building = threading.Event()
+        release = threading.Event()
+
+        def update_weighted_graph(frequency_data):
+            building.set()
+            release.wait(5)
+            return "new_weighted_graph"
+
+        predictor = _bare_predictor()
+        predictor.weighted_graph = "old_weighted_graph"
+        predictor.arima_predictor = Mock(last_forecast=None)
+        predictor.arima_predictor.predict_for_all_stations.return_value = pd.DataFrame(
+            {"station_id": [70671], "predictions": [[120, 130]], "total": [250]}
+        )
+        predictor.graph_builder = Mock()
+        predictor.graph_builder.update_weighted_graph.side_effect = update_weighted_graph
+
+        runner = BackgroundRunner(workers=1)
+        future = runner.submit("predict_and_update_graph", predictor.predict_and_update_graph)
+        assert building.wait(5)
+
+        predictor.find_optimal_route((48.8566, 2.3522), (48.8637, 2.3488), use_weighted=True)
+        assert predictor.graph_builder.find_optimal_route.call_args.kwargs["graph"] == "old_weighted_graph"
+
+        release.set()
+        assert future.result(5) is True
+        assert predictor.weighted_graph == "new_weighted_graph"
+        runner.stop()
+
+    def test_arima_jobs_run_one_at_a_time(self):
+        """Test that the jobs sharing the ARIMA predictor wait for each other instead of running together."""
+        active = []
+        overlaps = []
+
+        def arima_job(*args, **kwargs):
+            active.append(1)
+            overlaps.append(len(active) > 1)
+            time.sleep(0.1)
+            active.pop()
+            return pd.DataFrame({"station_id": [70671], "predictions": [[120, 130]], "total": [250]})
+
+        predictor = _bare_predictor()
+        predictor.arima_predictor = Mock(last_forecast=None)
+        predictor.arima_predictor.predict_for_all_stations.side_effect = arima_job
+        predictor.arima_predictor.forecast_day_ahead.side_effect = arima_job
+        predictor.arima_predictor.correct_day_ahead.side_effect = arima_job
+        predictor.arima_predictor.load_profile_cube.side_effect = arima_job
+
+        runner = BackgroundRunner(workers=4)
+        with patch("public_transport_watcher.predictor.predictor.build_profile_cube"):
+            futures = [
+                runner.submit("predict_and_update_graph", predictor.predict_and_update_graph),
+                runner.submit("rebuild_profile_cube", predictor.rebuild_profile_cube),
+                runner.submit("update_day_ahead_forecast", predictor.update_day_ahead_forecast),
+                runner.submit("correct_day_ahead_forecast", predictor.correct_day_ahead_forecast),
+            ]
+            assert all(future.result(5) is True for future in futures)
+        runner.stop()
+
+        assert len(overlaps) == 4
+        assert not any(overlaps)
+
+    def test_single_flight_and_metrics(self):
+        """Test that a job requested while running is skipped and that run durations are recorded."""
+        release = threading.Event()
+        runner = BackgroundRunner(workers=2)
+
+        future = runner.submit("predict", release.wait, 5)
+        assert runner.is_running("predict")
+        assert runner.submit("predict", release.wait, 5) is None
+
+        release.set()
+        future.result(5)
+        runner.run("predict", Mock(return_value=False))
+        runner.stop()
+
+        metrics = runner.metrics()["predict"]
+        assert metrics["runs"] == 2
+        assert metrics["skipped"] == 1
+        assert metrics["failures"] == 1
+        assert metrics["last_result"] == "failed"
+        assert metrics["running"] is False
+        assert metrics["max_duration"] >= metrics["last_duration"] >= 0
+
+    def test_scheduled_jobs_run_in_background(self):
+        """Test that the scheduled jobs are submitted to the background workers."""
+        scheduler = schedule.Scheduler()
+        runner = BackgroundRunner(workers=1, scheduler=scheduler)
+        job = Mock(return_value=True)
+        scheduler.every().hour.do(runner.job("predict", job))
+
+        scheduler.run_all()
+        runner.stop()
+
+        job.assert_called_once_with()
+        assert runner.metrics()["predict"]["runs"] == 1
@@ -1,6 +1,7 @@
 from .get_cache_utils import get_cache_info, is_cache_valid, load_from_cache, save_to_cache
 from .get_credentials import get_credentials
 from .get_datalake_file import get_datalake_file
+from .get_day_categories import get_day_calendar, get_day_categories
 from .get_db_session import get_db_session
 from .get_engine import get_engine
 from .get_env_variable import get_env_variable
@@ -12,6 +13,8 @@ __all__ = [
     "fetch_generic_api_data",
     "get_credentials",
     "get_datalake_file",
+    "get_day_calendar",
+    "get_day_categories",
     "get_db_session",
     "get_engine",
     "get_env_variable",
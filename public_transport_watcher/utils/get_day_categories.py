@@ -0,0 +1,77 @@
+import threading
+
+from holidays import France
+import numpy as np
+import pandas as pd
+
+# Day category of every date of the cached years, extended when other years are requested
+_CALENDAR = pd.Series(dtype=object)
+_CALENDAR_LOCK = threading.Lock()
+
+
+def get_day_calendar(first_year: int, last_year: int) -> pd.Series:
+    """
+    Return the day category of every date of a range of years.
+
+    The calendar is built once for the years requested so far and kept in memory.
+    Sundays and French bank holidays are DIJFP, Saturdays SAHV and other days JOHV.
+
+    Parameters
+    ----------
+    first_year : int
+        First year of the calendar
+    last_year : int
+        Last year of the calendar
+
+    Returns
+    -------
+    pd.Series
+        Day categories indexed by date
+    """
+    global _CALENDAR
+
+    first_day, last_day = pd.Timestamp(year=first_year, month=1, day=1), pd.Timestamp(year=last_year, month=12, day=31)
+    with _CALENDAR_LOCK:
+        calendar = _CALENDAR
+        if calendar.empty or first_day < calendar.index[0] or last_day > calendar.index[-1]:
+            if not calendar.empty:
+                first_year, last_year = min(first_year, calendar.index[0].year), max(last_year, calendar.index[-1].year)
+            calendar = _build_calendar(first_year, last_year)
+            _CALENDAR = calendar
+
+    return calendar[first_day:last_day]
+
+
+def get_day_categories(dates: pd.Series) -> pd.Series:
+    """
+    Return the day category (JOHV, SAHV or DIJFP) of each date.
+
+    Parameters
+    ----------
+    dates : pd.Series
+        Dates or timestamps, missing values are allowed
+
+    Returns
+    -------
+    pd.Series
+        Day categories with the index of `dates`, missing for missing dates
+    """
+    days = pd.to_datetime(dates).dt.normalize()
+    years = days.dt.year.dropna()
+    if years.empty:
+        return pd.Series(np.nan, index=dates.index, dtype=object)
+
+    calendar = get_day_calendar(int(years.min()), int(years.max()))
+    return pd.Series(calendar.reindex(days).to_numpy(), index=dates.index)
+
+
+def _build_calendar(first_year: int, last_year: int) -> pd.Series:
+    days = pd.date_range(f"{first_year}-01-01", f"{last_year}-12-31", freq="D")
+    bank_holidays = pd.DatetimeIndex(list(France(years=range(first_year, last_year + 1)).keys()))
+
+    categories = np.select(
+        [days.isin(bank_holidays) | (days.dayofweek == 6), days.dayofweek == 5],
+        ["DIJFP", "SAHV"],
+        default="JOHV",
+    )
+    return pd.Series(categories.astype(object), index=days)
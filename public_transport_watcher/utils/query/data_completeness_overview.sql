@@ -7,12 +7,11 @@ WITH date_range AS (
         ),
         traffic_data AS (
             SELECT
-                DATE_TRUNC('month', tb.start_timestamp::date) as month,
+                DATE_TRUNC('month', sh.start_timestamp::date) as month,
                 COUNT(*) as traffic_records
-            FROM transport.traffic t
-            JOIN transport.time_bin tb ON t.time_bin_id = tb.id
-            WHERE tb.start_timestamp::date >= CURRENT_DATE - INTERVAL '12 months'
-            GROUP BY DATE_TRUNC('month', tb.start_timestamp::date)
+            FROM transport.station_hour sh
+            WHERE sh.start_timestamp >= CURRENT_DATE - INTERVAL '12 months'
+            GROUP BY DATE_TRUNC('month', sh.start_timestamp::date)
         ),
         schedule_data AS (
             SELECT
@@ -6,9 +6,8 @@ SELECT
      JOIN transport.schedule s ON tr.id = s.transport_id) as active_lines,
     (SELECT AVG(daily_total)
      FROM (
-         SELECT DATE(tb.start_timestamp) as day, SUM(t.validations) as daily_total
-         FROM transport.traffic t
-         JOIN transport.time_bin tb ON t.time_bin_id = tb.id
-         WHERE t.validations IS NOT NULL
-         GROUP BY DATE(tb.start_timestamp)
+         SELECT DATE(sh.start_timestamp) as day, SUM(sh.validations) as daily_total
+         FROM transport.station_hour sh
+         WHERE sh.validations IS NOT NULL
+         GROUP BY DATE(sh.start_timestamp)
      ) daily_stats) as avg_daily_validations;
\ No newline at end of file
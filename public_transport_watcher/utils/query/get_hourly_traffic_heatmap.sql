@@ -1,10 +1,9 @@
 SELECT
-    EXTRACT(DOW FROM tb.start_timestamp) as day_of_week,
-    EXTRACT(HOUR FROM tb.start_timestamp) as hour_bin,
-    AVG(t.validations) as avg_validations,
-    SUM(t.validations) as total_validations
-FROM transport.traffic t
-JOIN transport.time_bin tb ON t.time_bin_id = tb.id
-WHERE t.validations IS NOT NULL
-GROUP BY EXTRACT(DOW FROM tb.start_timestamp), EXTRACT(HOUR FROM tb.start_timestamp)
+    (sh.day_of_week + 1) % 7 as day_of_week,
+    sh.hour as hour_bin,
+    AVG(sh.validations) as avg_validations,
+    SUM(sh.validations) as total_validations
+FROM transport.station_hour sh
+WHERE sh.validations IS NOT NULL
+GROUP BY sh.day_of_week, sh.hour
 ORDER BY day_of_week, hour_bin;
\ No newline at end of file
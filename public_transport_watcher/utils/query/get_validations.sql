@@ -2,15 +2,15 @@ SELECT
     s.name AS station_name,
     s.latitude,
     s.longitude,
-    SUM(t.validations) AS validations
+    SUM(sh.validations) AS validations
 FROM
-    transport.traffic t
+    transport.station_hour sh
 JOIN
-    transport.station s ON t.station_id = s.id
+    transport.station s ON sh.station_id = s.id
 WHERE
     s.latitude IS NOT NULL
     AND s.longitude IS NOT NULL
-    AND t.validations IS NOT NULL
+    AND sh.validations IS NOT NULL
 GROUP BY
     s.id, s.name, s.latitude, s.longitude
 ORDER BY
@@ -7,23 +7,21 @@ FROM transport.schedule s
 JOIN transport.transport t ON s.transport_id = t.id;
 
 SELECT
-    EXTRACT(YEAR FROM tb.start_timestamp) AS year,
-    EXTRACT(MONTH FROM tb.start_timestamp) AS month,
+    EXTRACT(YEAR FROM sh.start_timestamp) AS year,
+    sh.month,
     c.name AS transport_type,
-    SUM(tr.validations) AS count
+    SUM(sh.validations) AS count
 FROM
-    transport.traffic tr
+    transport.station_hour sh
 JOIN
-    transport.time_bin tb ON tr.time_bin_id = tb.id
-JOIN
-    transport.station_transport_mapping stm ON tr.station_id = stm.station_id
+    transport.station_transport_mapping stm ON sh.station_id = stm.station_id
 JOIN
     transport.categ c ON stm.type_id = c.id
 WHERE
-    tr.validations IS NOT NULL
+    sh.validations IS NOT NULL
 GROUP BY
-    EXTRACT(YEAR FROM tb.start_timestamp),
-    EXTRACT(MONTH FROM tb.start_timestamp),
+    EXTRACT(YEAR FROM sh.start_timestamp),
+    sh.month,
     c.name
 ORDER BY
     year,